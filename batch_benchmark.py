@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+import sys
+import random
+
+from typing import Any, List
+from time import monotonic_ns
+
+from json_logic.batch import evaluate_many
+
+LOGIC = {"and": [
+    {"===": [{"var": "type"}, "Vaccination"]},
+    {">=": [{"var": "dose"}, 2]},
+    {"in": [{"var": "country"}, ["AT", "DE", "IT"]]},
+]}
+
+COUNTRIES = ['AT', 'DE', 'FR', 'IT', 'NL', 'SE']
+TYPES = ['CovidTest', 'Vaccination', 'Recovery']
+
+def usage() -> None:
+    print("%s [record-count] [max-workers] [chunk-size]\n" % (sys.argv[0] if sys.argv else "batch_benchmark.py"))
+
+def make_records(count: int) -> List[Any]:
+    rnd = random.Random(0)
+    return [{
+        "id": index,
+        "type": rnd.choice(TYPES),
+        "dose": rnd.randint(1, 3),
+        "country": rnd.choice(COUNTRIES),
+        "name": {"first": "Erika", "last": "Mustermann"},
+        "tags": ["a", "b", "c"],
+    } for index in range(count)]
+
+def main() -> None:
+    if len(sys.argv) > 4:
+        usage()
+        sys.exit(1)
+
+    count       = int(sys.argv[1], 10) if len(sys.argv) > 1 else 1_000_000
+    max_workers = int(sys.argv[2], 10) if len(sys.argv) > 2 else None
+    chunk_size  = int(sys.argv[3], 10) if len(sys.argv) > 3 else 4096
+
+    records = make_records(count)
+
+    expected = None
+    for executor in 'processes', 'shared_memory':
+        start = monotonic_ns()
+        results = evaluate_many(LOGIC, records, executor=executor, max_workers=max_workers, chunk_size=chunk_size)
+        elapsed = monotonic_ns() - start
+
+        if expected is None:
+            expected = results
+        else:
+            assert results == expected, executor
+
+        print("%-14s %10.3f ms %10.0f records/s" % (executor, elapsed / 1_000_000, count * 1_000_000_000 / elapsed))
+
+if __name__ == '__main__':
+    main()
@@ -4,11 +4,11 @@ import os
 import sys
 
 from typing import List, NamedTuple
-from json import loads as parse_json, dump as print_json
 from time import monotonic_ns
 
 from json_logic import jsonLogic
 from json_logic.extras import EXTRAS
+from json_logic.codec import Codec, get_codec, available_codecs
 
 def usage() -> None:
     print("%s <repeat-count> <logic> <data>\n" % (sys.argv[0] if sys.argv else "benchmark.py"))
@@ -51,18 +51,13 @@ def print_stats(times: List[int], name: str) -> None:
         st.sum    / 1_000_000,
     ))
 
-def main() -> None:
-    if len(sys.argv) != 4:
-        usage()
-        sys.exit(1)
-
-    count = int(sys.argv[1], 10)
-    logic_str = sys.argv[2]
-    data_str  = sys.argv[3]
+def benchmark(codec: Codec, count: int, logic_bytes: bytes, data_bytes: bytes) -> None:
+    loads = codec.loads
+    dumps = codec.dumps
 
     # to test if its all valid:
-    logic = parse_json(logic_str)
-    data  = parse_json(data_str)
+    logic = loads(logic_bytes)
+    data  = loads(data_bytes)
     jsonLogic(logic, data, EXTRAS)
 
     parse_times: List[int] = []
@@ -70,12 +65,12 @@ def main() -> None:
     print_times: List[int] = []
     sum_times:   List[int] = []
 
-    with open(os.devnull, 'w') as devnull:
+    with open(os.devnull, 'wb') as devnull:
         for _ in range(count):
             start = monotonic_ns()
 
-            logic = parse_json(logic_str)
-            data  = parse_json(data_str)
+            logic = loads(logic_bytes)
+            data  = loads(data_bytes)
 
             parse_done = monotonic_ns()
 
@@ -83,8 +78,8 @@ def main() -> None:
 
             apply_done = monotonic_ns()
 
-            print_json(result, devnull)
-            devnull.write('\n') # just to be really fair
+            devnull.write(dumps(result))
+            devnull.write(b'\n') # just to be really fair
 
             print_done = monotonic_ns()
 
@@ -93,11 +88,26 @@ def main() -> None:
             print_times.append(print_done - apply_done)
             sum_times.append(print_done - start)
 
+    print("codec: %s" % codec.name)
     print("             min        max        avg     median        sum")
     print_stats(parse_times, "parse")
     print_stats(apply_times, "apply")
     print_stats(print_times, "print")
     print_stats(sum_times,   "sum")
 
+def main() -> None:
+    if len(sys.argv) != 4:
+        usage()
+        sys.exit(1)
+
+    count = int(sys.argv[1], 10)
+    logic_bytes = sys.argv[2].encode('UTF-8')
+    data_bytes  = sys.argv[3].encode('UTF-8')
+
+    for index, name in enumerate(available_codecs()):
+        if index:
+            print()
+        benchmark(get_codec(name), count, logic_bytes, data_bytes)
+
 if __name__ == '__main__':
     main()
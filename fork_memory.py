@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+
+import gc
+import sys
+import random
+
+from typing import Any, Dict, List, Tuple
+from multiprocessing.synchronize import Barrier
+from multiprocessing.queues import Queue
+
+import multiprocessing
+
+from json_logic.registry import RuleRegistry
+
+TYPES = ['CovidTest', 'Vaccination', 'Recovery']
+TEST_TYPES = ['PCR', 'AntiGen']
+VACCINES = [f'EU/1/{year}/{number}' for year in (20, 21) for number in range(1500, 1510)]
+COUNTRIES = ['AT', 'DE', 'CH', 'IT', 'FR', 'ES', 'NL', 'BE']
+
+def usage() -> None:
+    print("%s [rule-count] [worker-count] [evaluated-count] [seed]\n" % (sys.argv[0] if sys.argv else "fork_memory.py"))
+
+def random_condition(rnd: random.Random) -> Any:
+    kind = rnd.choice(TYPES)
+    conditions: List[Any] = [{"===": [{"var": "type"}, kind]}]
+    if kind == 'CovidTest':
+        conditions.append({"===": [{"var": "testType"}, rnd.choice(TEST_TYPES)]})
+        conditions.append({"<=": [0, {"var": "hoursAgo"}, rnd.choice([24, 48, 72])]})
+    elif kind == 'Vaccination':
+        conditions.append({"in": [{"var": "vaccine"}, sorted(rnd.sample(VACCINES, 3))]})
+        conditions.append({">=": [{"var": "dose"}, rnd.randint(1, 3)]})
+    else:
+        conditions.append({"<": [{"var": "daysAgo"}, rnd.choice([90, 180])]})
+    return {"and": conditions}
+
+def random_rule(rnd: random.Random) -> Any:
+    return {"and": [
+        {"in": [{"var": "country"}, sorted(rnd.sample(COUNTRIES, 4))]},
+        {"some": [
+            {"var": "events"},
+            {"or": [random_condition(rnd) for _ in range(rnd.randint(1, 4))]},
+        ]},
+    ]}
+
+def random_data(rnd: random.Random) -> Any:
+    return {
+        "country": rnd.choice(COUNTRIES),
+        "events": [{
+            "type": rnd.choice(TYPES),
+            "testType": rnd.choice(TEST_TYPES),
+            "hoursAgo": rnd.randint(0, 100),
+            "vaccine": rnd.choice(VACCINES),
+            "dose": rnd.randint(1, 3),
+            "daysAgo": rnd.randint(0, 365),
+        } for _ in range(rnd.randint(1, 3))],
+    }
+
+def memory_usage() -> Tuple[int, int]:
+    """
+    (USS, PSS) of the current process in KiB.
+    """
+    fields: Dict[str, int] = {}
+    with open('/proc/self/smaps_rollup') as fp:
+        for line in fp:
+            key, _, value = line.partition(':')
+            if value.endswith('kB\n'):
+                fields[key] = int(value[:-3])
+    return fields['Private_Clean'] + fields['Private_Dirty'], fields['Pss']
+
+def worker(registry: RuleRegistry, rule_ids: List[str], items: List[Any], preload: bool, barrier: Barrier, queue: 'Queue[Tuple[int, int, int, int]]') -> None:
+    if preload:
+        gc.enable()
+
+    # all workers exist, so the PSS splits the shared pages between all of them
+    barrier.wait()
+    forked_uss, forked_pss = memory_usage()
+
+    for data in items:
+        for rule_id in rule_ids:
+            registry.evaluate(rule_id, data)
+    # what happens sooner or later in a long running worker
+    gc.collect()
+
+    barrier.wait()
+    uss, pss = memory_usage()
+    queue.put((forked_uss, forked_pss, uss, pss))
+
+    # keep the pages shared until everyone measured
+    barrier.wait()
+
+def measure(rules: Dict[str, Any], rule_ids: List[str], items: List[Any], worker_count: int, preload: bool, results: 'Queue[Tuple[int, int, int, int]]') -> None:
+    ctx = multiprocessing.get_context('fork')
+    if preload:
+        gc.disable()
+
+    registry = RuleRegistry(rules)
+    if preload:
+        registry.preload(items[:1])
+
+    barrier = ctx.Barrier(worker_count)
+    queue: 'Queue[Tuple[int, int, int, int]]' = ctx.Queue()
+    workers = [
+        ctx.Process(target=worker, args=(registry, rule_ids, items, preload, barrier, queue))
+        for _ in range(worker_count)
+    ]
+    for proc in workers:
+        proc.start()
+
+    usage = [queue.get() for _ in workers]
+    for proc in workers:
+        proc.join()
+
+    totals = [sum(values) // worker_count for values in zip(*usage)]
+    results.put((totals[0], totals[1], totals[2], totals[3]))
+
+def main() -> None:
+    if len(sys.argv) > 5:
+        usage()
+        sys.exit(1)
+
+    rule_count   = int(sys.argv[1], 10) if len(sys.argv) > 1 else 5000
+    worker_count = int(sys.argv[2], 10) if len(sys.argv) > 2 else 4
+    # the rules that the workers evaluate, often only a few are hot
+    eval_count   = int(sys.argv[3], 10) if len(sys.argv) > 3 else rule_count // 10
+    seed         = int(sys.argv[4], 10) if len(sys.argv) > 4 else 0
+
+    rnd = random.Random(seed)
+    rules = {f'rule{index}': random_rule(rnd) for index in range(rule_count)}
+    rule_ids = rnd.sample(list(rules), min(eval_count, rule_count))
+    items = [random_data(rnd) for _ in range(20)]
+
+    ctx = multiprocessing.get_context('fork')
+    print(f"{rule_count} rules, {len(rule_ids)} evaluated, {worker_count} workers, average KiB per worker")
+    print("           USS forked   PSS forked   USS after    PSS after")
+    for name, preload in ('default', False), ('preload', True):
+        # every variant gets a fresh parent process
+        results: 'Queue[Tuple[int, int, int, int]]' = ctx.Queue()
+        parent = ctx.Process(target=measure, args=(rules, rule_ids, items, worker_count, preload, results))
+        parent.start()
+        forked_uss, forked_pss, uss, pss = results.get()
+        parent.join()
+        print("%-8s %12d %12d %12d %12d" % (name, forked_uss, forked_pss, uss, pss))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+import sys
+
+from typing import Any, Callable, List, Tuple
+from time import monotonic_ns
+
+import json_logic.compile as compile_module
+
+from json_logic import jsonLogic
+from json_logic.compile import compile
+from json_logic.types import JsonValue
+
+PATTERNS: List[Tuple[str, JsonValue]] = [
+    ("===",     {"===": [{"var": "type"}, "Vaccination"]}),
+    ("<",       {"<": [{"var": "age"}, 18]}),
+    ("between", {"<=": [18, {"var": "age"}, 65]}),
+    ("!",       {"!": {"var": "revoked"}}),
+    ("in",      {"in": [{"var": "country"}, ["AT", "DE", "CH", "IT", "FR"]]}),
+    ("missing", {"if": [{"missing": ["type", "age", "country"]}, False, True]}),
+]
+DATA = {"type": "Vaccination", "age": 42, "revoked": False, "country": "IT"}
+
+def usage() -> None:
+    print("%s [sample-count]\n" % (sys.argv[0] if sys.argv else "fused_benchmark.py"))
+
+# evaluations per sample
+BATCH_SIZE = 1000
+
+def measure(func: Callable[[], Any], count: int) -> int:
+    """
+    Best time per evaluation in nanoseconds.
+    """
+    loop = range(BATCH_SIZE)
+    times: List[int] = []
+    for _ in range(count):
+        start = monotonic_ns()
+        for _ in loop:
+            func()
+        times.append(monotonic_ns() - start)
+    return min(times) // BATCH_SIZE
+
+def compile_unfused(logic: JsonValue) -> compile_module.Compiled:
+    compile_fused     = compile_module._compile_fused
+    compile_condition = compile_module._compile_condition
+    # what compile() did before the patterns were fused
+    compile_module._compile_fused     = lambda *args: None
+    compile_module._compile_condition = compile_module._compile
+    try:
+        return compile(logic)
+    finally:
+        compile_module._compile_fused     = compile_fused
+        compile_module._compile_condition = compile_condition
+
+def main() -> None:
+    if len(sys.argv) > 2:
+        usage()
+        sys.exit(1)
+
+    count = int(sys.argv[1], 10) if len(sys.argv) > 1 else 100
+
+    print("ns/eval       apply    unfused      fused    speedup")
+    for name, logic in PATTERNS:
+        unfused = compile_unfused(logic)
+        fused   = compile(logic)
+        assert unfused(DATA) == fused(DATA) == jsonLogic(logic, DATA)
+
+        apply_time   = measure(lambda: jsonLogic(logic, DATA), count)
+        unfused_time = measure(lambda: unfused(DATA), count)
+        fused_time   = measure(lambda: fused(DATA), count)
+
+        print("%-8s %10d %10d %10d %9.1fx" % (name, apply_time, unfused_time, fused_time, unfused_time / fused_time))
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,28 @@
+from typing import Any
+
 from .apply import apply as jsonLogic
-from .cert_logic import certLogic
 
-__all__ = 'jsonLogic', 'certLogic'
+__all__ = 'jsonLogic', 'certLogic', 'partial', 'evaluate_json'
+
+# Everything except jsonLogic is imported on first access, so short-lived
+# processes (like the command line interface) don't pay for the compiler and
+# CertLogic on startup.
+_LAZY_ATTRS = {
+    'certLogic':     ('.cert_logic', 'certLogic'),
+    'partial':       ('.compile', 'partial'),
+    'evaluate_json': ('.codec', 'evaluate_json'),
+}
+
+def __getattr__(name: str) -> Any:
+    try:
+        module_name, attr = _LAZY_ATTRS[name]
+    except KeyError:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}') from None
+
+    from importlib import import_module
+    value = getattr(import_module(module_name, __name__), attr)
+    globals()[name] = value
+    return value
+
+def __dir__() -> list:
+    return sorted({*globals(), *_LAZY_ATTRS})
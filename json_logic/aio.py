@@ -0,0 +1,292 @@
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+import asyncio
+import inspect
+
+from .types import JsonValue, Operations
+from .builtins import BUILTINS, to_bool, not_
+from .apply import resolve_operation
+from .compile import (
+    COLLECTION_OPS, Compiled, Constant, fold, _compile, _compile_collection,
+)
+
+__all__ = 'apply_async', 'compile_async', 'CompiledAsync'
+
+CompiledAsync = Callable[[JsonValue], Awaitable[JsonValue]]
+
+def is_async_operation(operation: Any) -> bool:
+    return inspect.iscoroutinefunction(operation) or \
+        inspect.iscoroutinefunction(getattr(operation, '__call__', None))
+
+async def apply_async(logic: JsonValue, data: JsonValue=None, operations: Operations=BUILTINS) -> JsonValue:
+    """
+    Like `apply()`, but operations may be coroutine functions.
+    """
+    return await compile_async(logic, operations)(data)
+
+def compile_async(logic: JsonValue, operations: Operations=BUILTINS) -> CompiledAsync:
+    """
+    Like `compile()`, but operations may be coroutine functions. Returns a
+    coroutine function that takes the data.
+
+    Sub-expressions that don't use any coroutine functions are compiled
+    exactly like with `compile()` and run without any coroutine overhead. The
+    arguments of an operation and the items of `map` and `filter` are awaited
+    concurrently. `if`, `and`, `or`, `all`, `some`, `none` and `reduce` await
+    their operands one after another and keep their short circuit behavior.
+    """
+    is_async, func = _compile_async(fold(logic, operations), operations)
+    if is_async:
+        return func # type: ignore
+
+    sync_func: Compiled = func # type: ignore
+    async def compiled(data: JsonValue) -> JsonValue:
+        return sync_func(data)
+
+    return compiled
+
+AsyncOrSync = Tuple[bool, Callable[[JsonValue], Any]]
+
+async def _gather(funcs: List[AsyncOrSync], data: JsonValue) -> List[JsonValue]:
+    values: List[JsonValue] = []
+    indices: List[int] = []
+    for is_async, func in funcs:
+        if is_async:
+            indices.append(len(values))
+            values.append(None)
+        else:
+            values.append(func(data))
+
+    # the coroutines are only created after all sync arguments succeeded, so
+    # an exception doesn't leave any of them un-awaited
+    pending: List[Awaitable[JsonValue]] = [funcs[index][1](data) for index in indices]
+
+    if len(pending) == 1:
+        values[indices[0]] = await pending[0]
+    else:
+        for index, value in zip(indices, await asyncio.gather(*pending)):
+            values[index] = value
+
+    return values
+
+async def _evaluate(func: AsyncOrSync, data: JsonValue) -> JsonValue:
+    is_async, callback = func
+    if is_async:
+        return await callback(data)
+    return callback(data)
+
+def _uses_async(logic: JsonValue, operations: Operations) -> bool:
+    """
+    Whether evaluating `logic` might call a coroutine function. Operations
+    that aren't defined yet might become one.
+    """
+    if isinstance(logic, list):
+        return any(_uses_async(item, operations) for item in logic)
+
+    if not isinstance(logic, dict) or len(logic) != 1:
+        return False
+
+    op, args = next(iter(logic.items()))
+
+    if not isinstance(args, list):
+        args = [args]
+
+    if op in COLLECTION_OPS:
+        # the initial value of `reduce` is not evaluated
+        args = args[:2]
+    elif op not in ('if', '?:', 'and', 'or'):
+        try:
+            operation = resolve_operation(op, operations)
+        except Exception:
+            return True
+
+        if is_async_operation(operation):
+            return True
+
+    return any(_uses_async(arg, operations) for arg in args)
+
+def _compile_async(logic: JsonValue, operations: Operations) -> AsyncOrSync:
+    if not _uses_async(logic, operations):
+        # the full compiler, including fused operations and path tries
+        return False, _compile(logic, operations)
+
+    if isinstance(logic, list):
+        items = [_compile_async(item, operations) for item in logic]
+
+        async def list_(data: JsonValue) -> JsonValue:
+            return await _gather(items, data)
+
+        return True, list_
+
+    if not isinstance(logic, dict) or len(logic) != 1:
+        return False, Constant(logic)
+
+    op, args = next(iter(logic.items()))
+
+    if not isinstance(args, list):
+        args = [args]
+
+    if op in COLLECTION_OPS:
+        return _compile_collection_async(op, args, operations)
+
+    # from here on at least one argument or the operation itself is async
+    funcs = [_compile_async(arg, operations) for arg in args]
+    any_async = any(is_async for is_async, _ in funcs)
+
+    if op == 'if' or op == '?:':
+        argc = len(funcs)
+        async def if_(data: JsonValue) -> JsonValue:
+            last_index = argc - 1
+            index = 0
+            while index < last_index:
+                if to_bool(await _evaluate(funcs[index], data)):
+                    return await _evaluate(funcs[index + 1], data)
+                index += 2
+
+            if index >= argc:
+                return None
+
+            return await _evaluate(funcs[index], data)
+
+        return True, if_
+
+    elif op == 'and':
+        async def and_(data: JsonValue) -> JsonValue:
+            current = None
+            for func in funcs:
+                current = await _evaluate(func, data)
+                if not_(current):
+                    return current
+            return current
+
+        return True, and_
+
+    elif op == 'or':
+        async def or_(data: JsonValue) -> JsonValue:
+            current = None
+            for func in funcs:
+                current = await _evaluate(func, data)
+                if to_bool(current):
+                    return current
+            return current
+
+        return True, or_
+
+    try:
+        operation = resolve_operation(op, operations)
+    except Exception:
+        async def unresolved(data: JsonValue) -> JsonValue:
+            values = await _gather(funcs, data)
+            return resolve_operation(op, operations)(data, *values)
+        return True, unresolved
+
+    if is_async_operation(operation):
+        if not any_async:
+            sync_funcs: List[Compiled] = [func for _, func in funcs]
+            async def call_async(data: JsonValue) -> JsonValue:
+                return await operation(data, *[func(data) for func in sync_funcs])
+            return True, call_async
+
+        async def call_async_args_async(data: JsonValue) -> JsonValue:
+            return await operation(data, *await _gather(funcs, data))
+        return True, call_async_args_async
+
+    async def call_args_async(data: JsonValue) -> JsonValue:
+        return operation(data, *await _gather(funcs, data))
+    return True, call_args_async
+
+def _compile_collection_async(op: str, args: List[JsonValue], operations: Operations) -> AsyncOrSync:
+    argc = len(args)
+    items_is_async, items_func = _compile_async(args[0], operations) if argc > 0 else (False, Constant(None))
+    sub_is_async,   sublogic   = _compile_async(args[1] if argc > 1 else None, operations)
+
+    if argc == 0 or (op not in ('map', 'reduce') and argc < 2):
+        # the items are not evaluated
+        return False, _compile_collection(op, Constant(None), args, operations)
+
+    if not sub_is_async:
+        sync_func = _compile_collection(op, items_func if not items_is_async else _identity, args, operations)
+        if not items_is_async:
+            return False, sync_func
+
+        async def collection(data: JsonValue) -> JsonValue:
+            return sync_func(await items_func(data))
+
+        return True, collection
+
+    sub = sub_is_async, sublogic
+
+    if op == 'reduce':
+        init = args[2] if argc > 2 else None
+
+        async def reduce_(data: JsonValue) -> JsonValue:
+            items = await _evaluate((items_is_async, items_func), data)
+            if not isinstance(items, list):
+                return init
+
+            context: Dict[str, JsonValue] = {'accumulator': init}
+            for item in items:
+                context['current']     = item
+                context['accumulator'] = await _evaluate(sub, context)
+
+            return context['accumulator']
+
+        return True, reduce_
+
+    if op == 'map':
+        async def map_(data: JsonValue) -> JsonValue:
+            items = await _evaluate((items_is_async, items_func), data)
+            if not isinstance(items, list):
+                return []
+            return list(await asyncio.gather(*[sublogic(item) for item in items]))
+
+        return True, map_
+
+    if op == 'filter':
+        async def filter_(data: JsonValue) -> JsonValue:
+            items = await _evaluate((items_is_async, items_func), data)
+            if not isinstance(items, list):
+                return []
+            flags = await asyncio.gather(*[sublogic(item) for item in items])
+            return [item for item, flag in zip(items, flags) if to_bool(flag)]
+
+        return True, filter_
+
+    if op == 'all':
+        async def all_(data: JsonValue) -> JsonValue:
+            items = await _evaluate((items_is_async, items_func), data)
+            # yes, JsonLogic defines that all of an empty list is False
+            if not isinstance(items, list) or not items:
+                return False
+            for item in items:
+                if not to_bool(await _evaluate(sub, item)):
+                    return False
+            return True
+
+        return True, all_
+
+    if op == 'some':
+        async def some_(data: JsonValue) -> JsonValue:
+            items = await _evaluate((items_is_async, items_func), data)
+            if not isinstance(items, list):
+                return False
+            for item in items:
+                if to_bool(await _evaluate(sub, item)):
+                    return True
+            return False
+
+        return True, some_
+
+    async def none_(data: JsonValue) -> JsonValue:
+        items = await _evaluate((items_is_async, items_func), data)
+        if not isinstance(items, list):
+            return True
+        for item in items:
+            if to_bool(await _evaluate(sub, item)):
+                return False
+        return True
+
+    return True, none_
+
+def _identity(data: JsonValue) -> JsonValue:
+    return data
@@ -1,139 +1,161 @@
-from typing import Dict
+from typing import Callable, Dict, Optional
 
-from .types import JsonValue, Operations
+from .types import JsonValue, Operation, Operations
 from .builtins import BUILTINS, to_bool, not_
 
-def apply(logic: JsonValue, data: JsonValue=None, operations: Operations=BUILTINS) -> JsonValue:
-    if isinstance(logic, list):
-        return [apply(item, data, operations) for item in logic]
+Apply = Callable[..., JsonValue]
 
-    if not isinstance(logic, dict) or len(logic) != 1:
-        return logic
+def make_apply(wrap: Optional[Callable[[Apply], Apply]]=None) -> Apply:
+    """
+    Create the evaluator. `wrap` takes the function that evaluates a single
+    node and returns the function that is called for every node instead, e.g.
+    to meter the evaluation (see `json_logic.budget`). Without `wrap` the
+    evaluator calls itself directly.
+    """
+    def apply(logic: JsonValue, data: JsonValue=None, operations: Operations=BUILTINS) -> JsonValue:
+        if isinstance(logic, list):
+            return [evaluate(item, data, operations) for item in logic]
+
+        if not isinstance(logic, dict) or len(logic) != 1:
+            return logic
+
+        op: str = next(iter(logic))
+        args = logic[op]
+
+        if not isinstance(args, list):
+            args = [args]
 
-    op: str = next(iter(logic))
-    args = logic[op]
+        if op == 'if' or op == '?:':
+            argc = len(args)
 
-    if not isinstance(args, list):
-        args = [args]
+            last_index = argc - 1
+            index = 0
+            while index < last_index:
+                if to_bool(evaluate(args[index], data, operations)):
+                    index += 1
+                    if index >= argc:
+                        return None
 
-    if op == 'if' or op == '?:':
-        argc = len(args)
+                    return evaluate(args[index], data, operations)
+                index += 2
 
-        last_index = argc - 1
-        index = 0
-        while index < last_index:
-            if to_bool(apply(args[index], data, operations)):
-                index += 1
-                if index >= argc:
-                    return None
+            if index >= argc:
+                return None
 
-                return apply(args[index], data, operations)
-            index += 2
+            return evaluate(args[index], data, operations)
 
-        if index >= argc:
-            return None
+        elif op == 'and':
+            current = None
+            for arg in args:
+                current = evaluate(arg, data, operations)
+                if not_(current):
+                    return current
+            return current
 
-        return apply(args[index], data, operations)
+        elif op == 'or':
+            current = None
+            for arg in args:
+                current = evaluate(arg, data, operations)
+                if to_bool(current):
+                    return current
+            return current
 
-    elif op == 'and':
-        current = None
-        for arg in args:
-            current = apply(arg, data, operations)
-            if not_(current):
-                return current
-        return current
+        elif op == 'filter':
+            if len(args) < 2:
+                return []
 
-    elif op == 'or':
-        current = None
-        for arg in args:
-            current = apply(arg, data, operations)
-            if to_bool(current):
-                return current
-        return current
+            items = evaluate(args[0], data, operations)
+            if not isinstance(items, list):
+                return []
 
-    elif op == 'filter':
-        if len(args) < 2:
-            return []
+            sublogic = args[1]
 
-        items = apply(args[0], data, operations)
-        if not isinstance(items, list):
-            return []
+            filtered = [item for item in items if to_bool(evaluate(sublogic, item, operations))]
+            return filtered
 
-        sublogic = args[1]
+        elif op == 'reduce':
+            argc = len(args)
+            if argc < 1:
+                return None
 
-        filtered = [item for item in items if to_bool(apply(sublogic, item, operations))]
-        return filtered
+            items    = evaluate(args[0], data, operations)
+            sublogic = args[1] if argc > 1 else None
+            init     = args[2] if argc > 2 else None
 
-    elif op == 'reduce':
-        argc = len(args)
-        if argc < 1:
-            return None
+            if not isinstance(items, list):
+                return init
 
-        items    = apply(args[0], data, operations)
-        sublogic = args[1] if argc > 1 else None
-        init     = args[2] if argc > 2 else None
+            context: Dict[str, JsonValue] = {'accumulator': init}
+            for item in items:
+                context['current']     = item
+                context['accumulator'] = evaluate(sublogic, context, operations)
 
-        if not isinstance(items, list):
-            return init
+            return context['accumulator']
 
-        context: Dict[str, JsonValue] = {'accumulator': init}
-        for item in items:
-            context['current']     = item
-            context['accumulator'] = apply(sublogic, context, operations)
+        elif op == 'map':
+            argc = len(args)
+            if argc < 1:
+                return []
 
-        return context['accumulator']
+            items = evaluate(args[0], data, operations)
+            if not isinstance(items, list):
+                return []
 
-    elif op == 'map':
-        argc = len(args)
-        if argc < 1:
-            return []
+            sublogic = args[1] if argc > 1 else None
+            mapped = [evaluate(sublogic, item, operations) for item in items]
+            return mapped
 
-        items = apply(args[0], data, operations)
-        if not isinstance(items, list):
-            return []
+        elif op == 'all':
+            # yes, JsonLogic defines that all of an empty list is False
+            if len(args) < 2:
+                return False
 
-        sublogic = args[1] if argc > 1 else None
-        mapped = [apply(sublogic, item, operations) for item in items]
-        return mapped
+            items = evaluate(args[0], data, operations)
+            if not isinstance(items, list) or not items:
+                return False
 
-    elif op == 'all':
-        # yes, JsonLogic defines that all of an empty list is False
-        if len(args) < 2:
-            return False
+            sublogic = args[1]
+            return all(to_bool(evaluate(sublogic, item, operations)) for item in items)
 
-        items = apply(args[0], data, operations)
-        if not isinstance(items, list) or not items:
-            return False
+        elif op == 'some':
+            if len(args) < 2:
+                return False
 
-        sublogic = args[1]
-        return all(to_bool(apply(sublogic, item, operations)) for item in items)
+            items = evaluate(args[0], data, operations)
+            if not isinstance(items, list):
+                return False
 
-    elif op == 'some':
-        if len(args) < 2:
-            return False
+            sublogic = args[1]
+            return any(to_bool(evaluate(sublogic, item, operations)) for item in items)
 
-        items = apply(args[0], data, operations)
-        if not isinstance(items, list):
-            return False
+        elif op == 'none':
+            if len(args) < 2:
+                return True
 
-        sublogic = args[1]
-        return any(to_bool(apply(sublogic, item, operations)) for item in items)
+            items = evaluate(args[0], data, operations)
+            if not isinstance(items, list):
+                return True
 
-    elif op == 'none':
-        if len(args) < 2:
-            return True
+            sublogic = args[1]
+            return not any(to_bool(evaluate(sublogic, item, operations)) for item in items)
 
-        items = apply(args[0], data, operations)
-        if not isinstance(items, list):
-            return True
+        args = [evaluate(arg, data, operations) for arg in args]
 
-        sublogic = args[1]
-        return not any(to_bool(apply(sublogic, item, operations)) for item in items)
+        if op in operations:
+            return operations[op](data, *args) # type: ignore
 
-    args = [apply(arg, data, operations) for arg in args]
+        return resolve_operation(op, operations)(data, *args)
 
+    evaluate = apply if wrap is None else wrap(apply)
+    return evaluate
+
+apply = make_apply()
+# picklable by reference like a module level function
+apply.__qualname__ = 'apply'
+
+def resolve_operation(op: str, operations: Operations) -> Operation:
     if op in operations:
-        return operations[op](data, *args) # type: ignore
+        return operations[op] # type: ignore
     elif '.' in op:
         props = op.split('.')
         ops = operations
@@ -141,6 +163,6 @@ def apply(logic: JsonValue, data: JsonValue=None, operations: Operations=BUILTIN
             if isinstance(ops, dict) and prop not in ops:
                 raise ReferenceError(f"Unrecognized operation: {'.'.join(props[:index + 1])!r}")
             ops = ops[prop] # type: ignore
-        return ops(data, *args) # type: ignore
+        return ops # type: ignore
 
     raise ReferenceError(f"Unrecognized operation: {op!r}")
@@ -0,0 +1,277 @@
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from multiprocessing.context import BaseContext
+from multiprocessing.shared_memory import SharedMemory
+from multiprocessing import resource_tracker, util
+import multiprocessing
+import sys
+
+from .types import JsonValue, Operations
+from .builtins import BUILTINS
+from .compile import Compiled, compile
+from .codec import get_codec
+
+__all__ = 'evaluate_many',
+
+DEFAULT_CHUNK_SIZE = 256
+
+def evaluate_many(
+        logic: JsonValue,
+        items: Iterable[JsonValue],
+        operations: Operations=BUILTINS,
+        executor: Optional[str]=None,
+        max_workers: Optional[int]=None,
+        chunk_size: int=DEFAULT_CHUNK_SIZE) -> List[JsonValue]:
+    """
+    Evaluate `logic` for every data item in `items` and return the list of
+    results in the same order.
+
+    `executor` can be `None` (evaluate in the current thread), `"threads"` or
+    `"processes"`. The rule is compiled once and the compiled rule is shared
+    between all threads. Compiled rules don't have any mutable state, so this
+    is safe even on free-threaded Python builds, as long as the operations
+    don't have mutable state themselves. Threads only give a speedup on
+    free-threaded builds or when the operations release the GIL.
+
+    With `"processes"` the rule is compiled once per worker process and the
+    data and results are pickled. On platforms that support it the worker
+    processes are forked, so the operations don't need to be picklable.
+    Otherwise custom operations have to be picklable, the builtin operations
+    always work.
+
+    `"shared_memory"` also uses worker processes, but serializes all items
+    once as JSON into a shared memory block. The workers only receive index
+    ranges, decode their items from the block and write boolean and numeric
+    results into a shared array. Other results are pickled. The items have to
+    be serializable with the preferred JSON codec and are evaluated like their
+    JSON representation (e.g. dates become strings).
+    """
+    if chunk_size < 1:
+        raise ValueError(f'illegal chunk_size: {chunk_size!r}')
+
+    if executor is None:
+        rule = compile(logic, operations)
+        return [rule(data) for data in items]
+
+    pool: Executor
+    if executor == 'threads':
+        rule = compile(logic, operations)
+        pool = ThreadPoolExecutor(max_workers)
+        task = rule_evaluator(rule)
+
+    elif executor == 'processes':
+        pool = ProcessPoolExecutor(max_workers, mp_context=_process_context(),
+            initializer=_init_worker, initargs=(logic, _worker_operations(operations)))
+        task = _evaluate_in_worker
+
+    elif executor == 'shared_memory':
+        return _evaluate_shared(logic, items, operations, max_workers, chunk_size)
+
+    else:
+        raise ValueError(f'illegal executor: {executor!r}')
+
+    results: List[JsonValue] = []
+    with pool:
+        for chunk_results in pool.map(task, chunks(items, chunk_size)):
+            results.extend(chunk_results)
+
+    return results
+
+def _process_context() -> BaseContext:
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return multiprocessing.get_context()
+
+def chunks(items: Iterable[JsonValue], chunk_size: int) -> Iterable[List[JsonValue]]:
+    if isinstance(items, list):
+        for index in range(0, len(items), chunk_size):
+            yield items[index:index + chunk_size]
+        return
+
+    chunk: List[JsonValue] = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+
+    if chunk:
+        yield chunk
+
+def rule_evaluator(rule: Compiled) -> Callable[[List[JsonValue]], List[JsonValue]]:
+    def evaluate_chunk(chunk: List[JsonValue]) -> List[JsonValue]:
+        return [rule(data) for data in chunk]
+    return evaluate_chunk
+
+_worker_rule: Optional[Compiled] = None
+
+def _worker_operations(operations: Operations) -> Optional[Operations]:
+    # BUILTINS contains lambdas that can't be pickled for spawned workers,
+    # so None is sent instead and resolved again in the worker
+    return None if operations is BUILTINS else operations
+
+def _init_worker(logic: JsonValue, operations: Optional[Operations]) -> None:
+    global _worker_rule
+    _worker_rule = compile(logic, BUILTINS if operations is None else operations)
+
+def _evaluate_in_worker(chunk: List[JsonValue]) -> List[JsonValue]:
+    rule = _worker_rule
+    assert rule is not None
+    return [rule(data) for data in chunk]
+
+# Layout of the shared memory block for n items:
+#
+#     offsets: n + 1 unsigned 64 bit integers, item i is data[offsets[i]:offsets[i + 1]]
+#     values:  n 64 bit slots, a double or a signed integer depending on the kind
+#     kinds:   n bytes, one of the KIND_* constants
+#     data:    the JSON encoded items
+KIND_OTHER = 0
+KIND_FALSE = 1
+KIND_TRUE  = 2
+KIND_INT   = 3
+KIND_FLOAT = 4
+
+INT64_MIN = -(1 << 63)
+INT64_MAX = (1 << 63) - 1
+
+class SharedLayout:
+    __slots__ = 'count', 'values_offset', 'kinds_offset', 'data_offset'
+
+    count: int
+    values_offset: int
+    kinds_offset: int
+    data_offset: int
+
+    def __init__(self, count: int) -> None:
+        self.count         = count
+        self.values_offset = (count + 1) * 8
+        self.kinds_offset  = self.values_offset + count * 8
+        self.data_offset   = self.kinds_offset + count
+
+def _evaluate_shared(
+        logic: JsonValue,
+        items: Iterable[JsonValue],
+        operations: Operations,
+        max_workers: Optional[int],
+        chunk_size: int) -> List[JsonValue]:
+    from array import array
+
+    codec = get_codec()
+    dumps = codec.dumps
+    records = [dumps(item) for item in items]
+    count = len(records)
+    if count == 0:
+        return []
+
+    offsets = array('Q', [0])
+    offset = 0
+    for record in records:
+        offset += len(record)
+        offsets.append(offset)
+
+    layout = SharedLayout(count)
+    shm = SharedMemory(create=True, size=layout.data_offset + offset)
+    try:
+        buf = shm.buf
+        buf[:layout.values_offset] = offsets.tobytes()
+        buf[layout.data_offset:layout.data_offset + offset] = b''.join(records)
+        del records, offsets
+
+        pool = ProcessPoolExecutor(max_workers, mp_context=_process_context(),
+            initializer=_init_shared_worker, initargs=(logic, _worker_operations(operations), codec.name, shm.name, count))
+
+        ranges = [(start, min(start + chunk_size, count)) for start in range(0, count, chunk_size)]
+        results: List[JsonValue] = [None] * count
+        with pool:
+            for others in pool.map(_evaluate_shared_range, ranges):
+                for index, result in others:
+                    results[index] = result
+
+        with buf[layout.values_offset:layout.kinds_offset].cast('d') as floats, \
+             buf[layout.values_offset:layout.kinds_offset].cast('q') as ints, \
+             buf[layout.kinds_offset:layout.data_offset] as kinds:
+            for index in range(count):
+                kind = kinds[index]
+                if kind == KIND_TRUE:
+                    results[index] = True
+                elif kind == KIND_FALSE:
+                    results[index] = False
+                elif kind == KIND_INT:
+                    results[index] = ints[index]
+                elif kind == KIND_FLOAT:
+                    results[index] = floats[index]
+
+        return results
+    finally:
+        shm.close()
+        shm.unlink()
+
+_worker_shm: Optional[SharedMemory] = None
+_worker_layout: Optional[SharedLayout] = None
+_worker_codec_name = 'json'
+
+def _init_shared_worker(logic: JsonValue, operations: Optional[Operations], codec_name: str, shm_name: str, count: int) -> None:
+    global _worker_shm, _worker_layout, _worker_codec_name
+    _init_worker(logic, operations)
+    _worker_shm = _attach_shared_memory(shm_name)
+    # forked workers exit with os._exit() and skip atexit, but not finalizers
+    util.Finalize(None, _worker_shm.close, exitpriority=0)
+    _worker_layout = SharedLayout(count)
+    _worker_codec_name = codec_name
+
+def _attach_shared_memory(name: str) -> SharedMemory:
+    """
+    Attach the shared memory block of the parent process without registering
+    it with the resource tracker. The tracker is shared with the parent and
+    keeps only one entry per name, so unregistering it again in the worker
+    would drop the registration of the parent.
+    """
+    if sys.version_info >= (3, 13):
+        return SharedMemory(name=name, track=False)
+
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None
+    try:
+        return SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+def _evaluate_shared_range(index_range: Tuple[int, int]) -> List[Tuple[int, JsonValue]]:
+    """
+    Evaluate the items in `index_range`, write boolean and numeric results to
+    the shared memory block and return the other results.
+    """
+    rule   = _worker_rule
+    shm    = _worker_shm
+    layout = _worker_layout
+    assert rule is not None and shm is not None and layout is not None
+
+    loads = get_codec(_worker_codec_name).loads
+    start, end = index_range
+    others: List[Tuple[int, JsonValue]] = []
+
+    buf = shm.buf
+    with buf[:layout.values_offset].cast('Q') as offsets, \
+         buf[layout.values_offset:layout.kinds_offset].cast('d') as floats, \
+         buf[layout.values_offset:layout.kinds_offset].cast('q') as ints, \
+         buf[layout.kinds_offset:layout.data_offset] as kinds, \
+         buf[layout.data_offset:] as data:
+        for index in range(start, end):
+            result = rule(loads(bytes(data[offsets[index]:offsets[index + 1]])))
+
+            if result is True:
+                kinds[index] = KIND_TRUE
+            elif result is False:
+                kinds[index] = KIND_FALSE
+            elif type(result) is int and INT64_MIN <= result <= INT64_MAX:
+                kinds[index] = KIND_INT
+                ints[index] = result
+            elif type(result) is float:
+                kinds[index] = KIND_FLOAT
+                floats[index] = result
+            else:
+                kinds[index] = KIND_OTHER
+                others.append((index, result))
+
+    return others
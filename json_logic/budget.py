@@ -0,0 +1,161 @@
+"""
+Evaluation budgets for untrusted rules.
+
+`apply_with_budget()` evaluates a rule like `apply()`, but raises
+`BudgetExceeded` as soon as one of the limits of the given `Budget` is
+exceeded:
+
+* `max_steps`: number of evaluated nodes (fuel)
+* `max_size`:  length of lists produced by evaluated nodes (operations, `map`,
+  `filter`, list literals)
+* `max_depth`: nesting depth of the evaluated nodes
+* `timeout`:   wall time in seconds
+
+`cert_logic_with_budget()` does the same for CertLogic. Both use evaluators
+created by `make_apply()` of `json_logic.apply` and `json_logic.cert_logic.apply`,
+so they evaluate exactly like the normal ones, but call the `Meter` for every
+node. `apply()` and `compile()` don't check any limits and have no overhead.
+Operations that can allocate big results check the size before allocating via
+`check_size()`, which does nothing if no budget is active.
+"""
+
+from typing import NamedTuple, Optional
+
+from contextvars import ContextVar
+from time import perf_counter
+
+from .types import JsonValue, Operations
+from .builtins import BUILTINS
+from .apply import Apply, make_apply
+from .cert_logic.apply import make_apply as make_cert_logic_apply
+from .cert_logic.builtins import BUILTINS as CERTLOGIC_BUILTINS
+
+__all__ = 'Budget', 'BudgetExceeded', 'apply_with_budget', 'cert_logic_with_budget', 'check_size'
+
+# how many steps to do between checking the time
+TIME_CHECK_INTERVAL = 256
+
+class Budget(NamedTuple):
+    max_steps: Optional[int] = None
+    max_size:  Optional[int] = None
+    max_depth: Optional[int] = None
+    timeout:   Optional[float] = None
+
+class BudgetExceeded(Exception):
+    """
+    `limit` is one of `'max_steps'`, `'max_size'`, `'max_depth'` or
+    `'timeout'`.
+    """
+    limit: str
+    value: float
+
+    def __init__(self, limit: str, value: float) -> None:
+        super().__init__(f'{limit} of {value} exceeded')
+        self.limit = limit
+        self.value = value
+
+class Meter:
+    __slots__ = 'budget', 'steps', 'depth', 'next_check', 'deadline'
+
+    budget: Budget
+    steps: int
+    depth: int
+    next_check: int
+    deadline: float
+
+    def __init__(self, budget: Budget) -> None:
+        self.budget   = budget
+        self.steps    = 0
+        self.depth    = 0
+        self.deadline = perf_counter() + budget.timeout if budget.timeout is not None else 0.0
+        self.next_check = self._next_check()
+
+    def _next_check(self) -> int:
+        # -1 is never reached, so unlimited budgets don't do any checks
+        budget = self.budget
+        next_check = -1
+        if budget.timeout is not None:
+            next_check = self.steps + TIME_CHECK_INTERVAL
+        if budget.max_steps is not None and (next_check < 0 or budget.max_steps < next_check):
+            next_check = budget.max_steps + 1
+        return next_check
+
+    def step(self) -> None:
+        """
+        Called when `steps` reached `next_check`.
+        """
+        budget = self.budget
+        if budget.max_steps is not None and self.steps > budget.max_steps:
+            raise BudgetExceeded('max_steps', budget.max_steps)
+
+        if budget.timeout is not None and perf_counter() > self.deadline:
+            raise BudgetExceeded('timeout', budget.timeout)
+
+        self.next_check = self._next_check()
+
+    def check_size(self, size: int) -> None:
+        max_size = self.budget.max_size
+        if max_size is not None and size > max_size:
+            raise BudgetExceeded('max_size', max_size)
+
+    def wrap(self, evaluate: Apply) -> Apply:
+        """
+        Meter every call of `evaluate` (the evaluation of a single node), see
+        `make_apply()`.
+        """
+        max_depth = self.budget.max_depth
+
+        def metered(logic: JsonValue, data: JsonValue, operations: Operations) -> JsonValue:
+            self.steps += 1
+            if self.steps == self.next_check:
+                self.step()
+
+            depth = self.depth = self.depth + 1
+            if max_depth is not None and depth > max_depth:
+                raise BudgetExceeded('max_depth', max_depth)
+
+            result = evaluate(logic, data, operations)
+            # not restored on exceptions, they end the evaluation anyway
+            self.depth = depth - 1
+
+            if isinstance(result, list):
+                self.check_size(len(result))
+
+            return result
+
+        return metered
+
+_current_meter: ContextVar[Optional[Meter]] = ContextVar('json_logic_budget', default=None)
+
+def check_size(size: int) -> None:
+    """
+    Raise `BudgetExceeded` if an operation would produce a list of `size`
+    items, but the current budget doesn't allow it.
+    """
+    meter = _current_meter.get()
+    if meter is not None:
+        meter.check_size(size)
+
+def apply_with_budget(logic: JsonValue, data: JsonValue=None, operations: Operations=BUILTINS, budget: Budget=Budget()) -> JsonValue:
+    """
+    Like `apply()`, but raises `BudgetExceeded` if evaluating `logic` exceeds
+    `budget`.
+    """
+    meter = Meter(budget)
+    token = _current_meter.set(meter)
+    try:
+        return make_apply(meter.wrap)(logic, data, operations)
+    finally:
+        _current_meter.reset(token)
+
+def cert_logic_with_budget(logic: JsonValue, data: JsonValue=None, operations: Operations=CERTLOGIC_BUILTINS, budget: Budget=Budget()) -> JsonValue:
+    """
+    Like `certLogic()`, but raises `BudgetExceeded` if evaluating `logic`
+    exceeds `budget`.
+    """
+    meter = Meter(budget)
+    token = _current_meter.set(meter)
+    try:
+        return make_cert_logic_apply(meter.wrap)(logic, data, operations)
+    finally:
+        _current_meter.reset(token)
@@ -3,11 +3,9 @@ from __future__ import annotations
 from typing import Any, List, Iterable, Union
 from datetime import date, datetime, time, timezone
 from time import mktime
-from wsgiref.handlers import format_date_time
 from math import isnan
-from array import array
+from functools import lru_cache
 
-import json
 import sys
 
 from .types import JsonValue, Operations
@@ -19,7 +17,7 @@ EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
 def op_equals(data=None, a=None, b=None, *_ignored) -> bool:
     atype = type(a)
     if atype is type(b):
-        if atype in (list, dict):
+        if isinstance(a, (list, dict)):
             return a is b
         return a == b
 
@@ -119,6 +117,8 @@ def to_string(value: Any) -> str:
         return '[object Object]'
 
     if isinstance(value, (date, datetime)):
+        # imported on first use, wsgiref is slow to import and rarely needed
+        from wsgiref.handlers import format_date_time
         return format_date_time(mktime(value.timetuple()))
 
     return str(value)
@@ -179,6 +179,7 @@ def json_default(arg: Any) -> JsonValue:
     raise TypeError(f'unhandled type: {argtype.__module__}.{argtype.__name__}')
 
 def op_log(data=None, arg: Any=None, *_ignored) -> Any:
+    import json
     json.dump(arg, sys.stdout, default=json_default)
     sys.stdout.write('\n')
     return arg
@@ -302,12 +303,44 @@ def op_substr(data=None, string=None, index=None, length=None, *_ignored) -> str
 
     return string[index:end_index]
 
+# Rules tend to look at the same strings over and over (in a batch or in
+# several operations of one rule), so the check for astral characters is
+# cached.
+ASTRAL_CACHE_SIZE = 4096
+
+@lru_cache(maxsize=ASTRAL_CACHE_SIZE)
+def _has_astral(string: str) -> bool:
+    return max(string) > '\uffff'
+
+def has_astral(string: str) -> bool:
+    """
+    Whether `string` contains code points outside of the basic multilingual
+    plane, i.e. code points that take two UTF-16 code units. Only for such
+    strings JavaScript semantics differ from Python semantics.
+    """
+    # isascii() is O(1)
+    return not string.isascii() and _has_astral(string)
+
+def utf16_length(string: str) -> int:
+    """
+    Length of `string` in UTF-16 code units, like `.length` in JavaScript.
+    """
+    if not has_astral(string):
+        return len(string)
+
+    return len(string.encode('UTF-16BE', 'surrogatepass')) // 2
+
 def op_substr_utf16(data=None, string=None, index=None, length=None, *_ignored) -> str:
-    string = array('H', to_string(string).encode('UTF-16BE'))
+    string = to_string(string)
+    if not has_astral(string):
+        # UTF-16 code units are code points
+        return op_substr(data, string, index, length)
+
+    encoded = string.encode('UTF-16BE', 'surrogatepass')
 
     index = to_number(index)
 
-    strlen = len(string)
+    strlen = len(encoded) // 2
     if isnan(index):
         index = 0
     elif index < 0:
@@ -336,7 +369,8 @@ def op_substr_utf16(data=None, string=None, index=None, length=None, *_ignored)
             else:
                 end_index = index + length
 
-    return string[index:end_index].tobytes().decode('UTF-16BE', errors='replace')
+    # split surrogate pairs become replacement characters
+    return encoded[index * 2:end_index * 2].decode('UTF-16BE', errors='replace')
 
 def op_missing(data=None, *args: Any) -> List[str]:
     keys: Iterable[Any]
@@ -0,0 +1,215 @@
+"""
+Result caches for compiled rules.
+
+Many rules only read a handful of `var` paths, and over many records these
+paths often have only a few distinct values. `CachedRule` compiles a rule and
+caches its results in a bounded LRU cache keyed by the values of exactly the
+paths the rule reads:
+
+    rule = CachedRule({"in": [{"var": "country"}, ["AT", "DE"]]}, maxsize=1024)
+    rule({"country": "AT", "name": "..."})
+    rule.stats()
+
+The paths are determined statically (see `input_paths()`). Rules that can't
+be cached are evaluated without a cache:
+
+* rules that read dynamic paths (like `{"var": {"cat": ["a.", {"var": "b"}]}}`)
+  or the whole data (`{"var": ""}`)
+* rules with operations that aren't registered as pure (see
+  `json_logic.purity`), like `now`, `timeSince` and `log`
+
+If a path has a value that is not a string, number, boolean or `null` (e.g.
+the list that `map` iterates over) that evaluation bypasses the cache.
+"""
+
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from collections import OrderedDict
+from threading import Lock
+
+from .types import JsonValue, Operations
+from .builtins import BUILTINS, op_var, op_missing, op_missing_some
+from .apply import resolve_operation
+from .compile import COLLECTION_OPS, UNSET, Compiled, compile, fold, is_pure_logic
+
+__all__ = 'CachedRule', 'input_paths'
+
+def input_paths(logic: JsonValue, operations: Operations=BUILTINS) -> Optional[List[Any]]:
+    """
+    The `var`, `missing` and `missing_some` keys that `logic` reads from the
+    data, in order of their first occurrence, or `None` if the result of
+    `logic` doesn't only depend on the values of these keys.
+    """
+    if not is_pure_logic(logic, operations):
+        return None
+
+    paths: Dict[Any, None] = {}
+    if not _collect_paths(logic, operations, paths):
+        return None
+
+    return list(paths)
+
+def _is_key(key: Any) -> bool:
+    return (isinstance(key, str) and key != '') or (isinstance(key, (int, float)) and not isinstance(key, bool))
+
+def _collect_paths(logic: JsonValue, operations: Operations, paths: Dict[Any, None]) -> bool:
+    if isinstance(logic, list):
+        return all(_collect_paths(item, operations, paths) for item in logic)
+
+    if not isinstance(logic, dict) or len(logic) != 1:
+        return True
+
+    op, args = next(iter(logic.items()))
+
+    if not isinstance(args, list):
+        args = [args]
+
+    if op in COLLECTION_OPS:
+        # the sub-logic only reads the items, which are read from the data by
+        # the first argument, and the initial value of `reduce` is not
+        # evaluated
+        return _collect_paths(args[0], operations, paths) if args else True
+
+    if op not in ('if', '?:', 'and', 'or'):
+        # is_pure_logic() made sure that this resolves
+        operation = resolve_operation(op, operations)
+
+        if operation is op_var:
+            if not args or not _is_key(args[0]):
+                # dynamic path or the whole data
+                return False
+            paths[args[0]] = None
+            return _collect_paths(args[1:], operations, paths)
+
+        if operation is op_missing or operation is op_missing_some:
+            if operation is op_missing_some:
+                if len(args) != 2 or not _collect_paths(args[0], operations, paths):
+                    return False
+                keys = args[1]
+            else:
+                keys = args[0] if args and isinstance(args[0], list) else args
+
+            if not isinstance(keys, list) or not all(_is_key(key) for key in keys):
+                return False
+
+            for key in keys:
+                paths[key] = None
+            return True
+
+    return all(_collect_paths(arg, operations, paths) for arg in args)
+
+# Values that are equal in Python might still give different results (e.g. `1`,
+# `1.0` and `true` in `cat`), so the key contains the types of the values, too.
+# Floats are represented by their repr(), which tells apart 0.0 and -0.0 and
+# makes NaN equal to itself.
+PLAIN_TYPES  = frozenset((str, type(None), bool, int))
+SCALAR_TYPES = frozenset((str, type(None), bool, int, float))
+
+def _compile_getter(path: Any) -> Callable[[JsonValue], JsonValue]:
+    if isinstance(path, str) and '.' not in path:
+        # inlined op_var() for the common case of a field of an object
+        return lambda data: data.get(path) if type(data) is dict else op_var(data, path)
+
+    return lambda data: op_var(data, path)
+
+class CachedRule:
+    """
+    Compiled rule with a result cache, see the module documentation. Cached
+    results are shared between calls, so don't mutate them. Exceptions are
+    not cached. Thread-safe.
+    """
+    __slots__ = 'logic', 'operations', 'paths', 'maxsize', 'hits', 'misses', 'bypasses', '_func', '_getters', '_cache', '_lock'
+
+    logic: JsonValue
+    operations: Operations
+    # `None` if the rule can't be cached
+    paths: Optional[List[Any]]
+    maxsize: int
+    hits: int
+    misses: int
+    bypasses: int
+
+    _func: Compiled
+    _getters: List[Callable[[JsonValue], JsonValue]]
+    _cache: 'OrderedDict[Tuple[Tuple[type, ...], Tuple[Hashable, ...]], JsonValue]'
+    _lock: Lock
+
+    def __init__(self, logic: JsonValue, operations: Operations=BUILTINS, maxsize: int=4096, cse: bool=False) -> None:
+        if maxsize <= 0:
+            raise ValueError(f'illegal maxsize: {maxsize!r}')
+
+        self.logic      = logic
+        self.operations = operations
+        self.paths      = input_paths(fold(logic, operations), operations)
+        self.maxsize    = maxsize
+        self.hits       = 0
+        self.misses     = 0
+        self.bypasses   = 0
+        self._func  = compile(logic, operations, cse)
+        self._getters = [_compile_getter(path) for path in self.paths] if self.paths is not None else []
+        self._cache = OrderedDict()
+        self._lock  = Lock()
+
+    @property
+    def cacheable(self) -> bool:
+        return self.paths is not None
+
+    def __call__(self, data: JsonValue=None) -> JsonValue:
+        if self.paths is None:
+            return self._func(data)
+
+        values = tuple([get(data) for get in self._getters])
+        types  = tuple([type(value) for value in values])
+        if not PLAIN_TYPES.issuperset(types):
+            if not SCALAR_TYPES.issuperset(types):
+                with self._lock:
+                    self.bypasses += 1
+                return self._func(data)
+
+            values = tuple([repr(value) if type(value) is float else value for value in values])
+
+        key = (types, values)
+        cache = self._cache
+        with self._lock:
+            result = cache.get(key, UNSET)
+            if result is not UNSET:
+                cache.move_to_end(key)
+                self.hits += 1
+                return result
+
+        result = self._func(data)
+
+        with self._lock:
+            self.misses += 1
+            cache[key] = result
+            if len(cache) > self.maxsize:
+                cache.popitem(last=False)
+
+        return result
+
+    def hit_rate(self) -> float:
+        """
+        Share of the evaluations that were answered from the cache, including
+        the evaluations that bypassed the cache.
+        """
+        total = self.hits + self.misses + self.bypasses
+        return self.hits / total if total else 0.0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+            self.hits     = 0
+            self.misses   = 0
+            self.bypasses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'cacheable': self.paths is not None,
+                'hits':      self.hits,
+                'misses':    self.misses,
+                'bypasses':  self.bypasses,
+                'size':      len(self._cache),
+                'maxsize':   self.maxsize,
+                'hit_rate':  self.hit_rate(),
+            }
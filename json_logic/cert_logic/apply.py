@@ -1,76 +1,109 @@
-from typing import Dict
+from typing import Callable, Dict, Optional
 
 from ..types import JsonValue, Operations
-from .builtins import BUILTINS, to_bool, not_
+from ..apply import Apply
+from .builtins import BUILTINS, INSTANT_OPERATIONS, to_bool, not_, op_plus_time, op_plus_time_instant
 
-def apply(logic: JsonValue, data: JsonValue=None, operations: Operations=BUILTINS) -> JsonValue:
-    if isinstance(logic, list):
-        return [apply(item, data, operations) for item in logic]
+def make_apply(wrap: Optional[Callable[[Apply], Apply]]=None) -> Apply:
+    """
+    Create the evaluator, see `json_logic.apply.make_apply()`.
+    """
+    def apply(logic: JsonValue, data: JsonValue=None, operations: Operations=BUILTINS) -> JsonValue:
+        if isinstance(logic, list):
+            return [evaluate(item, data, operations) for item in logic]
 
-    if not isinstance(logic, dict) or len(logic) != 1:
-        return logic
+        if not isinstance(logic, dict) or len(logic) != 1:
+            return logic
 
-    op: str = next(iter(logic))
-    args = logic[op]
+        op: str = next(iter(logic))
+        args = logic[op]
 
-    if not isinstance(args, list):
-        args = [args]
+        if not isinstance(args, list):
+            args = [args]
 
-    if op == 'if':
-        argc = len(args)
-        if argc < 1:
-            return None
+        if op == 'if':
+            argc = len(args)
+            if argc < 1:
+                return None
 
-        if to_bool(apply(args[0], data, operations)):
-            if argc < 2:
+            if to_bool(evaluate(args[0], data, operations)):
+                if argc < 2:
+                    return None
+                return evaluate(args[1], data, operations)
+            else:
+                if argc < 3:
+                    return None
+                return evaluate(args[2], data, operations)
+
+        elif op == 'and':
+            current = None
+            for arg in args:
+                current = evaluate(arg, data, operations)
+                if not_(current):
+                    return current
+            return current
+
+        elif op == 'reduce':
+            argc = len(args)
+            if argc < 1:
                 return None
-            return apply(args[1], data, operations)
+
+            items    = evaluate(args[0], data, operations)
+            sublogic = args[1] if argc > 1 else None
+            init     = args[2] if argc > 2 else None
+
+            if not isinstance(items, list):
+                return init
+
+            context: Dict[str, JsonValue] = {
+                'accumulator': init,
+                'data':        data,
+            }
+            for item in items:
+                context['current']     = item
+                context['accumulator'] = evaluate(sublogic, context, operations)
+
+            return context['accumulator']
+
+        if op in INSTANT_OPERATIONS and operations.get(op) is INSTANT_OPERATIONS[op]:
+            args = [evaluate_instant(arg, data, operations) for arg in args]
         else:
-            if argc < 3:
-                return None
-            return apply(args[2], data, operations)
-
-    elif op == 'and':
-        current = None
-        for arg in args:
-            current = apply(arg, data, operations)
-            if not_(current):
-                return current
-        return current
-
-    elif op == 'reduce':
-        argc = len(args)
-        if argc < 1:
-            return None
-
-        items    = apply(args[0], data, operations)
-        sublogic = args[1] if argc > 1 else None
-        init     = args[2] if argc > 2 else None
-
-        if not isinstance(items, list):
-            return init
-
-        context: Dict[str, JsonValue] = {
-            'accumulator': init,
-            'data':        data,
-        }
-        for item in items:
-            context['current']     = item
-            context['accumulator'] = apply(sublogic, context, operations)
-
-        return context['accumulator']
-
-    args = [apply(arg, data, operations) for arg in args]
-
-    if op in operations:
-        return operations[op](data, *args) # type: ignore
-    elif '.' in op:
-        props = op.split('.')
-        ops = operations
-        for index, prop in enumerate(props):
-            if isinstance(ops, dict) and prop not in ops:
-                raise ReferenceError(f"Unrecognized operation {'.'.join(props[:index + 1])}")
-            ops = ops[prop] # type: ignore
-        return ops(data, *args) # type: ignore
-
-    raise ReferenceError(f"Unrecognized operation {op}")
+            args = [evaluate(arg, data, operations) for arg in args]
+
+        if op in operations:
+            return operations[op](data, *args) # type: ignore
+        elif '.' in op:
+            props = op.split('.')
+            ops = operations
+            for index, prop in enumerate(props):
+                if isinstance(ops, dict) and prop not in ops:
+                    raise ReferenceError(f"Unrecognized operation {'.'.join(props[:index + 1])}")
+                ops = ops[prop] # type: ignore
+            return ops(data, *args) # type: ignore
+
+        raise ReferenceError(f"Unrecognized operation {op}")
+
+    def apply_instant(logic: JsonValue, data: JsonValue, operations: Operations) -> JsonValue:
+        """
+        Like `apply()`, but `plusTime` gives an `Instant` instead of a `datetime`.
+        """
+        if isinstance(logic, dict) and len(logic) == 1 and 'plusTime' in logic and operations.get('plusTime') is op_plus_time:
+            args = logic['plusTime']
+            if not isinstance(args, list):
+                args = [args]
+            return op_plus_time_instant(data, *[evaluate(arg, data, operations) for arg in args])
+
+        return apply(logic, data, operations)
+
+    if wrap is None:
+        evaluate = apply
+        evaluate_instant = apply_instant
+    else:
+        evaluate = wrap(apply)
+        evaluate_instant = wrap(apply_instant)
+
+    return evaluate
+
+apply = make_apply()
+# picklable by reference like a module level function
+apply.__qualname__ = 'apply'
@@ -1,7 +1,8 @@
 from __future__ import annotations
 
-from typing import Any, Optional
+from typing import Any, Optional, Pattern, Tuple
 from datetime import datetime, date, time, timedelta, timezone, tzinfo
+from functools import lru_cache
 from math import isnan
 
 import re
@@ -9,8 +10,14 @@ import re
 from ..types import Operations
 from ..builtins import to_number, to_string, op_var, op_in, op_less_than, op_less_than_or_equal, op_greater_than, op_greater_than_or_equal
 
-DATE_PATTERN = re.compile(r'^(\d{4})-(\d{2})-(\d{2})$')
-DATE_TIME_PATTERN = re.compile(r'^(?P<year>\d{4})-(?P<month>\d{2})-(?P<day>\d{2})T(?P<hour>\d{2}):(?P<minute>\d{2}):(?P<second>\d{2}(\.\d+?)?)(?:Z|(?:(?P<tzsign>[+-])(?P<tzhour>\d{1,2}):?(?P<tzminute>\d{2})?))?$')
+# Regular expressions are compiled on first use via `pattern()`, so importing
+# this module stays cheap for processes that never parse a date.
+DATE_PATTERN = r'^(\d{4})-(\d{2})-(\d{2})$'
+DATE_TIME_PATTERN = r'^(?P<year>\d{4})-(?P<month>\d{2})-(?P<day>\d{2})T(?P<hour>\d{2}):(?P<minute>\d{2}):(?P<second>\d{2}(\.\d+?)?)(?:Z|(?:(?P<tzsign>[+-])(?P<tzhour>\d{1,2}):?(?P<tzminute>\d{2})?))?$'
+
+@lru_cache(maxsize=None)
+def pattern(source: str) -> Pattern[str]:
+    return re.compile(source)
 
 def to_bool(value: Any=None) -> bool:
     if value is None:
@@ -63,11 +70,11 @@ def parse_time(value: Any) -> datetime:
 
     value = to_string(value)
 
-    match = DATE_PATTERN.match(value)
+    match = pattern(DATE_PATTERN).match(value)
     if match:
         return datetime(int(match[1]), int(match[2]), int(match[3]), tzinfo=timezone.utc)
 
-    match = DATE_TIME_PATTERN.match(value)
+    match = pattern(DATE_TIME_PATTERN).match(value)
     if match is None:
         raise ValueError(f'illegal date-time string: {value!r}')
 
@@ -98,9 +105,85 @@ def to_int(value: Any) -> int:
         return 0
     return int(value)
 
-def op_plus_time(data=None, dtstr=None, value=None, unit=None, *_ignored) -> datetime:
-    dt = parse_time(dtstr)
+MICROSECOND = timedelta(microseconds=1)
+MICROSECONDS_PER_HOUR = 3_600_000_000
+MICROSECONDS_PER_DAY  = 86_400_000_000
+
+LOCAL_EPOCH = datetime(1970, 1, 1)
+EPOCH_ORDINAL = LOCAL_EPOCH.toordinal()
+
+# range of the local time of a datetime in microseconds since the epoch
+MIN_LOCAL = (datetime.min - LOCAL_EPOCH) // MICROSECOND
+MAX_LOCAL = (datetime.max - LOCAL_EPOCH) // MICROSECOND
+
+# Rules compare the same few date-time strings over and over (the dates of a
+# certificate, the validation clock).
+DATE_CACHE_SIZE = 4096
+
+class Instant:
+    """
+    Date-time used internally by the date operations: integer microseconds
+    since the epoch and the UTC offset of the original value in microseconds.
+    Comparisons and adding days or hours are integer operations. Only values
+    that leave the date operations are converted to `datetime`.
+    """
+    __slots__ = 'micros', 'offset'
+
+    micros: int
+    offset: int
+
+    def __init__(self, micros: int, offset: int) -> None:
+        self.micros = micros
+        self.offset = offset
+
+    def to_datetime(self) -> datetime:
+        local = LOCAL_EPOCH + timedelta(microseconds=self.micros + self.offset)
+        return local.replace(tzinfo=fixed_timezone(self.offset))
 
+    def __repr__(self) -> str:
+        return f'Instant({self.micros!r}, {self.offset!r})'
+
+@lru_cache(maxsize=None)
+def fixed_timezone(offset: int) -> tzinfo:
+    return timezone.utc if offset == 0 else timezone(timedelta(microseconds=offset))
+
+def datetime_instant(dt: datetime) -> Instant:
+    offset = dt.utcoffset() // MICROSECOND # type: ignore
+    local = (dt.replace(tzinfo=None) - LOCAL_EPOCH) // MICROSECOND
+    return Instant(local - offset, offset)
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def parse_instant(value: str) -> Instant:
+    return datetime_instant(parse_time(value))
+
+def to_instant(value: Any) -> Instant:
+    vtype = type(value)
+    if vtype is Instant:
+        return value
+
+    if vtype is str:
+        # instants are never mutated, so they can be shared
+        return parse_instant(value)
+
+    return datetime_instant(parse_time(value))
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def civil_date(days: int) -> Tuple[int, int, int]:
+    """
+    Year, month and day of the day `days` after 1970-01-01.
+    """
+    day = date.fromordinal(days + EPOCH_ORDINAL)
+    return day.year, day.month, day.day
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def epoch_days(year: int, month: int, day: int) -> int:
+    """
+    Inverse of `civil_date()`, raises `ValueError` for invalid dates just like
+    `datetime.replace()`.
+    """
+    return date(year, month, day).toordinal() - EPOCH_ORDINAL
+
+def _plus_time_datetime(dt: datetime, value: Any, unit: Any) -> datetime:
     if unit == 'year':
         return dt.replace(year=dt.year + to_int(value))
 
@@ -120,44 +203,110 @@ def op_plus_time(data=None, dtstr=None, value=None, unit=None, *_ignored) -> dat
 
     raise ValueError(f'illegal unit: {unit!r}')
 
+def plus_time(dtstr: Any, value: Any, unit: Any) -> Instant:
+    """
+    `plusTime` as `Instant`. Gives the same results as adding to a `datetime`
+    with a fixed UTC offset, i.e. there is no DST.
+    """
+    if isinstance(dtstr, datetime) and dtstr.tzinfo is not None and type(dtstr.tzinfo) is not timezone:
+        # time zone with DST, keep the wall clock arithmetic of datetime
+        return datetime_instant(_plus_time_datetime(dtstr, value, unit))
+
+    instant = to_instant(dtstr)
+    offset  = instant.offset
+
+    if unit == 'day' or unit == 'hour':
+        number = to_number(value)
+        if isinstance(number, int):
+            delta = number * (MICROSECONDS_PER_DAY if unit == 'day' else MICROSECONDS_PER_HOUR)
+        else:
+            # same rounding (and errors for NaN and infinity) as timedelta
+            delta = (timedelta(days=number) if unit == 'day' else timedelta(hours=number)) // MICROSECOND
+
+        micros = instant.micros + delta
+        if not MIN_LOCAL <= micros + offset <= MAX_LOCAL:
+            raise OverflowError('date value out of range')
+
+        return Instant(micros, offset)
+
+    if unit == 'year' or unit == 'month':
+        days, time_of_day = divmod(instant.micros + offset, MICROSECONDS_PER_DAY)
+        year, month, day = civil_date(days)
+
+        if unit == 'year':
+            year += to_int(value)
+        else:
+            month += to_int(value)
+            years  = (month - 1) // 12
+            year  += years
+            month -= years * 12
+
+        return Instant(epoch_days(year, month, day) * MICROSECONDS_PER_DAY + time_of_day - offset, offset)
+
+    raise ValueError(f'illegal unit: {unit!r}')
+
+def op_plus_time(data=None, dtstr=None, value=None, unit=None, *_ignored) -> datetime:
+    if isinstance(dtstr, datetime) and dtstr.tzinfo is not None and type(dtstr.tzinfo) is not timezone:
+        return _plus_time_datetime(dtstr, value, unit)
+
+    return plus_time(dtstr, value, unit).to_datetime()
+
+def op_plus_time_instant(data=None, dtstr=None, value=None, unit=None, *_ignored) -> Instant:
+    return plus_time(dtstr, value, unit)
+
 OPTIONAL_PREFIX = "URN:UVCI:"
-UVCI_SPLIT = re.compile('[/#:]')
+UVCI_SPLIT = '[/#:]'
+
+# Rules usually extract several fragments of the same UVCI, and in a batch
+# the same certificates are checked by several rules.
+UVCI_CACHE_SIZE = 1024
+
+@lru_cache(maxsize=UVCI_CACHE_SIZE)
+def split_uvci(uvci: str) -> Tuple[str, ...]:
+    if uvci.startswith(OPTIONAL_PREFIX):
+        uvci = uvci[len(OPTIONAL_PREFIX):]
+
+    return tuple(pattern(UVCI_SPLIT).split(uvci))
 
 def op_extract_from_uvci(data=None, uvci=None, index=None, *_ignored) -> Optional[str]:
     index = to_int(index)
     if uvci is None or index < 0:
         return None
 
-    uvci = to_string(uvci)
-    if uvci.startswith(OPTIONAL_PREFIX):
-        uvci = uvci[len(OPTIONAL_PREFIX):]
-
-    fragments = UVCI_SPLIT.split(uvci)
+    fragments = split_uvci(uvci if type(uvci) is str else to_string(uvci))
     return fragments[index] if index < len(fragments) else None
 
-def op_after(data=None, a=None, b=None, c=None, *_ignored):
+def op_after(data=None, a=None, b=None, c=None, *_ignored) -> bool:
+    a = to_instant(a).micros
+    b = to_instant(b).micros
     if c is None:
-        return parse_time(a) > parse_time(b)
+        return a > b
 
-    return parse_time(a) > parse_time(b) and parse_time(b) > parse_time(c)
+    return a > b and b > to_instant(c).micros
 
-def op_before(data=None, a=None, b=None, c=None, *_ignored):
+def op_before(data=None, a=None, b=None, c=None, *_ignored) -> bool:
+    a = to_instant(a).micros
+    b = to_instant(b).micros
     if c is None:
-        return parse_time(a) < parse_time(b)
+        return a < b
 
-    return parse_time(a) < parse_time(b) and parse_time(b) < parse_time(c)
+    return a < b and b < to_instant(c).micros
 
-def op_not_after(data=None, a=None, b=None, c=None, *_ignored):
+def op_not_after(data=None, a=None, b=None, c=None, *_ignored) -> bool:
+    a = to_instant(a).micros
+    b = to_instant(b).micros
     if c is None:
-        return parse_time(a) <= parse_time(b)
+        return a <= b
 
-    return parse_time(a) <= parse_time(b) and parse_time(b) <= parse_time(c)
+    return a <= b and b <= to_instant(c).micros
 
-def op_not_before(data=None, a=None, b=None, c=None, *_ignored):
+def op_not_before(data=None, a=None, b=None, c=None, *_ignored) -> bool:
+    a = to_instant(a).micros
+    b = to_instant(b).micros
     if c is None:
-        return parse_time(a) >= parse_time(b)
+        return a >= b
 
-    return parse_time(a) >= parse_time(b) and parse_time(b) >= parse_time(c)
+    return a >= b and b >= to_instant(c).micros
 
 BUILTINS: Operations = {
     '===': lambda data=None, a=None, b=None, *_ignored: a == b,
@@ -176,3 +325,13 @@ BUILTINS: Operations = {
     'plusTime':        op_plus_time,
     'extractFromUVCI': op_extract_from_uvci,
 }
+
+# Operations that take `Instant` arguments. `apply()` evaluates `plusTime`
+# arguments of these operations with `op_plus_time_instant()`, so the result
+# is never converted to a `datetime`.
+INSTANT_OPERATIONS: Operations = {
+    'before':     op_before,
+    'not-before': op_not_before,
+    'after':      op_after,
+    'not-after':  op_not_after,
+}
@@ -0,0 +1,87 @@
+from typing import Any, Dict, List, Optional
+
+import socket
+
+from .types import JsonValue
+from .protocol import HEADER, encode_message, decode_message
+
+__all__ = 'Client', 'ServerError'
+
+class ServerError(Exception):
+    """
+    An error reported by the evaluation server.
+    """
+    def __init__(self, error_type: str, message: str) -> None:
+        super().__init__(f'{error_type}: {message}')
+        self.error_type = error_type
+        self.message    = message
+
+class Client:
+    """
+    Client for `json_logic.server` over a Unix domain socket.
+
+    Requests can be pipelined by calling `submit()` several times and then
+    `result()` for each returned request id.
+    """
+    def __init__(self, path: str) -> None:
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.connect(path)
+        self._reader = self._socket.makefile('rb')
+        self._next_id = 0
+        self._responses: Dict[int, Dict[str, Any]] = {}
+
+    def close(self) -> None:
+        self._reader.close()
+        self._socket.close()
+
+    def __enter__(self) -> 'Client':
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def submit(self, op: str, **params: JsonValue) -> int:
+        request_id = self._next_id
+        self._next_id += 1
+        self._socket.sendall(encode_message({'id': request_id, 'op': op, **params}))
+        return request_id
+
+    def result(self, request_id: int) -> JsonValue:
+        response = self._responses.pop(request_id, None)
+        while response is None:
+            header = self._reader.read(HEADER.size)
+            if len(header) < HEADER.size:
+                raise ConnectionError('connection closed by server')
+
+            size, = HEADER.unpack(header)
+            payload = self._reader.read(size)
+            if len(payload) < size:
+                raise ConnectionError('connection closed by server')
+
+            message = decode_message(payload)
+            message_id = message.get('id')
+            if message_id == request_id:
+                response = message
+            elif message_id is None and 'error' in message:
+                error = message['error']
+                raise ServerError(error.get('type'), error.get('message'))
+            else:
+                self._responses[message_id] = message
+
+        error = response.get('error')
+        if error is not None:
+            raise ServerError(error.get('type'), error.get('message'))
+
+        return response.get('result')
+
+    def register_rule(self, rule_id: str, logic: JsonValue) -> None:
+        self.result(self.submit('register_rule', rule=rule_id, logic=logic))
+
+    def evaluate(self, rule_id: str, data: JsonValue=None) -> JsonValue:
+        return self.result(self.submit('eval', rule=rule_id, data=data))
+
+    def evaluate_many(self, rule_id: str, items: List[JsonValue]) -> List[JsonValue]:
+        return self.result(self.submit('eval', rule=rule_id, items=items)) # type: ignore
+
+    def stats(self) -> Dict[str, Optional[Dict[str, JsonValue]]]:
+        return self.result(self.submit('stats')) # type: ignore
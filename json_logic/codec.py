@@ -0,0 +1,114 @@
+"""
+Pluggable JSON codecs.
+
+`orjson` or `ujson` are used when they are installed, otherwise the `json`
+module of the standard library. All codecs parse `bytes` or `str` and
+serialize to compact UTF-8 encoded `bytes`. Dates and datetimes are written as
+ISO 8601 strings, `orjson` does that natively.
+
+Differences between the codecs: `orjson` writes NaN and Infinity as `null`
+(like `JSON.stringify()`) while the standard library writes the non-standard
+`NaN` and `Infinity` tokens, and `orjson` only supports integers up to 64 bit.
+"""
+
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Union
+
+from .types import JsonValue, Operations
+from .builtins import BUILTINS, json_default
+from .apply import apply
+
+__all__ = 'Codec', 'CODEC_NAMES', 'get_codec', 'available_codecs', 'evaluate_json'
+
+class Codec(NamedTuple):
+    name: str
+    loads: Callable[[Union[bytes, str]], Any]
+    dumps: Callable[[Any], bytes]
+
+# in order of preference
+CODEC_NAMES = 'orjson', 'ujson', 'json'
+
+def _make_orjson() -> Codec:
+    import orjson
+
+    dumps = orjson.dumps
+    def orjson_dumps(value: Any) -> bytes:
+        # orjson handles date and datetime by itself
+        return dumps(value, default=json_default)
+
+    return Codec('orjson', orjson.loads, orjson_dumps)
+
+def _make_ujson() -> Codec:
+    import ujson
+
+    dumps = ujson.dumps
+    def ujson_dumps(value: Any) -> bytes:
+        return dumps(value, ensure_ascii=False, escape_forward_slashes=False, default=json_default).encode('UTF-8')
+
+    return Codec('ujson', ujson.loads, ujson_dumps)
+
+def _make_json() -> Codec:
+    import json
+
+    encode = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), default=json_default).encode
+    def json_dumps(value: Any) -> bytes:
+        return encode(value).encode('UTF-8')
+
+    return Codec('json', json.loads, json_dumps)
+
+_FACTORIES: Dict[str, Callable[[], Codec]] = {
+    'orjson': _make_orjson,
+    'ujson':  _make_ujson,
+    'json':   _make_json,
+}
+
+_codecs: Dict[str, Codec] = {}
+
+def get_codec(name: Optional[str]=None) -> Codec:
+    """
+    Return the codec with the given name or the preferred installed codec if
+    `name` is `None`. Raises `ImportError` if the requested library is not
+    installed.
+    """
+    if name is None:
+        for name in CODEC_NAMES:
+            try:
+                return get_codec(name)
+            except ImportError:
+                pass
+        raise AssertionError('the json module is always available')
+
+    codec = _codecs.get(name)
+    if codec is None:
+        factory = _FACTORIES.get(name)
+        if factory is None:
+            raise ValueError(f'unknown codec: {name!r}')
+        codec = _codecs[name] = factory()
+
+    return codec
+
+def available_codecs() -> List[str]:
+    names: List[str] = []
+    for name in CODEC_NAMES:
+        try:
+            get_codec(name)
+        except ImportError:
+            pass
+        else:
+            names.append(name)
+    return names
+
+def evaluate_json(
+        rule: Union[bytes, str],
+        data: Union[bytes, str, None]=None,
+        operations: Operations=BUILTINS,
+        codec: Optional[Codec]=None) -> bytes:
+    """
+    Parse the JSON encoded `rule` and `data`, apply the rule and return the
+    JSON encoded result.
+    """
+    if codec is None:
+        codec = get_codec()
+    loads = codec.loads
+    logic: JsonValue = loads(rule)
+    value: JsonValue = loads(data) if data is not None else None
+    return codec.dumps(apply(logic, value, operations))
@@ -0,0 +1,1151 @@
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from contextvars import ContextVar
+from operator import lt, gt, le, ge
+
+from .types import JsonValue, Operations
+from .builtins import (
+    BUILTINS, NUMERIC, to_bool, not_, to_number, to_string, op_var, op_add, op_mul, op_in,
+    op_less_than, op_greater_than, op_less_than_or_equal, op_greater_than_or_equal,
+    op_missing, op_missing_some,
+)
+from .apply import apply, resolve_operation
+from .purity import is_pure, is_cacheable
+from .intern import RuleInterner
+from .pathtrie import PathTrie
+from .extras import op_combinations, op_zip, op_iter_combinations, op_iter_zip
+
+__all__ = 'compile', 'partial', 'fold', 'Compiled', 'Constant'
+
+Compiled = Callable[[JsonValue], JsonValue]
+
+COLLECTION_OPS = frozenset(('filter', 'reduce', 'map', 'all', 'some', 'none'))
+
+# Lazy variants of operations that produce lists. When such an operation gives
+# the items of a collection operation the lazy variant is used instead, so
+# `some`, `none` and `all` can stop early and `reduce` streams the items
+# without ever building the whole list. A lazy variant has the same arguments
+# and returns an iterator over the same items. Add your own operations here.
+LAZY_OPERATIONS: Dict[Any, Callable[..., Iterator[JsonValue]]] = {
+    op_combinations: op_iter_combinations,
+    op_zip:          op_iter_zip,
+}
+
+class Constant:
+    """
+    Compiled form of a sub-expression that doesn't depend on the data.
+    """
+    __slots__ = 'value',
+
+    def __init__(self, value: JsonValue) -> None:
+        self.value = value
+
+    def __call__(self, data: JsonValue=None) -> JsonValue:
+        return self.value
+
+    def __repr__(self) -> str:
+        return f'Constant({self.value!r})'
+
+def is_literal(value: Any) -> bool:
+    """
+    Whether `value` can be put into a rule and evaluates to an equal value.
+    """
+    if isinstance(value, list):
+        return all(is_literal(item) for item in value)
+
+    if isinstance(value, dict):
+        return len(value) != 1
+
+    return True
+
+def is_known_path(data: JsonValue, key: Any) -> bool:
+    """
+    Whether `{"var": key}` has the same value for `data` and for any data that
+    `data` is deep-merged into.
+    """
+    if not isinstance(data, dict) or not isinstance(key, str) or not key:
+        return False
+
+    for prop in key.split('.'):
+        if not isinstance(data, dict):
+            # lists, strings and scalars are known as a whole
+            return True
+
+        if prop not in data:
+            return False
+
+        data = data[prop]
+
+    return True
+
+def is_pure_logic(logic: JsonValue, operations: Operations) -> bool:
+    """
+    Whether `logic` only uses operations that don't have side effects and only
+    read the data through `var`, `missing` and `missing_some`.
+    """
+    if isinstance(logic, list):
+        return all(is_pure_logic(item, operations) for item in logic)
+
+    if not isinstance(logic, dict) or len(logic) != 1:
+        return True
+
+    op, args = next(iter(logic.items()))
+
+    if not isinstance(args, list):
+        args = [args]
+
+    if op == 'reduce':
+        # the initial value is not evaluated
+        args = args[:2]
+    elif op not in ('if', '?:', 'and', 'or') and op not in COLLECTION_OPS:
+        try:
+            operation = resolve_operation(op, operations)
+        except Exception:
+            return False
+
+        if not is_pure(operation) and operation is not op_var and \
+                operation is not op_missing and operation is not op_missing_some:
+            return False
+
+    return all(is_pure_logic(arg, operations) for arg in args)
+
+Partial = Tuple[JsonValue, bool, Any]
+
+def _node(op: str, args: Any, residual_args: List[JsonValue]) -> JsonValue:
+    if not isinstance(args, list) and not isinstance(residual_args[0], list):
+        return {op: residual_args[0]}
+    return {op: residual_args}
+
+def _known(value: Any, node: JsonValue) -> Partial:
+    return (value if is_literal(value) else node), True, value
+
+def _partial(logic: JsonValue, known: Optional[dict], operations: Operations) -> Partial:
+    """
+    Returns a tuple of the residual logic, whether the value is known and the
+    value itself.
+    """
+    if isinstance(logic, list):
+        residual: List[JsonValue] = []
+        values: List[Any] = []
+        is_known = True
+        for item in logic:
+            item_residual, item_known, item_value = _partial(item, known, operations)
+            residual.append(item_residual)
+            values.append(item_value)
+            is_known = is_known and item_known
+        return residual, is_known, (values if is_known else None)
+
+    if not isinstance(logic, dict) or len(logic) != 1:
+        return logic, True, logic
+
+    op, raw_args = next(iter(logic.items()))
+    args = raw_args if isinstance(raw_args, list) else [raw_args]
+    argc = len(args)
+
+    if op == 'if' or op == '?:':
+        residual = []
+        last_index = argc - 1
+        index = 0
+        while index < last_index:
+            cond_residual, cond_known, cond_value = _partial(args[index], known, operations)
+            if cond_known:
+                if to_bool(cond_value):
+                    if not residual:
+                        return _partial(args[index + 1], known, operations)
+                    residual.append(_partial(args[index + 1], known, operations)[0])
+                    break
+            else:
+                residual.append(cond_residual)
+                residual.append(_partial(args[index + 1], known, operations)[0])
+            index += 2
+        else:
+            else_logic = args[index] if index < argc else None
+            if not residual:
+                return _partial(else_logic, known, operations)
+            residual.append(_partial(else_logic, known, operations)[0])
+
+        return {op: residual}, False, None
+
+    elif op == 'and' or op == 'or':
+        stop = not_ if op == 'and' else to_bool
+        residual = []
+        for index, arg in enumerate(args):
+            arg_residual, arg_known, arg_value = _partial(arg, known, operations)
+            if arg_known:
+                if stop(arg_value):
+                    if not residual:
+                        return arg_residual, True, arg_value
+                    residual.append(arg_residual)
+                    break
+
+                if index + 1 < argc:
+                    # doesn't change the result
+                    continue
+
+                if not residual:
+                    return arg_residual, True, arg_value
+
+            residual.append(arg_residual)
+
+        if not residual:
+            return None, True, None
+
+        if len(residual) == 1:
+            return residual[0], False, None
+
+        return {op: residual}, False, None
+
+    elif op in COLLECTION_OPS:
+        if argc == 0:
+            value = apply(logic, None, operations)
+            return _known(value, logic)
+
+        items_residual, items_known, items_value = _partial(args[0], known, operations)
+        # the data of the sub-logic is the current item, which isn't known here
+        rest = [_partial(args[1], None, operations)[0]] if argc > 1 else []
+        if op == 'reduce':
+            # the initial value is not evaluated
+            rest.extend(args[2:])
+        else:
+            rest.extend(_partial(arg, None, operations)[0] for arg in args[2:])
+
+        residual = {op: [items_residual, *rest]}
+
+        if items_known and operations.get('var') is op_var and is_pure_logic(rest[:1], operations):
+            try:
+                value = apply({op: [{'var': ''}, *rest]}, items_value, operations)
+            except Exception:
+                pass
+            else:
+                return _known(value, residual)
+
+        return residual, False, None
+
+    residual_args: List[JsonValue] = []
+    values = []
+    is_known = True
+    for arg in args:
+        arg_residual, arg_known, arg_value = _partial(arg, known, operations)
+        residual_args.append(arg_residual)
+        values.append(arg_value)
+        is_known = is_known and arg_known
+
+    residual = _node(op, raw_args, residual_args) if residual_args else {op: []}
+
+    if not is_known:
+        return residual, False, None
+
+    try:
+        operation = resolve_operation(op, operations)
+    except Exception:
+        return residual, False, None
+
+    if operation is op_var:
+        if not values or not is_known_path(known, values[0]):
+            return residual, False, None
+        data = known
+
+    elif operation is op_missing or operation is op_missing_some:
+        keys = values[1] if operation is op_missing_some else \
+            values[0] if values and isinstance(values[0], list) else values
+        if not isinstance(keys, list) or not all(is_known_path(known, key) for key in keys):
+            return residual, False, None
+        data = known
+
+    elif is_pure(operation):
+        data = None
+
+    else:
+        return residual, False, None
+
+    try:
+        value = operation(data, *values)
+    except Exception:
+        # raise the error when the rule is actually evaluated
+        return residual, False, None
+
+    return _known(value, residual)
+
+def partial(logic: JsonValue, data: JsonValue, operations: Operations=BUILTINS) -> JsonValue:
+    """
+    Evaluate everything in `logic` that only depends on the paths present in
+    `data` and return the residual logic for the rest.
+
+    Evaluating the residual logic with any data that has `data` deep-merged
+    into it gives the same result as evaluating `logic` with that data. Only
+    pure operations (see `json_logic.purity`) are evaluated early.
+    """
+    return _partial(logic, data if isinstance(data, dict) else None, operations)[0]
+
+def fold(logic: JsonValue, operations: Operations=BUILTINS) -> JsonValue:
+    """
+    Evaluate all sub-expressions of `logic` that don't depend on the data.
+    """
+    return _partial(logic, None, operations)[0]
+
+def compile(logic: JsonValue, operations: Operations=BUILTINS, cse: bool=False) -> Compiled:
+    """
+    Compile `logic` into a function that takes the data and returns the same
+    result as `apply(logic, data, operations)`.
+
+    Operations are looked up once at compile time. Constant sub-expressions are
+    evaluated once and their results are shared between calls, so don't
+    mutate the returned values.
+
+    With `cse=True` sub-expressions that occur more than once are evaluated
+    only once per evaluation and data scope (the items of `map`, `filter`
+    etc. are scopes of their own), if they only use operations listed in
+    `json_logic.purity.CACHEABLE_OPERATIONS`. Note that this also means that
+    e.g. `timeSince` gives the same value for all occurrences.
+
+    Compiled rules don't have any mutable state (`reduce` creates its context
+    per call) and can be shared between threads.
+    """
+    logic = fold(logic, operations)
+    if cse:
+        # structurally equal sub-expressions become identical objects
+        logic = RuleInterner().intern(logic)
+    return _compile_scope(logic, operations, cse)
+
+def _compile(logic: JsonValue, operations: Operations, region: Optional['Region']=None) -> Compiled:
+    if region is not None:
+        slot = region.slots.get(id(logic))
+        if slot is not None:
+            func = region.funcs.get(slot)
+            if func is None:
+                func = region.funcs[slot] = _memoize(
+                    _compile_node(logic, operations, region), slot, _returns_data(logic, operations))
+            return func
+
+    return _compile_node(logic, operations, region)
+
+def _compile_node(logic: JsonValue, operations: Operations, region: Optional['Region']) -> Compiled:
+    if isinstance(logic, list):
+        items = [_compile(item, operations, region) for item in logic]
+        if all(type(item) is Constant for item in items):
+            return Constant([item.value for item in items]) # type: ignore
+        return lambda data: [item(data) for item in items]
+
+    if not isinstance(logic, dict) or len(logic) != 1:
+        return Constant(logic)
+
+    op, args = next(iter(logic.items()))
+
+    if not isinstance(args, list):
+        args = [args]
+
+    if op == 'if' or op == '?:':
+        argc = len(args)
+        return _compile_if([
+            _compile_condition(arg, operations, region) if index % 2 == 0 and index + 1 < argc else
+            _compile(arg, operations, region)
+            for index, arg in enumerate(args)
+        ])
+
+    elif op == 'and':
+        return _compile_and([_compile(arg, operations, region) for arg in args])
+
+    elif op == 'or':
+        return _compile_or([_compile(arg, operations, region) for arg in args])
+
+    elif op in COLLECTION_OPS:
+        iter_func = _compile_lazy_items(args[0], operations, region) if args else None
+        if iter_func is not None:
+            return _compile_lazy_collection(op, iter_func, args, operations, region)
+
+        items_func = _compile(args[0], operations, region) if args else Constant(None)
+        return _compile_collection(op, items_func, args, operations, region)
+
+    funcs = [_compile(arg, operations, region) for arg in args]
+
+    try:
+        operation = resolve_operation(op, operations)
+    except Exception:
+        def unresolved(data: JsonValue) -> JsonValue:
+            values = [func(data) for func in funcs]
+            return resolve_operation(op, operations)(data, *values)
+        return unresolved
+
+    if operation is op_missing or operation is op_missing_some:
+        missing = _compile_missing(operation, args)
+        if missing is not None:
+            return missing
+
+    fused = _compile_fused(operation, args, funcs, operations)
+    if fused is not None:
+        return fused
+
+    return _compile_call(operation, funcs)
+
+def _compile_condition(logic: JsonValue, operations: Operations, region: Optional['Region']) -> Compiled:
+    """
+    Compile a condition of `if`. The result is only used as a boolean, so
+    `missing` with literal keys can stop at the first missing key.
+    """
+    if isinstance(logic, dict) and len(logic) == 1:
+        op, args = next(iter(logic.items()))
+        if operations.get(op) is op_missing:
+            trie = _missing_trie(args if isinstance(args, list) else [args])
+            if trie is not None:
+                return trie.any_missing
+
+    return _compile(logic, operations, region)
+
+def _compile_var_path(path: str) -> Compiled:
+    """
+    Compiled form of `{"var": path}`.
+    """
+    if path == '':
+        return lambda data: data
+
+    if '.' not in path:
+        # inlined op_var() for the common case of a field of an object
+        return lambda data: data.get(path) if type(data) is dict else op_var(data, path)
+
+    return lambda data: op_var(data, path)
+
+def _is_scalar(value: Any) -> bool:
+    return value is None or isinstance(value, (str, bool, int, float))
+
+# For a numeric literal `b` the builtin comparisons are the same as comparing
+# `to_number(a)`, no matter what type `a` has.
+COMPARE_OPS: Dict[Any, Callable[[Any, Any], bool]] = {
+    op_less_than:             lt,
+    op_greater_than:          gt,
+    op_less_than_or_equal:    le,
+    op_greater_than_or_equal: ge,
+}
+
+def _compile_fused(operation: Any, args: List[JsonValue], funcs: List[Compiled], operations: Operations) -> Optional[Compiled]:
+    """
+    Compile frequent patterns into single functions that don't evaluate the
+    arguments one by one and call the operation with them:
+
+    * `{"===": [{"var": path}, literal]}` and `!==` (in any order)
+    * `{"<": [{"var": path}, number]}`, `>`, `<=` and `>=` (in any order,
+      anything instead of `var`)
+    * `{"<=": [low, x, high]}` and `<` with numbers for `low` and `high`
+    * `{"!": {"var": path}}` and `!!`
+    * `{"in": [{"var": path}, [literal, ...]]}`
+
+    Only the builtin operations are fused, otherwise return `None`.
+    """
+    argc = len(args)
+    has_var = operations.get('var') is op_var
+
+    compare = COMPARE_OPS.get(operation)
+    if compare is not None:
+        if argc == 2:
+            a, b = args
+            if isinstance(b, NUMERIC) and isinstance(a, NUMERIC):
+                return None
+
+            if isinstance(b, NUMERIC):
+                path = _var_path(a) if has_var else None
+                get = _compile_var_path(path) if path is not None else funcs[0]
+                return lambda data: compare(to_number(get(data)), b)
+
+            if isinstance(a, NUMERIC):
+                path = _var_path(b) if has_var else None
+                get = _compile_var_path(path) if path is not None else funcs[1]
+                return lambda data: compare(a, to_number(get(data)))
+
+        elif argc == 3 and (operation is op_less_than or operation is op_less_than_or_equal):
+            low, x, high = args
+            if isinstance(low, NUMERIC) and isinstance(high, NUMERIC):
+                path = _var_path(x) if has_var else None
+                get = _compile_var_path(path) if path is not None else funcs[1]
+
+                if operation is op_less_than:
+                    def between_(data: JsonValue) -> JsonValue:
+                        value = to_number(get(data))
+                        return low < value and value < high
+                else:
+                    def between_(data: JsonValue) -> JsonValue:
+                        value = to_number(get(data))
+                        return low <= value and value <= high
+
+                return between_
+
+        return None
+
+    if not has_var:
+        return None
+
+    if operation is BUILTINS['==='] or operation is BUILTINS['!==']:
+        if argc != 2:
+            return None
+
+        a, b = args
+        path = _var_path(a)
+        if path is not None and _is_scalar(b):
+            get = _compile_var_path(path)
+            if operation is BUILTINS['===']:
+                return lambda data: get(data) == b
+            return lambda data: get(data) != b
+
+        path = _var_path(b)
+        if path is not None and _is_scalar(a):
+            get = _compile_var_path(path)
+            if operation is BUILTINS['===']:
+                return lambda data: a == get(data)
+            return lambda data: a != get(data)
+
+        return None
+
+    if operation is BUILTINS['!'] or operation is BUILTINS['!!']:
+        path = _var_path(args[0]) if argc == 1 else None
+        if path is None:
+            return None
+
+        get = _compile_var_path(path)
+        if operation is BUILTINS['!']:
+            return lambda data: not_(get(data))
+        return lambda data: to_bool(get(data))
+
+    if operation is op_in and argc == 2:
+        path = _var_path(args[0])
+        haystack = args[1]
+        # NaN isn't equal to itself, but set lookups compare by identity first
+        if path is None or not isinstance(haystack, list) or not all(
+                _is_scalar(item) and item == item for item in haystack):
+            return None
+
+        get = _compile_var_path(path)
+        values = frozenset(haystack)
+
+        def in_(data: JsonValue) -> JsonValue:
+            try:
+                return get(data) in values
+            except TypeError:
+                # unhashable values are never equal to a literal
+                return False
+
+        return in_
+
+    return None
+
+def _compile_missing(operation: Any, args: List[JsonValue]) -> Optional[Compiled]:
+    """
+    Compile `missing` and `missing_some` with literal keys into a path trie
+    lookup.
+    """
+    if operation is op_missing:
+        trie = _missing_trie(args)
+        return trie.missing if trie is not None else None
+
+    if len(args) != 2:
+        return None
+
+    need_count, keys = args
+    if isinstance(need_count, (list, dict)) or not PathTrie.supports(keys):
+        return None
+
+    trie = PathTrie(keys) # type: ignore
+    number = to_number(need_count)
+    return lambda data: trie.missing_some(data, number)
+
+def _missing_trie(args: List[JsonValue]) -> Optional[PathTrie]:
+    keys = args[0] if args and isinstance(args[0], list) else args
+    if keys is not args and len(args) > 1:
+        # ignored arguments, but they are still evaluated
+        return None
+
+    if not PathTrie.supports(keys):
+        return None
+
+    return PathTrie(keys) # type: ignore
+
+def _compile_call(operation: Callable[..., JsonValue], funcs: List[Compiled]) -> Compiled:
+    argc = len(funcs)
+    if argc == 0:
+        return lambda data: operation(data)
+
+    if argc == 1:
+        arg0, = funcs
+        return lambda data: operation(data, arg0(data))
+
+    if argc == 2:
+        arg0, arg1 = funcs
+        return lambda data: operation(data, arg0(data), arg1(data))
+
+    if argc == 3:
+        arg0, arg1, arg2 = funcs
+        return lambda data: operation(data, arg0(data), arg1(data), arg2(data))
+
+    return lambda data: operation(data, *[func(data) for func in funcs])
+
+def _compile_if(funcs: List[Compiled]) -> Compiled:
+    argc = len(funcs)
+    if argc == 0:
+        return Constant(None)
+
+    if argc == 1:
+        return funcs[0]
+
+    if argc == 2:
+        cond, then = funcs
+        return lambda data: then(data) if to_bool(cond(data)) else None
+
+    if argc == 3:
+        cond, then, else_ = funcs
+        return lambda data: then(data) if to_bool(cond(data)) else else_(data)
+
+    pairs = [(funcs[index], funcs[index + 1]) for index in range(0, argc - 1, 2)]
+    else_func = funcs[-1] if argc % 2 else None
+
+    def if_(data: JsonValue) -> JsonValue:
+        for cond, then in pairs:
+            if to_bool(cond(data)):
+                return then(data)
+        return else_func(data) if else_func is not None else None
+
+    return if_
+
+def _compile_and(funcs: List[Compiled]) -> Compiled:
+    if not funcs:
+        return Constant(None)
+
+    if len(funcs) == 1:
+        return funcs[0]
+
+    def and_(data: JsonValue) -> JsonValue:
+        current = None
+        for func in funcs:
+            current = func(data)
+            if not_(current):
+                return current
+        return current
+
+    return and_
+
+def _compile_or(funcs: List[Compiled]) -> Compiled:
+    if not funcs:
+        return Constant(None)
+
+    if len(funcs) == 1:
+        return funcs[0]
+
+    def or_(data: JsonValue) -> JsonValue:
+        current = None
+        for func in funcs:
+            current = func(data)
+            if to_bool(current):
+                return current
+        return current
+
+    return or_
+
+def _compile_collection(op: str, items_func: Compiled, args: List[JsonValue], operations: Operations, region: Optional['Region']=None) -> Compiled:
+    """
+    Compile a collection operation. `items_func` is the compiled form of
+    `args[0]` and gives the items for the data.
+    """
+    argc = len(args)
+
+    if op == 'reduce':
+        if argc < 1:
+            return Constant(None)
+
+        sublogic   = _compile_scope(args[1] if argc > 1 else None, operations, region is not None)
+        init       = args[2] if argc > 2 else None
+        aggregate  = _compile_aggregate(args[1], sublogic, init, operations) if argc > 1 else None
+
+        if aggregate is not None:
+            def aggregate_(data: JsonValue) -> JsonValue:
+                items = items_func(data)
+                if not isinstance(items, list):
+                    return init
+                return aggregate(iter(items)) # type: ignore
+
+            return aggregate_
+
+        def reduce_(data: JsonValue) -> JsonValue:
+            items = items_func(data)
+            if not isinstance(items, list):
+                return init
+
+            context: Dict[str, JsonValue] = {'accumulator': init}
+            for item in items:
+                context['current']     = item
+                context['accumulator'] = sublogic(context)
+
+            return context['accumulator']
+
+        return reduce_
+
+    if op == 'map':
+        if argc < 1:
+            return lambda data: []
+
+        sublogic   = _compile_scope(args[1] if argc > 1 else None, operations, region is not None)
+
+        def map_(data: JsonValue) -> JsonValue:
+            items = items_func(data)
+            if not isinstance(items, list):
+                return []
+            return [sublogic(item) for item in items]
+
+        return map_
+
+    if argc < 2:
+        if op == 'filter':
+            return lambda data: []
+        return Constant(op == 'none')
+
+    sublogic   = _compile_scope(args[1], operations, region is not None)
+
+    if op == 'filter':
+        def filter_(data: JsonValue) -> JsonValue:
+            items = items_func(data)
+            if not isinstance(items, list):
+                return []
+            return [item for item in items if to_bool(sublogic(item))]
+
+        return filter_
+
+    if op == 'all':
+        def all_(data: JsonValue) -> JsonValue:
+            items = items_func(data)
+            # yes, JsonLogic defines that all of an empty list is False
+            if not isinstance(items, list) or not items:
+                return False
+            return all(to_bool(sublogic(item)) for item in items)
+
+        return all_
+
+    if op == 'some':
+        def some_(data: JsonValue) -> JsonValue:
+            items = items_func(data)
+            if not isinstance(items, list):
+                return False
+            return any(to_bool(sublogic(item)) for item in items)
+
+        return some_
+
+    def none_(data: JsonValue) -> JsonValue:
+        items = items_func(data)
+        if not isinstance(items, list):
+            return True
+        return not any(to_bool(sublogic(item)) for item in items)
+
+    return none_
+
+def _var_path(logic: JsonValue) -> Optional[str]:
+    """
+    The path of `{"var": path}` without a default, otherwise `None`.
+    """
+    if not isinstance(logic, dict) or len(logic) != 1 or 'var' not in logic:
+        return None
+
+    path = logic['var']
+    if isinstance(path, list):
+        if len(path) != 1:
+            return None
+        path = path[0]
+
+    return path if isinstance(path, str) else None
+
+def _item_getter(logic: JsonValue) -> Optional[Callable[[JsonValue], JsonValue]]:
+    """
+    For `{"var": "current"}` and `{"var": "current.some.field"}` a function
+    that gives the same value for the item, otherwise `None`.
+    """
+    path = _var_path(logic)
+    if path == 'current':
+        return lambda item: item
+
+    if path is None or not path.startswith('current.') or len(path) == len('current.'):
+        return None
+
+    key = path[len('current.'):]
+    if '.' not in key:
+        # inlined op_var() for the common case of a field of an object
+        return lambda item: item.get(key) if type(item) is dict else op_var(item, key)
+
+    return lambda item: op_var(item, key)
+
+def _compile_aggregate(logic: JsonValue, sublogic: Compiled, init: JsonValue, operations: Operations) -> Optional[Callable[[Iterator[JsonValue]], JsonValue]]:
+    """
+    Recognize common `reduce` idioms and compile them into a function that
+    aggregates the items of an iterator without evaluating the sub-logic for
+    every item. Otherwise return `None`.
+
+    Recognized idioms are sums (of the items, of a field of the items or of a
+    constant, i.e. counting), products, `min`, `max` and `cat` joins, with
+    the accumulator and the item in any order (only as first argument of
+    `cat`). The first item is reduced with `sublogic`, so the first step
+    gives exactly the result of the generic path, including the coercion of
+    the initial value. From then on the accumulator already is a number (or a
+    string for `cat`) and coercing it again doesn't change it, so only the
+    items are coerced with `to_number()` or `to_string()`, like the builtin
+    operations do.
+    """
+    if not isinstance(logic, dict) or len(logic) != 1 or operations.get('var') is not op_var:
+        return None
+
+    op, args = next(iter(logic.items()))
+    if not isinstance(args, list) or len(args) < 2:
+        return None
+
+    operation = operations.get(op)
+    if operation is None:
+        return None
+
+    if operation is BUILTINS['cat']:
+        if _var_path(args[0]) != 'accumulator':
+            return None
+
+        getters: List[Callable[[JsonValue], JsonValue]] = []
+        for arg in args[1:]:
+            getter = _item_getter(arg)
+            if getter is None:
+                if isinstance(arg, (list, dict)):
+                    return None
+                string = to_string(arg)
+                getter = lambda item, string=string: string
+            getters.append(getter)
+
+        def cat_(items: Iterator[JsonValue]) -> JsonValue:
+            for first in items:
+                break
+            else:
+                return init
+
+            parts = [sublogic({'accumulator': init, 'current': first})]
+            for item in items:
+                for getter in getters:
+                    parts.append(to_string(getter(item)))
+            return ''.join(parts) # type: ignore
+
+        return cat_
+
+    if len(args) != 2:
+        return None
+
+    # position of the accumulator
+    if _var_path(args[0]) == 'accumulator':
+        swapped = False
+        other = args[1]
+    elif _var_path(args[1]) == 'accumulator':
+        swapped = True
+        other = args[0]
+    else:
+        return None
+
+    get = _item_getter(other)
+    if get is None:
+        if operation is not op_add or isinstance(other, (list, dict)):
+            return None
+
+        # counting, e.g. {"+": [{"var": "accumulator"}, 1]}
+        number = to_number(other)
+
+        def count_(items: Iterator[JsonValue]) -> JsonValue:
+            for first in items:
+                break
+            else:
+                return init
+
+            total = sublogic({'accumulator': init, 'current': first})
+            for _ in items:
+                total += number # type: ignore
+            return total
+
+        return count_
+
+    if operation is op_add:
+        def sum_(items: Iterator[JsonValue]) -> JsonValue:
+            for first in items:
+                break
+            else:
+                return init
+
+            total = sublogic({'accumulator': init, 'current': first})
+            for item in items:
+                total += to_number(get(item)) # type: ignore
+            return total
+
+        return sum_
+
+    if operation is op_mul:
+        def product_(items: Iterator[JsonValue]) -> JsonValue:
+            for first in items:
+                break
+            else:
+                return init
+
+            total = sublogic({'accumulator': init, 'current': first})
+            for item in items:
+                total *= to_number(get(item)) # type: ignore
+            return total
+
+        return product_
+
+    if operation is BUILTINS['min'] or operation is BUILTINS['max']:
+        # min() and max() return the first of equal values (and NaN
+        # doesn't compare), so the order of the arguments is kept
+        func = min if operation is BUILTINS['min'] else max
+
+        def extremum_(items: Iterator[JsonValue]) -> JsonValue:
+            for first in items:
+                break
+            else:
+                return init
+
+            value = sublogic({'accumulator': init, 'current': first})
+            if swapped:
+                for item in items:
+                    value = func(to_number(get(item)), value) # type: ignore
+            else:
+                for item in items:
+                    value = func(value, to_number(get(item))) # type: ignore
+            return value
+
+        return extremum_
+
+    return None
+
+def _compile_lazy_items(logic: JsonValue, operations: Operations, region: Optional['Region']=None) -> Optional[Callable[[JsonValue], Iterator[JsonValue]]]:
+    """
+    Compile `logic` to a function that returns an iterator over the items if
+    it is a call to an operation with a lazy variant, otherwise return `None`.
+    """
+    if not isinstance(logic, dict) or len(logic) != 1:
+        return None
+
+    op, args = next(iter(logic.items()))
+
+    if op in ('if', '?:', 'and', 'or') or op in COLLECTION_OPS:
+        return None
+
+    try:
+        operation = resolve_operation(op, operations)
+        lazy_operation = LAZY_OPERATIONS.get(operation)
+    except Exception:
+        # unresolved or unhashable operation
+        return None
+
+    if lazy_operation is None:
+        return None
+
+    if not isinstance(args, list):
+        args = [args]
+
+    return _compile_call(lazy_operation, [_compile(arg, operations, region) for arg in args]) # type: ignore
+
+def _compile_lazy_collection(op: str, iter_func: Callable[[JsonValue], Iterator[JsonValue]], args: List[JsonValue], operations: Operations, region: Optional['Region']=None) -> Compiled:
+    """
+    Like `_compile_collection()`, but `iter_func` always returns an iterator.
+    """
+    argc = len(args)
+
+    if op == 'reduce':
+        sublogic   = _compile_scope(args[1] if argc > 1 else None, operations, region is not None)
+        init       = args[2] if argc > 2 else None
+        aggregate  = _compile_aggregate(args[1], sublogic, init, operations) if argc > 1 else None
+
+        if aggregate is not None:
+            return lambda data: aggregate(iter_func(data)) # type: ignore
+
+        def reduce_(data: JsonValue) -> JsonValue:
+            context: Dict[str, JsonValue] = {'accumulator': init}
+            for item in iter_func(data):
+                context['current']     = item
+                context['accumulator'] = sublogic(context)
+
+            return context['accumulator']
+
+        return reduce_
+
+    if op == 'map':
+        sublogic   = _compile_scope(args[1] if argc > 1 else None, operations, region is not None)
+        return lambda data: [sublogic(item) for item in iter_func(data)]
+
+    if argc < 2:
+        # the items are not evaluated
+        return _compile_collection(op, iter_func, args, operations, region)
+
+    sublogic   = _compile_scope(args[1], operations, region is not None)
+
+    if op == 'filter':
+        return lambda data: [item for item in iter_func(data) if to_bool(sublogic(item))]
+
+    if op == 'all':
+        def all_(data: JsonValue) -> JsonValue:
+            empty = True
+            for item in iter_func(data):
+                if not to_bool(sublogic(item)):
+                    return False
+                empty = False
+            # yes, JsonLogic defines that all of an empty list is False
+            return not empty
+
+        return all_
+
+    if op == 'some':
+        return lambda data: any(to_bool(sublogic(item)) for item in iter_func(data))
+
+    return lambda data: not any(to_bool(sublogic(item)) for item in iter_func(data))
+
+class Region:
+    """
+    Common sub-expressions of one data scope. `slots` maps the ids of the
+    (interned) sub-expressions to their index in the per-evaluation memo.
+    """
+    __slots__ = 'slots', 'funcs', 'size'
+
+    slots: Dict[int, int]
+    funcs: Dict[int, Compiled]
+    size: int
+
+    def __init__(self, slots: Dict[int, int], size: int) -> None:
+        self.slots = slots
+        self.funcs = {}
+        self.size  = size
+
+UNSET: Any = object()
+
+_memo: ContextVar[List[Any]] = ContextVar('json_logic_memo')
+
+def _compile_scope(logic: JsonValue, operations: Operations, cse: bool) -> Compiled:
+    """
+    Compile `logic` that is evaluated with a new data scope (the whole rule or
+    the sub-logic of a collection operation).
+    """
+    if not cse:
+        return _compile(logic, operations)
+
+    region = _plan_region(logic, operations)
+    func = _compile(logic, operations, region)
+    if not region.size:
+        # no memo needed, but nested scopes might have one
+        return func
+
+    size = region.size
+    def scope(data: JsonValue) -> JsonValue:
+        token = _memo.set([UNSET] * size)
+        try:
+            return func(data)
+        finally:
+            _memo.reset(token)
+
+    return scope
+
+def _plan_region(logic: JsonValue, operations: Operations) -> Region:
+    counts: Dict[int, int] = {}
+    nodes: List[JsonValue] = []
+
+    def count(logic: JsonValue) -> None:
+        if isinstance(logic, list):
+            for item in logic:
+                count(item)
+            return
+
+        if not isinstance(logic, dict) or len(logic) != 1:
+            return
+
+        key = id(logic)
+        if key in counts:
+            # the sub-expressions of a repeated node are only evaluated once
+            counts[key] += 1
+            return
+        counts[key] = 1
+        nodes.append(logic)
+
+        op, args = next(iter(logic.items()))
+        if not isinstance(args, list):
+            args = [args]
+
+        if op in COLLECTION_OPS:
+            # the sub-logic is a scope of its own
+            if args:
+                count(args[0])
+        else:
+            for arg in args:
+                count(arg)
+
+    count(logic)
+
+    cacheable: Dict[int, bool] = {}
+    slots: Dict[int, int] = {}
+    for node in nodes:
+        if counts[id(node)] > 1 and _is_cacheable_logic(node, operations, cacheable):
+            slots[id(node)] = len(slots)
+
+    return Region(slots, len(slots))
+
+def _is_cacheable_logic(logic: JsonValue, operations: Operations, cache: Dict[int, bool]) -> bool:
+    if isinstance(logic, list):
+        return all(_is_cacheable_logic(item, operations, cache) for item in logic)
+
+    if not isinstance(logic, dict) or len(logic) != 1:
+        return True
+
+    key = id(logic)
+    result = cache.get(key)
+    if result is not None:
+        return result
+
+    op, args = next(iter(logic.items()))
+    if not isinstance(args, list):
+        args = [args]
+
+    if op == 'reduce':
+        # the initial value is not evaluated
+        args = args[:2]
+        result = True
+    elif op in ('if', '?:', 'and', 'or') or op in COLLECTION_OPS:
+        result = True
+    else:
+        try:
+            result = is_cacheable(resolve_operation(op, operations))
+        except Exception:
+            result = False
+
+    result = result and all(_is_cacheable_logic(arg, operations, cache) for arg in args)
+    cache[key] = result
+    return result
+
+def _returns_data(logic: JsonValue, operations: Operations) -> bool:
+    """
+    Whether `logic` is a `var` with a fixed path, i.e. returns objects of the
+    data itself and not newly created lists or objects.
+    """
+    if not isinstance(logic, dict) or len(logic) != 1:
+        return False
+
+    op, args = next(iter(logic.items()))
+    if isinstance(args, list):
+        if len(args) != 1:
+            return False
+        args = args[0]
+
+    try:
+        return resolve_operation(op, operations) is op_var and not isinstance(args, (list, dict))
+    except Exception:
+        return False
+
+def _memoize(func: Compiled, slot: int, returns_data: bool) -> Compiled:
+    if returns_data:
+        def memoized_var(data: JsonValue) -> JsonValue:
+            memo = _memo.get()
+            value = memo[slot]
+            if value is UNSET:
+                value = memo[slot] = func(data)
+            return value
+
+        return memoized_var
+
+    def memoized(data: JsonValue) -> JsonValue:
+        memo = _memo.get()
+        value = memo[slot]
+        if value is UNSET:
+            value = func(data)
+            # `==` compares new lists and objects by identity, so every
+            # occurrence needs its own
+            if not isinstance(value, (list, dict)):
+                memo[slot] = value
+        return value
+
+    return memoized
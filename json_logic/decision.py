@@ -0,0 +1,271 @@
+"""
+Decision diagrams for rule sets over categorical fields.
+
+Rule sets often consist of rules that check the same few fields for a few
+values over and over, e.g.:
+
+    {"and": [{"===": [{"var": "type"}, "CovidTest"]}, {"===": [{"var": "testType"}, "PCR"]}, ...]}
+    {"and": [{"===": [{"var": "type"}, "Vaccination"]}, {"in": [{"var": "vaccine"}, [...]]}, ...]}
+
+`DecisionDiagram` turns such a rule set into a shared, reduced multi-valued
+decision diagram. Every decision node looks up one field and branches on which
+of the compared values it equals (or none of them). A walk from the root to a
+terminal therefore looks up every field at most once and gives the results of
+all rules at the same time: each terminal holds the residual logic of every
+rule, which is what's left of the rule after all its categorical checks were
+replaced by their outcome and constant folding. Everything that isn't a
+categorical check stays in the residual logic and is evaluated by compiled
+rules as usual.
+
+Categorical checks are `===` and `!==` between a `var` with a fixed path and a
+string, number, boolean or `null` literal, and `in` of such a `var` in a list
+of such literals, using the builtin operations. Checks inside the sub-logic of
+`map`, `filter` etc. refer to the items, not to the data, and are left alone.
+"""
+
+from typing import Any, Dict, Hashable, List, Optional, Set, Tuple, Union
+
+from .types import JsonValue, Operations
+from .builtins import BUILTINS, op_var
+from .compile import COLLECTION_OPS, Compiled, compile, fold
+
+__all__ = 'DecisionDiagram',
+
+# (op, path, literals): `===` and `!==` have one literal, `in` has a list
+Check = Tuple[str, str, Tuple[JsonValue, ...]]
+
+class Decision:
+    __slots__ = 'path', 'classes', 'other', 'children'
+
+    path: str
+    # maps the compared values to the index of the child
+    classes: Dict[JsonValue, int]
+    # index of the child for all other values
+    other: int
+    children: List[Union['Decision', 'Terminal']]
+
+    def __init__(self, path: str, classes: Dict[JsonValue, int], children: List[Union['Decision', 'Terminal']]) -> None:
+        self.path     = path
+        self.classes  = classes
+        self.other    = len(classes)
+        self.children = children
+
+class Terminal:
+    __slots__ = 'residuals', 'funcs'
+
+    residuals: List[JsonValue]
+    funcs: List[Compiled]
+
+    def __init__(self, residuals: List[JsonValue], funcs: List[Compiled]) -> None:
+        self.residuals = residuals
+        self.funcs     = funcs
+
+def _is_literal(value: Any) -> bool:
+    # NaN never equals itself, but dict lookups compare by identity first
+    return value is None or isinstance(value, (str, bool, int)) or (isinstance(value, float) and value == value)
+
+def _var_path(logic: Any) -> Optional[str]:
+    if not isinstance(logic, dict) or len(logic) != 1 or 'var' not in logic:
+        return None
+
+    path = logic['var']
+    if isinstance(path, list):
+        if len(path) != 1:
+            return None
+        path = path[0]
+
+    return path if isinstance(path, str) else None
+
+class DecisionDiagram:
+    """
+    Evaluates all rules of a `{rule_id: logic}` dict at once, see the module
+    documentation. Calling it returns a `{rule_id: result}` dict with the same
+    results as `apply(logic, data, operations)` for every rule.
+    """
+    rule_ids: List[Hashable]
+    paths: List[str]
+    root: Union[Decision, Terminal]
+    operations: Operations
+
+    _categorical_ops: Set[str]
+    _values: Dict[str, Dict[JsonValue, int]]
+    _nodes: Dict[Hashable, Union[Decision, Terminal]]
+    _compiled: Dict[str, Compiled]
+
+    def __init__(self, rules: Dict[Hashable, JsonValue], operations: Operations=BUILTINS) -> None:
+        self.rule_ids   = list(rules)
+        self.operations = operations
+
+        # custom versions of the operations might not compare like `==`
+        self._categorical_ops = {
+            op for op in ('===', '!==', 'in')
+            if operations.get(op) is BUILTINS[op]
+        } if operations.get('var') is op_var else set()
+
+        residuals = [fold(logic, operations) for logic in rules.values()]
+
+        # the compared values of every field, fields that are checked most
+        # often come first
+        counts: Dict[str, int] = {}
+        self._values = {}
+        for logic in residuals:
+            for _, path, literals in self._checks(logic):
+                counts[path] = counts.get(path, 0) + 1
+                values = self._values.setdefault(path, {})
+                for literal in literals:
+                    values.setdefault(literal, len(values))
+
+        self.paths = sorted(counts, key=lambda path: -counts[path])
+
+        self._nodes    = {}
+        self._compiled = {}
+        self.root = self._build(residuals, 0)
+
+    def _check(self, logic: Any) -> Optional[Check]:
+        if not isinstance(logic, dict) or len(logic) != 1:
+            return None
+
+        op, args = next(iter(logic.items()))
+        if op not in self._categorical_ops or not isinstance(args, list) or len(args) != 2:
+            return None
+
+        left, right = args
+        if op == 'in':
+            path = _var_path(left)
+            if path is None or not isinstance(right, list) or not all(_is_literal(item) for item in right):
+                return None
+            return op, path, tuple(right)
+
+        path = _var_path(left)
+        literal = right
+        if path is None:
+            path = _var_path(right)
+            literal = left
+
+        if path is None or not _is_literal(literal):
+            return None
+
+        return op, path, (literal,)
+
+    def _checks(self, logic: Any) -> List[Check]:
+        checks: List[Check] = []
+        stack = [logic]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, list):
+                stack.extend(node)
+            elif isinstance(node, dict) and len(node) == 1:
+                check = self._check(node)
+                if check is not None:
+                    checks.append(check)
+                    continue
+
+                op, args = next(iter(node.items()))
+                if not isinstance(args, list):
+                    args = [args]
+
+                if op in COLLECTION_OPS:
+                    # only the items are evaluated with the data
+                    stack.extend(args[:1])
+                else:
+                    stack.extend(args)
+        return checks
+
+    def _restrict(self, logic: Any, path: str, value_class: int) -> Any:
+        """
+        Replace all checks of `path` by their outcome if the value of the
+        field is of `value_class`.
+        """
+        if isinstance(logic, list):
+            return [self._restrict(item, path, value_class) for item in logic]
+
+        if not isinstance(logic, dict) or len(logic) != 1:
+            return logic
+
+        check = self._check(logic)
+        if check is not None:
+            op, check_path, literals = check
+            if check_path != path:
+                return logic
+
+            values = self._values[path]
+            matches = any(values[literal] == value_class for literal in literals)
+            return (not matches) if op == '!==' else matches
+
+        op, args = next(iter(logic.items()))
+        if not isinstance(args, list):
+            return {op: self._restrict(args, path, value_class)}
+
+        if op in COLLECTION_OPS:
+            return {op: [self._restrict(args[0], path, value_class), *args[1:]]} if args else logic
+
+        return {op: [self._restrict(arg, path, value_class) for arg in args]}
+
+    def _build(self, residuals: List[JsonValue], depth: int) -> Union[Decision, Terminal]:
+        key = (depth, repr(residuals))
+        node = self._nodes.get(key)
+        if node is not None:
+            return node
+
+        if depth == len(self.paths):
+            node = self._nodes[key] = Terminal(residuals, [self._compile(logic) for logic in residuals])
+            return node
+
+        path = self.paths[depth]
+        values = self._values[path]
+        children = [
+            self._build([fold(self._restrict(logic, path, value_class), self.operations) for logic in residuals], depth + 1)
+            for value_class in range(len(values) + 1)
+        ]
+
+        first = children[0]
+        if all(child is first for child in children):
+            # the field doesn't matter here
+            node = first
+        else:
+            unique_key = (path, tuple(id(child) for child in children))
+            node = self._nodes.get(unique_key)
+            if node is None:
+                node = self._nodes[unique_key] = Decision(path, values, children)
+
+        self._nodes[key] = node
+        return node
+
+    def _compile(self, logic: JsonValue) -> Compiled:
+        key = repr(logic)
+        func = self._compiled.get(key)
+        if func is None:
+            func = self._compiled[key] = compile(logic, self.operations)
+        return func
+
+    def terminal(self, data: JsonValue) -> Terminal:
+        """
+        Walk the diagram for `data` and return the terminal with the residual
+        logic of every rule.
+        """
+        node = self.root
+        while type(node) is Decision:
+            value = op_var(data, node.path) # type: ignore
+            try:
+                index = node.classes.get(value, node.other) # type: ignore
+            except TypeError:
+                # unhashable values never equal a literal
+                index = node.other # type: ignore
+            node = node.children[index] # type: ignore
+        return node # type: ignore
+
+    def __call__(self, data: JsonValue=None) -> Dict[Hashable, JsonValue]:
+        funcs = self.terminal(data).funcs
+        return {rule_id: func(data) for rule_id, func in zip(self.rule_ids, funcs)}
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Number of distinct decision nodes and terminals.
+        """
+        decisions = {id(node) for node in self._nodes.values() if type(node) is Decision}
+        terminals = {id(node) for node in self._nodes.values() if type(node) is Terminal}
+        return {
+            'fields':    len(self.paths),
+            'decisions': len(decisions),
+            'terminals': len(terminals),
+        }
@@ -1,9 +1,11 @@
-from typing import List, Any
+from typing import Iterator, List, Any
 from datetime import datetime, timezone
+from itertools import product
 
 from .builtins import BUILTINS, to_number
 from .types import Operations, JsonValue
 from .cert_logic.builtins import parse_time
+from .budget import check_size
 
 def op_time_since(data=None, timestamp=None, *_ignored) -> float:
     dt = parse_time(timestamp)
@@ -13,6 +15,14 @@ def combinations(*lists: List[JsonValue]) -> List[List[JsonValue]]:
     combinations: List[List[JsonValue]] = []
     list_count = len(lists)
     if list_count > 0:
+        # the arguments after the first empty list are never looked at
+        size = 1
+        for list in lists:
+            size *= len(list)
+            if not size:
+                return combinations
+        check_size(size)
+
         stack = [0] * (list_count + 1)
         item: List[JsonValue] = [None] * list_count
         stack_ptr = 0
@@ -35,6 +45,26 @@ def combinations(*lists: List[JsonValue]) -> List[List[JsonValue]]:
 
     return combinations
 
+def op_combinations(data=None, *lists: List[JsonValue]) -> List[List[JsonValue]]:
+    return combinations(*lists)
+
+def op_zip(data=None, *lists: List[JsonValue]) -> List[List[JsonValue]]:
+    return [list(item) for item in zip(*lists)]
+
+def op_iter_combinations(data=None, *lists: List[JsonValue]) -> Iterator[List[JsonValue]]:
+    """
+    Lazy version of `combinations` for the items of collection operations.
+    """
+    if not lists or not all(isinstance(items, (list, str)) for items in lists):
+        return iter(combinations(*lists))
+    return map(list, product(*lists)) # type: ignore
+
+def op_iter_zip(data=None, *lists: List[JsonValue]) -> Iterator[List[JsonValue]]:
+    """
+    Lazy version of `zip` for the items of collection operations.
+    """
+    return map(list, zip(*lists))
+
 EXTRAS_ONLY: Operations = {
     'now':        lambda *_ignored: datetime.utcnow().replace(tzinfo=timezone.utc),
     'hours':      lambda data=None, value=None, *_ignored: to_number(value) * 60 * 60 * 1000,
@@ -42,8 +72,8 @@ EXTRAS_ONLY: Operations = {
     'parseTime':  lambda data=None, value=None, *_ignored: parse_time(value),
     'formatTime': lambda data=None, value=None, *_ignored: parse_time(value).isoformat(),
     'timeSince':  op_time_since,
-    'combinations': lambda data=None, *lists: combinations(*lists), # type: ignore
-    'zip': lambda data=None, *lists: [list(item) for item in zip(*lists)],
+    'combinations': op_combinations, # type: ignore
+    'zip':          op_zip, # type: ignore
 }
 
 EXTRAS: Operations = {
@@ -0,0 +1,118 @@
+"""
+Hash-consing of rules.
+
+Large rule stores contain many identical sub-expressions like
+`{"var": "type"}` or `["EU/1/20/1528", "EU/1/20/1507"]`. `RuleInterner`
+converts rules into immutable nodes and returns the same node object for every
+structurally identical sub-expression, so each distinct sub-expression is only
+kept in memory once. Strings (including object keys) are interned as well.
+
+The nodes are subclasses of `list` and `dict`, so `apply()`, `compile()` and
+everything else that accepts rules accepts interned rules unchanged.
+"""
+
+from typing import Any, Dict, Hashable, Iterable, Tuple, Union
+
+import sys
+
+from .types import JsonValue
+
+__all__ = 'FrozenList', 'FrozenDict', 'RuleInterner'
+
+def _immutable(self: Any, *args: Any, **kwargs: Any) -> Any:
+    raise TypeError(f'{type(self).__name__} is immutable')
+
+class FrozenList(list):
+    __slots__ = ()
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _immutable
+    append = extend = insert = pop = remove = clear = sort = reverse = _immutable
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        return FrozenList, (list(self),)
+
+    def __repr__(self) -> str:
+        return f'FrozenList({list.__repr__(self)})'
+
+class FrozenDict(dict):
+    __slots__ = ()
+
+    __setitem__ = __delitem__ = __ior__ = _immutable
+    pop = popitem = clear = setdefault = update = _immutable
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        return FrozenDict, (dict(self),)
+
+    def __repr__(self) -> str:
+        return f'FrozenDict({dict.__repr__(self)})'
+
+class RuleInterner:
+    """
+    Canonicalizes rules. Interned nodes stay alive as long as the interner, so
+    use one interner per rule store.
+    """
+    __slots__ = '_nodes',
+
+    # Keys of containers are built from the ids of their canonical children,
+    # which are kept alive by `_nodes`. Scalars are keyed by type as well,
+    # since `1 == 1.0 == True`.
+    _nodes: Dict[Hashable, JsonValue]
+
+    def __init__(self) -> None:
+        self._nodes = {}
+
+    def __len__(self) -> int:
+        """
+        Number of distinct nodes.
+        """
+        return len(self._nodes)
+
+    def intern(self, logic: JsonValue) -> JsonValue:
+        """
+        Return the canonical immutable version of `logic`.
+        """
+        key: Hashable
+        if isinstance(logic, list):
+            items = [self.intern(item) for item in logic]
+            key = (FrozenList, tuple(id(item) for item in items))
+            node = self._nodes.get(key)
+            if node is None:
+                node = self._nodes[key] = FrozenList(items)
+            return node
+
+        if isinstance(logic, dict):
+            obj = {sys.intern(prop): self.intern(value) for prop, value in logic.items()}
+            if len(obj) != 1:
+                # object literals are compared by identity, so they are not
+                # shared
+                return FrozenDict(obj)
+            key = (FrozenDict, tuple((prop, id(value)) for prop, value in obj.items()))
+            node = self._nodes.get(key)
+            if node is None:
+                node = self._nodes[key] = FrozenDict(obj)
+            return node
+
+        if isinstance(logic, str):
+            logic = sys.intern(logic)
+            key = (str, logic)
+        elif isinstance(logic, float):
+            # keeps 0.0 and -0.0 apart
+            key = (float, logic.hex())
+        elif logic is None or isinstance(logic, int):
+            key = (type(logic), logic)
+        else:
+            # e.g. datetimes, which compare equal across time zones
+            return logic
+
+        node = self._nodes.get(key)
+        if node is None:
+            node = self._nodes[key] = logic
+        return node
+
+    def intern_rules(self, rules: Union[Dict[Hashable, JsonValue], Iterable[JsonValue]]) -> Any:
+        """
+        Intern all rules of a `{rule_id: logic}` dict or of a list of rules.
+        """
+        if isinstance(rules, dict):
+            return {rule_id: self.intern(logic) for rule_id, logic in rules.items()}
+        return [self.intern(logic) for logic in rules]
@@ -0,0 +1,296 @@
+"""
+Per-rule evaluation metrics.
+
+`MetricsRegistry` evaluates rules via `jsonLogic()`, `certLogic()` or any
+compiled rule and records per rule id:
+
+* the number of evaluations and errors
+* the distribution of the results (`true`, `false` or anything else)
+* a latency histogram with fixed log-scale buckets
+
+Every thread records into its own set of counters, so evaluating doesn't need
+any locks. The counters of all threads are summed up when exporting, which
+can be done as Prometheus text format or as a JSON snapshot, to a file or to a
+callback. There is no network dependency, serve the exported text however you
+like.
+"""
+
+from typing import Any, Callable, Dict, Hashable, List, Union
+
+from time import perf_counter_ns
+from threading import Lock, local
+
+import os
+
+from .types import JsonValue, Operations
+from .builtins import BUILTINS as JSONLOGIC_BUILTINS
+from .apply import apply as json_logic_apply
+from .cert_logic.builtins import BUILTINS as CERTLOGIC_BUILTINS
+from .cert_logic.apply import apply as cert_logic_apply
+
+__all__ = 'MetricsRegistry', 'RuleMetrics', 'BUCKET_BOUNDS'
+
+# Bucket i counts evaluations that took at most 2 ** (i + BUCKET_SHIFT)
+# nanoseconds, i.e. about 1 microsecond up to about 17 seconds. The last
+# bucket counts everything slower.
+BUCKET_SHIFT = 10
+BUCKET_COUNT = 25
+
+BUCKET_BOUNDS: List[float] = [(1 << (index + BUCKET_SHIFT)) / 1_000_000_000 for index in range(BUCKET_COUNT)]
+
+def bucket_index(nanoseconds: int) -> int:
+    index = (nanoseconds - 1).bit_length() - BUCKET_SHIFT
+    if index < 0:
+        return 0
+    if index > BUCKET_COUNT:
+        return BUCKET_COUNT
+    return index
+
+class RuleMetrics:
+    __slots__ = 'count', 'errors', 'true', 'false', 'other', 'nanoseconds', 'buckets'
+
+    count: int
+    errors: int
+    true: int
+    false: int
+    other: int
+    nanoseconds: int
+    # BUCKET_COUNT + 1 counters, not cumulative
+    buckets: List[int]
+
+    def __init__(self) -> None:
+        self.count  = 0
+        self.errors = 0
+        self.true   = 0
+        self.false  = 0
+        self.other  = 0
+        self.nanoseconds = 0
+        self.buckets = [0] * (BUCKET_COUNT + 1)
+
+    def record(self, nanoseconds: int, result: JsonValue) -> None:
+        self.count += 1
+        self.nanoseconds += nanoseconds
+        self.buckets[bucket_index(nanoseconds)] += 1
+        if result is True:
+            self.true += 1
+        elif result is False:
+            self.false += 1
+        else:
+            self.other += 1
+
+    def record_error(self, nanoseconds: int) -> None:
+        self.count  += 1
+        self.errors += 1
+        self.nanoseconds += nanoseconds
+        self.buckets[bucket_index(nanoseconds)] += 1
+
+    def merge(self, other: 'RuleMetrics') -> None:
+        self.count  += other.count
+        self.errors += other.errors
+        self.true   += other.true
+        self.false  += other.false
+        self.other  += other.other
+        self.nanoseconds += other.nanoseconds
+        buckets = self.buckets
+        for index, count in enumerate(other.buckets):
+            buckets[index] += count
+
+    def snapshot(self) -> Dict[str, JsonValue]:
+        return {
+            'count':   self.count,
+            'errors':  self.errors,
+            'results': {
+                'true':  self.true,
+                'false': self.false,
+                'other': self.other,
+            },
+            'latency': {
+                'sum':     self.nanoseconds / 1_000_000_000,
+                'buckets': list(self.buckets),
+            },
+        }
+
+class MetricsRegistry:
+    """
+    Records metrics of rule evaluations, see the module documentation.
+    """
+    _lock: Lock
+    _local: local
+    _shards: List[Dict[Hashable, RuleMetrics]]
+
+    def __init__(self) -> None:
+        self._lock   = Lock()
+        self._local  = local()
+        self._shards = []
+
+    def _rule_metrics(self, rule_id: Hashable) -> RuleMetrics:
+        try:
+            shard: Dict[Hashable, RuleMetrics] = self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append(shard)
+
+        metrics = shard.get(rule_id)
+        if metrics is None:
+            metrics = shard[rule_id] = RuleMetrics()
+        return metrics
+
+    def evaluate(self, rule_id: Hashable, func: Callable[..., JsonValue], *args: Any) -> JsonValue:
+        """
+        Call `func(*args)` and record its metrics under `rule_id`. Exceptions
+        are counted as errors and re-raised.
+        """
+        try:
+            metrics = self._local.shard[rule_id]
+        except (AttributeError, KeyError):
+            metrics = self._rule_metrics(rule_id)
+
+        start = perf_counter_ns()
+        try:
+            result = func(*args)
+        except BaseException:
+            metrics.record_error(perf_counter_ns() - start)
+            raise
+
+        metrics.record(perf_counter_ns() - start, result)
+        return result
+
+    def jsonLogic(self, rule_id: Hashable, logic: JsonValue, data: JsonValue=None, operations: Operations=JSONLOGIC_BUILTINS) -> JsonValue:
+        return self.evaluate(rule_id, json_logic_apply, logic, data, operations)
+
+    def certLogic(self, rule_id: Hashable, logic: JsonValue, data: JsonValue=None, operations: Operations=CERTLOGIC_BUILTINS) -> JsonValue:
+        return self.evaluate(rule_id, cert_logic_apply, logic, data, operations)
+
+    def wrap(self, rule_id: Hashable, rule: Callable[[JsonValue], JsonValue]) -> Callable[[JsonValue], JsonValue]:
+        """
+        Wrap a compiled rule (or any function of the data) so that its calls
+        are recorded under `rule_id`. This has less overhead than
+        `evaluate()`, because the counters of the calling thread are looked up
+        only once per thread.
+        """
+        rule_metrics = self._rule_metrics
+        thread_local = local()
+
+        def instrumented(data: JsonValue=None) -> JsonValue:
+            try:
+                metrics: RuleMetrics = thread_local.metrics
+            except AttributeError:
+                metrics = thread_local.metrics = rule_metrics(rule_id)
+
+            start = perf_counter_ns()
+            try:
+                result = rule(data)
+            except BaseException:
+                metrics.record_error(perf_counter_ns() - start)
+                raise
+            elapsed = perf_counter_ns() - start
+
+            # inlined RuleMetrics.record()
+            metrics.count += 1
+            metrics.nanoseconds += elapsed
+            index = (elapsed - 1).bit_length() - BUCKET_SHIFT
+            metrics.buckets[0 if index < 0 else BUCKET_COUNT if index > BUCKET_COUNT else index] += 1
+            if result is True:
+                metrics.true += 1
+            elif result is False:
+                metrics.false += 1
+            else:
+                metrics.other += 1
+
+            return result
+
+        return instrumented
+
+    def collect(self) -> Dict[Hashable, RuleMetrics]:
+        """
+        Sum up the metrics of all threads. Evaluations that are running
+        concurrently might be partially counted.
+        """
+        with self._lock:
+            shards = list(self._shards)
+
+        collected: Dict[Hashable, RuleMetrics] = {}
+        for shard in shards:
+            for rule_id, metrics in list(shard.items()):
+                total = collected.get(rule_id)
+                if total is None:
+                    total = collected[rule_id] = RuleMetrics()
+                total.merge(metrics)
+
+        return collected
+
+    def snapshot(self) -> Dict[str, JsonValue]:
+        return {
+            'buckets': list(BUCKET_BOUNDS),
+            'rules': {
+                str(rule_id): metrics.snapshot()
+                for rule_id, metrics in self.collect().items()
+            },
+        }
+
+    def prometheus(self, prefix: str='json_logic') -> str:
+        """
+        Metrics in the Prometheus text exposition format.
+        """
+        collected = sorted(((str(rule_id), metrics) for rule_id, metrics in self.collect().items()), key=lambda item: item[0])
+        lines: List[str] = []
+
+        lines.append(f'# HELP {prefix}_evaluations_total Number of rule evaluations.')
+        lines.append(f'# TYPE {prefix}_evaluations_total counter')
+        for rule_id, metrics in collected:
+            lines.append(f'{prefix}_evaluations_total{{rule="{_escape(rule_id)}"}} {metrics.count}')
+
+        lines.append(f'# HELP {prefix}_errors_total Number of rule evaluations that raised an exception.')
+        lines.append(f'# TYPE {prefix}_errors_total counter')
+        for rule_id, metrics in collected:
+            lines.append(f'{prefix}_errors_total{{rule="{_escape(rule_id)}"}} {metrics.errors}')
+
+        lines.append(f'# HELP {prefix}_results_total Number of rule results by kind.')
+        lines.append(f'# TYPE {prefix}_results_total counter')
+        for rule_id, metrics in collected:
+            label = _escape(rule_id)
+            lines.append(f'{prefix}_results_total{{rule="{label}",result="true"}} {metrics.true}')
+            lines.append(f'{prefix}_results_total{{rule="{label}",result="false"}} {metrics.false}')
+            lines.append(f'{prefix}_results_total{{rule="{label}",result="other"}} {metrics.other}')
+
+        lines.append(f'# HELP {prefix}_evaluation_seconds Rule evaluation latency.')
+        lines.append(f'# TYPE {prefix}_evaluation_seconds histogram')
+        for rule_id, metrics in collected:
+            label = _escape(rule_id)
+            cumulative = 0
+            for bound, count in zip(BUCKET_BOUNDS, metrics.buckets):
+                cumulative += count
+                lines.append(f'{prefix}_evaluation_seconds_bucket{{rule="{label}",le="{bound!r}"}} {cumulative}')
+            lines.append(f'{prefix}_evaluation_seconds_bucket{{rule="{label}",le="+Inf"}} {metrics.count}')
+            lines.append(f'{prefix}_evaluation_seconds_sum{{rule="{label}"}} {metrics.nanoseconds / 1_000_000_000!r}')
+            lines.append(f'{prefix}_evaluation_seconds_count{{rule="{label}"}} {metrics.count}')
+
+        lines.append('')
+        return '\n'.join(lines)
+
+    def export(self, target: Union[str, Callable[[str], Any]], format: str='prometheus') -> None:
+        """
+        Write the metrics as `'prometheus'` text or as a `'json'` snapshot.
+        `target` is a file name or a function that gets the text. Files are
+        replaced atomically, so a scraper never sees a partial file.
+        """
+        if format == 'prometheus':
+            text = self.prometheus()
+        elif format == 'json':
+            import json
+            text = json.dumps(self.snapshot(), indent=2) + '\n'
+        else:
+            raise ValueError(f'illegal format: {format!r}')
+
+        if callable(target):
+            target(text)
+            return
+
+        tmp_path = f'{target}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='UTF-8') as stream:
+            stream.write(text)
+        os.replace(tmp_path, target)
+
+def _escape(label: str) -> str:
+    return label.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
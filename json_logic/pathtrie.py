@@ -0,0 +1,167 @@
+"""
+Path tries for `missing` and `missing_some` with literal keys.
+
+`op_missing()` looks up every key separately from the root of the data. A
+`PathTrie` shares the traversal of common prefixes between the keys, so every
+object along the paths is only visited once. The results are the same as with
+`op_missing()` and `op_missing_some()`, including the order of the keys.
+"""
+
+from typing import Any, Dict, List, Optional, Sequence
+
+from .types import JsonValue
+
+__all__ = 'PathTrie',
+
+class Node:
+    __slots__ = 'children', 'ends', 'indices'
+
+    children: Dict[str, 'Node']
+    # indices of the keys that end at this node
+    ends: List[int]
+    # indices of all keys in this sub-tree
+    indices: List[int]
+
+    def __init__(self) -> None:
+        self.children = {}
+        self.ends     = []
+        self.indices  = []
+
+class PathTrie:
+    __slots__ = 'keys', 'root'
+
+    keys: List[str]
+    root: Node
+
+    def __init__(self, keys: Sequence[str]) -> None:
+        self.keys = list(keys)
+        self.root = Node()
+        for index, key in enumerate(self.keys):
+            node = self.root
+            for prop in key.split('.'):
+                child = node.children.get(prop)
+                if child is None:
+                    child = node.children[prop] = Node()
+                child.indices.append(index)
+                node = child
+            node.ends.append(index)
+
+    @staticmethod
+    def supports(keys: Any) -> bool:
+        """
+        Whether `keys` can be looked up with a trie. Other keys (numbers,
+        `null`, `""`) are handled by `op_var()` in special ways.
+        """
+        return isinstance(keys, list) and all(isinstance(key, str) and key for key in keys)
+
+    def missing(self, data: JsonValue) -> List[str]:
+        """
+        Same as `op_missing(data, keys)`.
+        """
+        missing = [False] * len(self.keys)
+        _walk(data, self.root, missing, None)
+        return [key for key, is_missing in zip(self.keys, missing) if is_missing]
+
+    def missing_some(self, data: JsonValue, need_count: float) -> List[str]:
+        """
+        Same as `op_missing_some(data, need_count, keys)`, but stops as soon as
+        enough keys are found.
+        """
+        if len(self.keys) < need_count or need_count != need_count:
+            # never enough, but the missing keys are needed anyway
+            return self.missing(data)
+
+        if need_count <= 0:
+            return []
+
+        missing = [False] * len(self.keys)
+        found = [need_count]
+        if _walk(data, self.root, missing, found):
+            return []
+
+        return [key for key, is_missing in zip(self.keys, missing) if is_missing]
+
+    def any_missing(self, data: JsonValue) -> bool:
+        """
+        Same as `bool(op_missing(data, keys))`, but stops at the first missing
+        key.
+        """
+        return _any_missing(data, self.root)
+
+def _mark(missing: List[bool], indices: List[int]) -> None:
+    for index in indices:
+        missing[index] = True
+
+def _walk(data: JsonValue, node: Node, missing: List[bool], need: Optional[List[float]]) -> bool:
+    """
+    Mark the missing keys below `node`. Returns `True` if the number of found
+    keys reached `need[0]`.
+    """
+    for prop, child in node.children.items():
+        if isinstance(data, (list, str)):
+            if prop == 'length':
+                # emulate JavaScript behavior, the rest of the path is ignored
+                if need is not None:
+                    need[0] -= len(child.indices)
+                    if need[0] <= 0:
+                        return True
+                continue
+
+            try:
+                index = int(prop, 10)
+            except ValueError:
+                _mark(missing, child.indices)
+                continue
+
+            if prop != str(index) or index < 0 or index >= len(data):
+                _mark(missing, child.indices)
+                continue
+
+            value = data[index]
+        elif isinstance(data, dict):
+            value = data.get(prop)
+        else:
+            _mark(missing, child.indices)
+            continue
+
+        if child.ends:
+            if value is None or value == '':
+                _mark(missing, child.ends)
+            elif need is not None:
+                need[0] -= len(child.ends)
+                if need[0] <= 0:
+                    return True
+
+        if child.children and _walk(value, child, missing, need):
+            return True
+
+    return False
+
+def _any_missing(data: JsonValue, node: Node) -> bool:
+    for prop, child in node.children.items():
+        if isinstance(data, (list, str)):
+            if prop == 'length':
+                # emulate JavaScript behavior, the rest of the path is ignored
+                continue
+
+            try:
+                index = int(prop, 10)
+            except ValueError:
+                return True
+
+            if prop != str(index) or index < 0 or index >= len(data):
+                return True
+
+            value = data[index]
+        elif isinstance(data, dict):
+            value = data.get(prop)
+        else:
+            return True
+
+        if child.ends and (value is None or value == ''):
+            return True
+
+        if child.children and _any_missing(value, child):
+            return True
+
+    return False
@@ -0,0 +1,24 @@
+from typing import Any
+
+import struct
+
+from .codec import get_codec
+
+__all__ = 'HEADER', 'MAX_MESSAGE_SIZE', 'encode_message', 'decode_message'
+
+# Every message is a JSON document prefixed by its size in bytes as an unsigned
+# 32 bit big endian integer.
+HEADER = struct.Struct('>I')
+
+MAX_MESSAGE_SIZE = 64 * 1024 * 1024
+
+CODEC = get_codec()
+
+def encode_message(message: Any) -> bytes:
+    payload = CODEC.dumps(message)
+    if len(payload) > MAX_MESSAGE_SIZE:
+        raise ValueError(f'message too big: {len(payload)} bytes')
+    return HEADER.pack(len(payload)) + payload
+
+def decode_message(payload: bytes) -> Any:
+    return CODEC.loads(payload)
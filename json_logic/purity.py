@@ -0,0 +1,47 @@
+from typing import Any, Set
+
+from .builtins import BUILTINS
+from .extras import EXTRAS_ONLY
+from .cert_logic.builtins import BUILTINS as CERTLOGIC_BUILTINS
+from .cert_logic.extras import EXTRAS as CERTLOGIC_EXTRAS
+
+__all__ = 'PURE_OPERATIONS', 'CACHEABLE_OPERATIONS', 'is_pure', 'is_cacheable'
+
+# Operations that read the data argument, have side effects or depend on the
+# current time. Everything else in the builtins and extras only depends on its
+# arguments.
+IMPURE_NAMES = frozenset(('var', 'missing', 'missing_some', 'log', 'now', 'timeSince'))
+
+# Operation functions that always return the same result for the same
+# arguments, have no side effects and ignore the data argument. Add your own
+# operations here to let the compiler fold and cache them.
+PURE_OPERATIONS: Set[Any] = {
+    operation
+    for operations in (BUILTINS, EXTRAS_ONLY, CERTLOGIC_BUILTINS, CERTLOGIC_EXTRAS)
+    for name, operation in operations.items()
+    if name not in IMPURE_NAMES
+}
+
+# Operation functions that return the same result when called again with the
+# same arguments and data during one evaluation. Used to evaluate common
+# sub-expressions only once per evaluation (see `compile()`). Add your own
+# operations here.
+CACHEABLE_OPERATIONS: Set[Any] = {
+    operation
+    for operations in (BUILTINS, EXTRAS_ONLY, CERTLOGIC_BUILTINS, CERTLOGIC_EXTRAS)
+    for name, operation in operations.items()
+    if name not in ('log', 'now')
+}
+
+def is_pure(operation: Any) -> bool:
+    try:
+        return operation in PURE_OPERATIONS
+    except TypeError:
+        # unhashable callable object
+        return False
+
+def is_cacheable(operation: Any) -> bool:
+    try:
+        return operation in CACHEABLE_OPERATIONS
+    except TypeError:
+        return False
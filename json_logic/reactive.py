@@ -0,0 +1,275 @@
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from .types import JsonValue, Operations
+from .builtins import BUILTINS, to_bool, not_, op_var, op_missing, op_missing_some
+from .apply import resolve_operation
+from .compile import COLLECTION_OPS, Constant, fold, _compile_collection
+from .purity import is_pure
+
+__all__ = 'ReactiveEvaluator',
+
+UNSET: Any = object()
+
+# dependency on the whole data
+WHOLE = ''
+
+class Node:
+    __slots__ = 'parent', 'children', 'compute', 'value'
+
+    def __init__(self, parent: Optional['Node']) -> None:
+        self.parent   = parent
+        self.children: List[Node] = []
+        self.compute: Callable[[Node, JsonValue], JsonValue] = _compute_literal
+        self.value: JsonValue = UNSET
+
+    def evaluate(self, data: JsonValue) -> JsonValue:
+        value = self.value
+        if value is UNSET:
+            value = self.value = self.compute(self, data)
+        return value
+
+def _compute_literal(node: Node, data: JsonValue) -> JsonValue:
+    raise AssertionError('literal nodes are never invalidated')
+
+def _compute_list(node: Node, data: JsonValue) -> JsonValue:
+    return [child.evaluate(data) for child in node.children]
+
+def _compute_if(node: Node, data: JsonValue) -> JsonValue:
+    children = node.children
+    argc = len(children)
+    last_index = argc - 1
+    index = 0
+    while index < last_index:
+        if to_bool(children[index].evaluate(data)):
+            return children[index + 1].evaluate(data)
+        index += 2
+
+    if index >= argc:
+        return None
+
+    return children[index].evaluate(data)
+
+def _compute_and(node: Node, data: JsonValue) -> JsonValue:
+    current = None
+    for child in node.children:
+        current = child.evaluate(data)
+        if not_(current):
+            return current
+    return current
+
+def _compute_or(node: Node, data: JsonValue) -> JsonValue:
+    current = None
+    for child in node.children:
+        current = child.evaluate(data)
+        if to_bool(current):
+            return current
+    return current
+
+def is_related_path(a: str, b: str) -> bool:
+    """
+    Whether changing one of the paths can change the value at the other path.
+    """
+    if a == WHOLE or b == WHOLE or a == b:
+        return True
+
+    if len(a) < len(b):
+        return b.startswith(a) and b[len(a)] == '.'
+
+    return a.startswith(b) and a[len(b)] == '.'
+
+class ReactiveEvaluator:
+    """
+    Evaluates a set of rules and re-evaluates only what is affected when a
+    single value of the data changes.
+
+    Every sub-expression caches its value and knows the `var` paths it reads.
+    Collection operations (`map`, `filter`, `reduce`, `all`, `some`, `none`)
+    are re-evaluated as a whole. Operations that aren't registered as pure
+    (see `json_logic.purity`) are assumed to read the whole data.
+
+    The data is never mutated. `set()` replaces the containers along the path
+    with copies, so previously returned results stay intact. An evaluator is
+    not thread-safe, use one per thread or guard it with a lock.
+    """
+    __slots__ = 'operations', 'data', 'results', '_roots', '_index'
+
+    operations: Operations
+    data: JsonValue
+    results: Dict[Hashable, JsonValue]
+    _roots: Dict[Hashable, Node]
+    _index: Dict[str, List[Node]]
+
+    def __init__(self, rules: Dict[Hashable, JsonValue], data: JsonValue=None, operations: Operations=BUILTINS) -> None:
+        self.operations = operations
+        self.data    = data
+        self.results = {}
+        self._roots  = {}
+        self._index  = {}
+
+        for rule_id, logic in rules.items():
+            root = self._build(fold(logic, operations), None)
+            self._roots[rule_id]  = root
+            self.results[rule_id] = root.evaluate(data)
+
+    def set(self, path: str, value: JsonValue) -> Dict[Hashable, Tuple[JsonValue, JsonValue]]:
+        """
+        Set the value at the dot separated `path` and return the rules whose
+        results changed as `{rule_id: (old_result, new_result)}`.
+        """
+        props = path.split('.') if path else []
+        changed: List[str] = []
+        self.data = _assign(self.data, props, 0, value, changed)
+        changed_path = '.'.join(props[:len(props) - len(changed)]) if changed else path
+
+        dirty_roots = set()
+        for dep_path, nodes in self._index.items():
+            if is_related_path(dep_path, changed_path):
+                for node in nodes:
+                    while node.value is not UNSET:
+                        node.value = UNSET
+                        if node.parent is None:
+                            dirty_roots.add(node)
+                            break
+                        node = node.parent
+
+        diff: Dict[Hashable, Tuple[JsonValue, JsonValue]] = {}
+        if not dirty_roots:
+            return diff
+
+        data = self.data
+        for rule_id, root in self._roots.items():
+            if root in dirty_roots:
+                old_result = self.results[rule_id]
+                new_result = self.results[rule_id] = root.evaluate(data)
+                if not _same(old_result, new_result):
+                    diff[rule_id] = (old_result, new_result)
+
+        return diff
+
+    def _depend(self, node: Node, path: str) -> None:
+        nodes = self._index.get(path)
+        if nodes is None:
+            self._index[path] = [node]
+        else:
+            nodes.append(node)
+
+    def _build(self, logic: JsonValue, parent: Optional[Node]) -> Node:
+        node = Node(parent)
+
+        if isinstance(logic, list):
+            node.children = [self._build(item, node) for item in logic]
+            node.compute  = _compute_list
+            return node
+
+        if not isinstance(logic, dict) or len(logic) != 1:
+            node.value = logic
+            return node
+
+        op, args = next(iter(logic.items()))
+
+        if not isinstance(args, list):
+            args = [args]
+
+        if op == 'if' or op == '?:':
+            node.compute = _compute_if
+
+        elif op == 'and':
+            node.compute = _compute_and
+
+        elif op == 'or':
+            node.compute = _compute_or
+
+        elif op in COLLECTION_OPS:
+            # the sub-logic only sees the items, so only the items expression
+            # depends on the data
+            func = _compile_collection(op, _identity, args, self.operations)
+            if not args or type(func) is Constant:
+                node.value = func(None)
+            else:
+                node.children = [self._build(args[0], node)]
+                node.compute  = lambda node, data: func(node.children[0].evaluate(data))
+            return node
+
+        else:
+            operations = self.operations
+            try:
+                operation = resolve_operation(op, operations)
+            except Exception:
+                def compute_unresolved(node: Node, data: JsonValue) -> JsonValue:
+                    values = [child.evaluate(data) for child in node.children]
+                    return resolve_operation(op, operations)(data, *values)
+                node.compute = compute_unresolved
+                self._depend(node, WHOLE)
+            else:
+                for path in _dependencies(operation, args):
+                    self._depend(node, path)
+                node.compute = lambda node, data: operation(data, *[child.evaluate(data) for child in node.children])
+
+        node.children = [self._build(arg, node) for arg in args]
+        return node
+
+def _identity(data: JsonValue) -> JsonValue:
+    return data
+
+def _dependencies(operation: Any, args: List[JsonValue]) -> List[str]:
+    if operation is op_var:
+        key = args[0] if args else None
+        if isinstance(key, str) and key:
+            return [key]
+        return [WHOLE]
+
+    if operation is op_missing or operation is op_missing_some:
+        if operation is op_missing_some:
+            keys = args[1] if len(args) > 1 else None
+        else:
+            keys = args[0] if args and isinstance(args[0], list) else args
+
+        if isinstance(keys, list) and all(isinstance(key, str) and key for key in keys):
+            return keys
+
+        return [WHOLE]
+
+    if is_pure(operation):
+        return []
+
+    return [WHOLE]
+
+def _assign(data: JsonValue, props: List[str], index: int, value: JsonValue, changed: List[str]) -> JsonValue:
+    """
+    Returns a copy of `data` with `value` at `props[index:]`. If the structure
+    of the data changes (a container is created or a list grows) the remaining
+    props from that point are appended to `changed`.
+    """
+    if index == len(props):
+        return value
+
+    prop = props[index]
+
+    if isinstance(data, list):
+        try:
+            list_index = int(prop, 10)
+        except ValueError:
+            list_index = -1
+
+        if prop != str(list_index) or list_index < 0 or list_index > len(data):
+            raise IndexError(f"illegal list index {prop!r} in path {'.'.join(props)!r}")
+
+        items = data[:]
+        if list_index == len(data):
+            # the length changes
+            changed.extend(props[index:])
+            items.append(_assign(None, props, index + 1, value, []))
+        else:
+            items[list_index] = _assign(data[list_index], props, index + 1, value, changed)
+        return items
+
+    if isinstance(data, dict):
+        obj = dict(data)
+        obj[prop] = _assign(data.get(prop), props, index + 1, value, changed)
+        return obj
+
+    changed.extend(props[index:])
+    return {prop: _assign(None, props, index + 1, value, [])}
+
+def _same(a: JsonValue, b: JsonValue) -> bool:
+    return a is b or (type(a) is type(b) and a == b)
@@ -0,0 +1,297 @@
+"""
+Hot reloading of rule sets.
+
+`RuleRegistry` holds the active version of a rule set as compiled rules.
+`reload()` loads, compiles and validates a new version in a background
+thread and then swaps it in with a single assignment, so requests never wait
+for the compiler:
+
+    registry = RuleRegistry(rules)
+    registry.evaluate('adult', {"age": 20})
+
+    future = registry.reload(fetch_rules)   # returns immediately
+    future.result().version                 # 2
+
+Evaluations that already started keep using the version they started with.
+Rules are identified by a hash of their canonical JSON, and only rules with a
+new hash are compiled, all other compiled rules are taken over from the
+active version. If loading, compiling or validating fails the active version
+stays as it is and the future raises the exception.
+
+For servers that fork worker processes after loading the rules call
+`preload()` in the parent right before forking, see its documentation.
+"""
+
+from typing import Any, Callable, Dict, Hashable, Iterable, Mapping, NamedTuple, Optional, Union
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Lock
+from time import perf_counter
+
+import gc
+import json
+import hashlib
+
+from .types import JsonValue, Operations
+from .builtins import BUILTINS
+from .apply import resolve_operation
+from .compile import COLLECTION_OPS, Compiled, compile
+
+__all__ = 'RuleRegistry', 'RuleSet', 'CompileStats', 'rule_hash', 'check_operations'
+
+Rules = Mapping[Hashable, JsonValue]
+
+def rule_hash(logic: JsonValue) -> str:
+    """
+    SHA-256 of the canonical JSON of `logic` (sorted keys, no whitespace).
+    `1`, `1.0` and `true` are different rules. Non-ASCII characters are
+    escaped, so strings with lone surrogates can be hashed, too.
+    """
+    canonical = json.dumps(logic, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('ASCII')).hexdigest()
+
+def check_operations(logic: JsonValue, operations: Operations=BUILTINS) -> None:
+    """
+    Raise `ReferenceError` if `logic` uses an operation that isn't defined.
+    """
+    if isinstance(logic, list):
+        for item in logic:
+            check_operations(item, operations)
+        return
+
+    if not isinstance(logic, dict) or len(logic) != 1:
+        return
+
+    op, args = next(iter(logic.items()))
+
+    if not isinstance(args, list):
+        args = [args]
+
+    if op == 'reduce':
+        # the initial value is not evaluated
+        args = args[:2]
+    elif op not in ('if', '?:', 'and', 'or') and op not in COLLECTION_OPS:
+        resolve_operation(op, operations)
+
+    for arg in args:
+        check_operations(arg, operations)
+
+class CompileStats(NamedTuple):
+    # number of rules in the version
+    rules: int
+    # number of rules that were compiled, the rest was taken over
+    compiled: int
+    reused: int
+    # wall time of loading, compiling and validating
+    load_seconds: float
+    compile_seconds: float
+    validate_seconds: float
+
+class RuleSet:
+    """
+    One immutable version of a rule set.
+    """
+    __slots__ = 'version', 'logic', 'hashes', 'rules', 'stats'
+
+    version: int
+    logic: Dict[Hashable, JsonValue]
+    hashes: Dict[Hashable, str]
+    rules: Dict[Hashable, Compiled]
+    stats: CompileStats
+
+    def __init__(self, version: int, logic: Dict[Hashable, JsonValue], hashes: Dict[Hashable, str], rules: Dict[Hashable, Compiled], stats: CompileStats) -> None:
+        self.version = version
+        self.logic   = logic
+        self.hashes  = hashes
+        self.rules   = rules
+        self.stats   = stats
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def __contains__(self, rule_id: Hashable) -> bool:
+        return rule_id in self.rules
+
+    def evaluate(self, rule_id: Hashable, data: JsonValue=None) -> JsonValue:
+        rule = self.rules.get(rule_id)
+        if rule is None:
+            raise KeyError(f'unknown rule: {rule_id!r}')
+        return rule(data)
+
+EMPTY_STATS = CompileStats(0, 0, 0, 0.0, 0.0, 0.0)
+
+class RuleRegistry:
+    """
+    Holds the active version of a rule set, see the module documentation.
+
+    `validate` is called with every new `RuleSet` before it is activated
+    (e.g. to run test cases) and rejects it by raising an exception. Undefined
+    operations are always rejected. Thread-safe.
+    """
+    operations: Operations
+    cse: bool
+    validate: Optional[Callable[[RuleSet], Any]]
+
+    _current: RuleSet
+    _lock: Lock
+    _executor: Optional[ThreadPoolExecutor]
+
+    def __init__(self, rules: Optional[Rules]=None, operations: Operations=BUILTINS, cse: bool=False,
+                 validate: Optional[Callable[[RuleSet], Any]]=None) -> None:
+        self.operations = operations
+        self.cse        = cse
+        self.validate   = validate
+        self._current   = RuleSet(0, {}, {}, {}, EMPTY_STATS)
+        self._lock      = Lock()
+        self._executor  = None
+
+        if rules is not None:
+            self.load(rules)
+
+    @property
+    def current(self) -> RuleSet:
+        """
+        The active version. Keep a reference to it to evaluate several rules
+        with the same version.
+        """
+        return self._current
+
+    @property
+    def version(self) -> int:
+        return self._current.version
+
+    @property
+    def stats(self) -> CompileStats:
+        """
+        Compile-time metrics of the active version.
+        """
+        return self._current.stats
+
+    def __len__(self) -> int:
+        return len(self._current)
+
+    def __contains__(self, rule_id: Hashable) -> bool:
+        return rule_id in self._current
+
+    def get(self, rule_id: Hashable) -> Optional[Compiled]:
+        return self._current.rules.get(rule_id)
+
+    def evaluate(self, rule_id: Hashable, data: JsonValue=None) -> JsonValue:
+        return self._current.evaluate(rule_id, data)
+
+    def load(self, rules: Union[Rules, Callable[[], Rules]]) -> RuleSet:
+        """
+        Load, compile and validate a new version in the calling thread and
+        activate it. `rules` is a `{rule_id: logic}` mapping or a function that
+        returns one.
+        """
+        # one load at a time, so no version is based on an outdated one
+        with self._lock:
+            start = perf_counter()
+            if callable(rules):
+                rules = rules()
+            logic = dict(rules)
+            hashes = {rule_id: rule_hash(rule) for rule_id, rule in logic.items()}
+            loaded = perf_counter()
+
+            current = self._current
+            by_hash: Dict[str, Compiled] = {
+                digest: current.rules[rule_id]
+                for rule_id, digest in current.hashes.items()
+            }
+
+            compiled: Dict[Hashable, Compiled] = {}
+            compile_count = 0
+            for rule_id, rule in logic.items():
+                digest = hashes[rule_id]
+                func = by_hash.get(digest)
+                if func is None:
+                    check_operations(rule, self.operations)
+                    func = by_hash[digest] = compile(rule, self.operations, self.cse)
+                    compile_count += 1
+                compiled[rule_id] = func
+            compiled_time = perf_counter()
+
+            stats = CompileStats(
+                rules            = len(compiled),
+                compiled         = compile_count,
+                reused           = len(compiled) - compile_count,
+                load_seconds     = loaded - start,
+                compile_seconds  = compiled_time - loaded,
+                validate_seconds = 0.0,
+            )
+            ruleset = RuleSet(current.version + 1, logic, hashes, compiled, stats)
+
+            if self.validate is not None:
+                self.validate(ruleset)
+                ruleset.stats = stats._replace(validate_seconds=perf_counter() - compiled_time)
+
+            # a single assignment, evaluations that already fetched the old
+            # version finish with it
+            self._current = ruleset
+            return ruleset
+
+    def reload(self, rules: Union[Rules, Callable[[], Rules]]) -> 'Future[RuleSet]':
+        """
+        Like `load()`, but in a background thread. Returns a future of the new
+        version. Reloads are done one after another in the order of the calls.
+        """
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(1, thread_name_prefix='json_logic-registry')
+            executor = self._executor
+        return executor.submit(self.load, rules)
+
+    def preload(self, warmup: Iterable[JsonValue]=()) -> RuleSet:
+        """
+        Prepare the active version for worker processes that are forked after
+        it was loaded (e.g. gunicorn with `preload_app`), so that the workers
+        share the memory of the compiled rules instead of each getting a copy
+        of it. Call it in the parent process right before forking:
+
+        * Pending reloads are finished and the background thread is stopped.
+          Threads don't survive a fork and a lock held by a reload would stay
+          locked in the workers.
+        * Every rule is evaluated with every data item of `warmup` and the
+          results and exceptions are discarded. This does the work that is
+          otherwise done on the first evaluation in every worker, like
+          specializing the byte code of the compiled rules.
+        * All objects are moved into the permanent generation of the garbage
+          collector (`gc.freeze()`). Otherwise the first full collection in
+          every worker writes to the header of every object of the rules and
+          so copies all of their memory pages.
+
+        Compiled rules have no mutable state and evaluating them doesn't
+        touch the JSON of the rules, only the reference counts of the compiled
+        functions of the evaluated rules change. For the best results also
+        call `gc.disable()` early in the parent process (before loading the
+        rules) and `gc.enable()` in the workers after forking.
+        """
+        self.close()
+        ruleset = self._current
+
+        for data in warmup:
+            for rule in ruleset.rules.values():
+                try:
+                    rule(data)
+                except Exception:
+                    pass
+
+        gc.freeze()
+        return ruleset
+
+    def close(self) -> None:
+        """
+        Wait for pending reloads and stop the background thread.
+        """
+        with self._lock:
+            executor = self._executor
+            self._executor = None
+        if executor is not None:
+            executor.shutdown()
+
+    def __enter__(self) -> 'RuleRegistry':
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
@@ -0,0 +1,386 @@
+"""
+Compact binary format for rule libraries.
+
+A rule pack stores a `{rule_id: logic}` dict as flat arrays instead of JSON:
+
+* a string pool (offsets and UTF-8 data), used for strings, object keys and
+  rule ids
+* an opcode table with the names of all used operations
+* constant pools for integers and floats
+* a node array (kind, a, b and c columns) and an array of child node indices
+* a rule table with the rule id and root node of every rule
+
+Structurally identical sub-expressions are stored only once. Loading only
+reads the header, everything else is decoded on demand straight from the
+buffer via `memoryview`, so a pack opened with `RulePack.open()` is backed by
+an `mmap` and its pages are shared by all processes that open the same file.
+
+Decoded rules consist of the same immutable `FrozenList` and `FrozenDict`
+nodes as produced by `RuleInterner`, and shared sub-expressions are decoded
+only once. Converting them back to JSON gives exactly the stored rules.
+"""
+
+from typing import Any, Dict, Hashable, Iterator, List, Mapping, Optional
+
+from collections.abc import Mapping as MappingABC
+from array import array
+from struct import Struct
+
+import mmap
+import sys
+
+from .types import JsonValue
+from .intern import FrozenList, FrozenDict
+
+__all__ = 'RulePack', 'dump_rules', 'write_rules'
+
+MAGIC = b'JLRP'
+VERSION = 1
+
+# magic, version, string count, string data size, opcode count, int count,
+# float count, node count, child count, rule count
+HEADER = Struct('<4sIIIIIIIII')
+
+KIND_NULL      = 0
+KIND_FALSE     = 1
+KIND_TRUE      = 2
+KIND_INT       = 3 # a: index into the int pool
+KIND_FLOAT     = 4 # a: index into the float pool
+KIND_STRING    = 5 # a: index into the string pool
+KIND_BIGINT    = 6 # a: index into the string pool, integers that don't fit into 64 bits
+KIND_LIST      = 7 # a: index of the first child, b: number of children
+KIND_OPERATION = 8 # a: node of the arguments, c: index into the opcode table
+KIND_OBJECT    = 9 # a: index of the first child, b: number of properties, children are key and value nodes
+
+INT64_MIN = -(1 << 63)
+INT64_MAX = (1 << 63) - 1
+
+def _align(size: int) -> int:
+    return (size + 7) & ~7
+
+def _array_bytes(values: array) -> bytes:
+    if sys.byteorder != 'little':
+        values = array(values.typecode, values)
+        values.byteswap()
+    data = values.tobytes()
+    return data + b'\0' * (_align(len(data)) - len(data))
+
+class _Writer:
+    def __init__(self) -> None:
+        self.strings: Dict[str, int] = {}
+        self.opcodes: Dict[str, int] = {}
+        self.nodes:   Dict[Hashable, int] = {}
+
+        self.opcode_table = array('I')
+        self.int_pool     = array('q')
+        self.float_pool   = array('d')
+
+        self.kinds    = bytearray()
+        self.a        = array('I')
+        self.b        = array('I')
+        self.c        = array('I')
+        self.children = array('I')
+
+    def string(self, value: str) -> int:
+        index = self.strings.get(value)
+        if index is None:
+            index = self.strings[value] = len(self.strings)
+        return index
+
+    def add_node(self, kind: int, a: int=0, b: int=0, c: int=0) -> int:
+        index = len(self.kinds)
+        self.kinds.append(kind)
+        self.a.append(a)
+        self.b.append(b)
+        self.c.append(c)
+        return index
+
+    def node(self, value: JsonValue) -> int:
+        key: Hashable
+        if value is None:
+            key = KIND_NULL
+        elif value is True:
+            key = KIND_TRUE
+        elif value is False:
+            key = KIND_FALSE
+        elif isinstance(value, str):
+            key = (KIND_STRING, value)
+        elif isinstance(value, int):
+            key = (KIND_INT, value)
+        elif isinstance(value, float):
+            # keeps 0.0 and -0.0 apart
+            key = (KIND_FLOAT, value.hex())
+        elif isinstance(value, list):
+            items = [self.node(item) for item in value]
+            key = (KIND_LIST, tuple(items))
+            index = self.nodes.get(key)
+            if index is None:
+                start = len(self.children)
+                self.children.extend(items)
+                index = self.nodes[key] = self.add_node(KIND_LIST, start, len(items))
+            return index
+        elif isinstance(value, dict):
+            if len(value) != 1:
+                # object literals are compared by identity, so they are not
+                # shared (see RuleInterner)
+                items = []
+                for prop, item in value.items():
+                    items.append(self.node(prop))
+                    items.append(self.node(item))
+                start = len(self.children)
+                self.children.extend(items)
+                return self.add_node(KIND_OBJECT, start, len(value))
+
+            op, args = next(iter(value.items()))
+            args_index = self.node(args)
+            key = (KIND_OPERATION, op, args_index)
+            index = self.nodes.get(key)
+            if index is None:
+                opcode = self.opcodes.get(op)
+                if opcode is None:
+                    opcode = self.opcodes[op] = len(self.opcode_table)
+                    self.opcode_table.append(self.string(op))
+                index = self.nodes[key] = self.add_node(KIND_OPERATION, args_index, 0, opcode)
+            return index
+        else:
+            valuetype = type(value)
+            raise TypeError(f'unhandled type: {valuetype.__module__}.{valuetype.__name__}')
+
+        index = self.nodes.get(key)
+        if index is not None:
+            return index
+
+        if value is None:
+            index = self.add_node(KIND_NULL)
+        elif value is True:
+            index = self.add_node(KIND_TRUE)
+        elif value is False:
+            index = self.add_node(KIND_FALSE)
+        elif isinstance(value, str):
+            index = self.add_node(KIND_STRING, self.string(value))
+        elif isinstance(value, int):
+            if INT64_MIN <= value <= INT64_MAX:
+                index = self.add_node(KIND_INT, len(self.int_pool))
+                self.int_pool.append(value)
+            else:
+                index = self.add_node(KIND_BIGINT, self.string(str(value)))
+        else:
+            index = self.add_node(KIND_FLOAT, len(self.float_pool))
+            self.float_pool.append(value) # type: ignore
+
+        self.nodes[key] = index
+        return index
+
+    def dump(self, rules: Mapping[str, JsonValue]) -> bytes:
+        rule_table = array('I')
+        for rule_id, logic in rules.items():
+            if not isinstance(rule_id, str):
+                raise TypeError(f'rule ids must be strings: {rule_id!r}')
+            rule_table.append(self.string(rule_id))
+            rule_table.append(self.node(logic))
+
+        encoded = [string.encode('UTF-8', 'surrogatepass') for string in self.strings]
+        string_offsets = array('I', [0])
+        offset = 0
+        for data in encoded:
+            offset += len(data)
+            string_offsets.append(offset)
+        string_data = b''.join(encoded)
+
+        header = HEADER.pack(
+            MAGIC, VERSION, len(encoded), len(string_data), len(self.opcode_table),
+            len(self.int_pool), len(self.float_pool), len(self.kinds),
+            len(self.children), len(rules))
+
+        return b''.join([
+            header, b'\0' * (_align(len(header)) - len(header)),
+            _array_bytes(string_offsets),
+            string_data, b'\0' * (_align(len(string_data)) - len(string_data)),
+            _array_bytes(self.opcode_table),
+            _array_bytes(self.int_pool),
+            _array_bytes(self.float_pool),
+            bytes(self.kinds), b'\0' * (_align(len(self.kinds)) - len(self.kinds)),
+            _array_bytes(self.a),
+            _array_bytes(self.b),
+            _array_bytes(self.c),
+            _array_bytes(self.children),
+            _array_bytes(rule_table),
+        ])
+
+def dump_rules(rules: Mapping[str, JsonValue]) -> bytes:
+    """
+    Serialize a `{rule_id: logic}` dict into a rule pack.
+    """
+    return _Writer().dump(rules)
+
+def write_rules(path: str, rules: Mapping[str, JsonValue]) -> None:
+    with open(path, 'wb') as stream:
+        stream.write(dump_rules(rules))
+
+_MISSING: Any = object()
+
+class RulePack(MappingABC):
+    """
+    Read-only `{rule_id: logic}` mapping backed by a rule pack buffer. Rules
+    are decoded on first access and cached.
+    """
+    _buffer: Any
+    _views: List[memoryview]
+    _cache: List[Any]
+    _string_cache: List[Optional[str]]
+    _rules: Dict[str, int]
+
+    def __init__(self, buffer: Any) -> None:
+        view = memoryview(buffer)
+        self._buffer = buffer
+        self._views  = [view]
+
+        if len(view) < HEADER.size:
+            raise ValueError('not a rule pack')
+
+        magic, version, string_count, string_size, opcode_count, int_count, \
+            float_count, node_count, child_count, rule_count = HEADER.unpack_from(view)
+
+        if magic != MAGIC:
+            raise ValueError('not a rule pack')
+
+        if version != VERSION:
+            raise ValueError(f'unsupported rule pack version: {version}')
+
+        offset = _align(HEADER.size)
+        def section(size: int, format: Optional[str]=None) -> Any:
+            nonlocal offset
+            end = offset + size
+            if end > len(view):
+                raise ValueError('truncated rule pack')
+            part = view[offset:end]
+            self._views.append(part)
+            offset = _align(end)
+            if format is None:
+                return part
+            if sys.byteorder != 'little':
+                values = array(format, part.tobytes())
+                values.byteswap()
+                return values
+            part = part.cast(format)
+            self._views.append(part)
+            return part
+
+        self._string_offsets = section((string_count + 1) * 4, 'I')
+        self._string_data    = section(string_size)
+        self._opcodes        = section(opcode_count * 4, 'I')
+        self._ints           = section(int_count * 8, 'q')
+        self._floats         = section(float_count * 8, 'd')
+        self._kinds          = section(node_count)
+        self._a              = section(node_count * 4, 'I')
+        self._b              = section(node_count * 4, 'I')
+        self._c              = section(node_count * 4, 'I')
+        self._children       = section(child_count * 4, 'I')
+        rule_table           = section(rule_count * 8, 'I')
+
+        self._cache = [_MISSING] * node_count
+        self._string_cache = [None] * string_count
+        self._rules = {
+            self._string(rule_table[index]): rule_table[index + 1]
+            for index in range(0, rule_count * 2, 2)
+        }
+
+    @classmethod
+    def open(cls, path: str) -> 'RulePack':
+        """
+        Map the file at `path` into memory. The pack has to be closed before
+        the file can be unmapped.
+        """
+        with open(path, 'rb') as stream:
+            mapped = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return cls(mapped)
+        except BaseException:
+            mapped.close()
+            raise
+
+    def close(self) -> None:
+        """
+        Release the buffer. Rules that were already decoded stay usable.
+        """
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+
+    def __enter__(self) -> 'RulePack':
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def __getitem__(self, rule_id: str) -> JsonValue:
+        return self._node(self._rules[rule_id])
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._rules)
+
+    def __len__(self) -> int:
+        return len(self._rules)
+
+    def __contains__(self, rule_id: Any) -> bool:
+        return rule_id in self._rules
+
+    def load_all(self) -> Dict[str, JsonValue]:
+        """
+        Decode all rules.
+        """
+        node = self._node
+        return {rule_id: node(index) for rule_id, index in self._rules.items()}
+
+    def _string(self, index: int) -> str:
+        string = self._string_cache[index]
+        if string is None:
+            offsets = self._string_offsets
+            string = sys.intern(str(self._string_data[offsets[index]:offsets[index + 1]], 'UTF-8', 'surrogatepass'))
+            self._string_cache[index] = string
+        return string
+
+    def _node(self, index: int) -> JsonValue:
+        value = self._cache[index]
+        if value is not _MISSING:
+            return value
+
+        kind = self._kinds[index]
+        if kind == KIND_OPERATION:
+            value = FrozenDict({self._string(self._opcodes[self._c[index]]): self._node(self._a[index])})
+        elif kind == KIND_LIST:
+            start = self._a[index]
+            children = self._children
+            node = self._node
+            value = FrozenList([node(children[child]) for child in range(start, start + self._b[index])])
+        elif kind == KIND_STRING:
+            value = self._string(self._a[index])
+        elif kind == KIND_INT:
+            value = self._ints[self._a[index]]
+        elif kind == KIND_FLOAT:
+            value = self._floats[self._a[index]]
+        elif kind == KIND_TRUE:
+            value = True
+        elif kind == KIND_FALSE:
+            value = False
+        elif kind == KIND_NULL:
+            value = None
+        elif kind == KIND_BIGINT:
+            value = int(self._string(self._a[index]), 10)
+        elif kind == KIND_OBJECT:
+            start = self._a[index]
+            end = start + self._b[index] * 2
+            children = self._children
+            node = self._node
+            # not cached, every occurrence of an object literal is a new object
+            return FrozenDict({
+                node(children[child]): node(children[child + 1]) # type: ignore
+                for child in range(start, end, 2)
+            })
+        else:
+            raise ValueError(f'illegal node kind: {kind}')
+
+        self._cache[index] = value
+        return value
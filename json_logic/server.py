@@ -0,0 +1,293 @@
+"""
+Long-running JsonLogic evaluation server.
+
+The server listens on a Unix domain socket (or uses stdin/stdout) and speaks
+length-prefixed JSON messages (see `json_logic.protocol`). Requests:
+
+    {"id": 1, "op": "register_rule", "rule": "adult", "logic": {...}}
+    {"id": 2, "op": "eval", "rule": "adult", "data": {...}}
+    {"id": 3, "op": "eval", "rule": "adult", "items": [{...}, {...}]}
+    {"id": 4, "op": "stats"}
+
+Responses are `{"id": ..., "result": ...}` or
+`{"id": ..., "error": {"type": ..., "message": ...}}`. Requests can be
+pipelined and responses are sent as soon as they are done, which might not
+be in request order. `register_rule` requests are finished before any later
+request of the same connection is started.
+
+    python -m json_logic.server --socket /run/json-logic.sock
+"""
+
+from typing import Any, Deque, Dict, List, Optional, Set
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+import argparse
+import asyncio
+import os
+import stat
+import sys
+
+from .types import JsonValue, Operations
+from .builtins import BUILTINS
+from .compile import Compiled, compile
+from .protocol import HEADER, MAX_MESSAGE_SIZE, encode_message, decode_message
+
+__all__ = 'Server', 'LatencyStats', 'main'
+
+class LatencyStats:
+    """
+    Latency statistics of one request type. Percentiles are computed over the
+    most recent `window` requests.
+    """
+    __slots__ = 'count', 'errors', 'total', 'min', 'max', 'recent'
+
+    count: int
+    errors: int
+    total: float
+    min: float
+    max: float
+    recent: Deque[float]
+
+    def __init__(self, window: int=10000) -> None:
+        self.count  = 0
+        self.errors = 0
+        self.total  = 0.0
+        self.min    = float('inf')
+        self.max    = 0.0
+        self.recent = deque(maxlen=window)
+
+    def record(self, seconds: float, error: bool=False) -> None:
+        self.count += 1
+        if error:
+            self.errors += 1
+        self.total += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.recent.append(seconds)
+
+    def snapshot(self) -> Dict[str, JsonValue]:
+        recent = sorted(self.recent)
+        def percentile(p: float) -> Optional[float]:
+            if not recent:
+                return None
+            return recent[min(len(recent) - 1, int(len(recent) * p))]
+
+        return {
+            'count':  self.count,
+            'errors': self.errors,
+            'min':    self.min if self.count else None,
+            'max':    self.max if self.count else None,
+            'avg':    self.total / self.count if self.count else None,
+            'p50':    percentile(0.50),
+            'p90':    percentile(0.90),
+            'p99':    percentile(0.99),
+        }
+
+class Server:
+    """
+    Keeps compiled rules in memory and evaluates requests in a bounded pool
+    of worker threads. At most `max_pending` requests are in flight at any
+    time, further requests are not read from the connections until a slot
+    frees up.
+    """
+    operations: Operations
+    rules: Dict[str, Compiled]
+    stats: Dict[str, LatencyStats]
+
+    def __init__(self, operations: Operations=BUILTINS, workers: Optional[int]=None, max_pending: int=1024) -> None:
+        self.operations  = operations
+        self.rules       = {}
+        self.stats       = {}
+        self.executor    = ThreadPoolExecutor(workers)
+        self.max_pending = max_pending
+        self._pending: Optional[asyncio.Semaphore] = None
+
+    def close(self) -> None:
+        self.executor.shutdown()
+
+    def dispatch(self, message: Any) -> JsonValue:
+        """
+        Handle one request and return the result. Runs in a worker thread,
+        except for `stats` requests.
+        """
+        if not isinstance(message, dict):
+            raise TypeError('message needs to be an object')
+
+        op = message.get('op')
+
+        if op == 'eval':
+            rule_id = message.get('rule')
+            rule = self.rules.get(rule_id) # type: ignore
+            if rule is None:
+                raise KeyError(f'unknown rule: {rule_id!r}')
+
+            if 'items' in message:
+                items = message['items']
+                if not isinstance(items, list):
+                    raise TypeError('items needs to be an array')
+                return [rule(data) for data in items]
+
+            return rule(message.get('data'))
+
+        if op == 'register_rule':
+            rule_id = message.get('rule')
+            if not isinstance(rule_id, str):
+                raise TypeError('rule id needs to be a string')
+            # replacing the dict item is atomic, in-flight evaluations keep
+            # using the old rule
+            self.rules[rule_id] = compile(message.get('logic'), self.operations)
+            return None
+
+        if op == 'stats':
+            return {name: stats.snapshot() for name, stats in self.stats.items()}
+
+        raise ValueError(f'unknown op: {op!r}')
+
+    def _record(self, op: Any, seconds: float, error: bool) -> None:
+        name = op if isinstance(op, str) else 'invalid'
+        stats = self.stats.get(name)
+        if stats is None:
+            stats = self.stats[name] = LatencyStats()
+        stats.record(seconds, error)
+
+    async def _process(self, message: Any, writer: asyncio.StreamWriter, write_lock: asyncio.Lock, start: float) -> None:
+        request_id: JsonValue = None
+        op: Any = None
+        response: Dict[str, JsonValue]
+        try:
+            if isinstance(message, Exception):
+                raise message
+            if isinstance(message, dict):
+                request_id = message.get('id')
+                op = message.get('op')
+            if op == 'stats':
+                # the stats are only touched by the event loop thread
+                result = self.dispatch(message)
+            else:
+                result = await asyncio.get_running_loop().run_in_executor(self.executor, self.dispatch, message)
+            response = {'id': request_id, 'result': result}
+            data = encode_message(response)
+            error = False
+        except Exception as exc:
+            response = {'id': request_id, 'error': {'type': type(exc).__name__, 'message': str(exc)}}
+            data = encode_message(response)
+            error = True
+        finally:
+            assert self._pending is not None
+            self._pending.release()
+
+        self._record(op, perf_counter() - start, error)
+
+        async with write_lock:
+            writer.write(data)
+            await writer.drain()
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        if self._pending is None:
+            self._pending = asyncio.Semaphore(self.max_pending)
+
+        write_lock = asyncio.Lock()
+        tasks: Set[asyncio.Task] = set()
+        try:
+            while True:
+                try:
+                    header = await reader.readexactly(HEADER.size)
+                except (asyncio.IncompleteReadError, ConnectionResetError):
+                    break
+
+                size, = HEADER.unpack(header)
+                if size > MAX_MESSAGE_SIZE:
+                    error = {'id': None, 'error': {'type': 'ValueError', 'message': f'message too big: {size} bytes'}}
+                    async with write_lock:
+                        writer.write(encode_message(error))
+                        await writer.drain()
+                    break
+
+                try:
+                    payload = await reader.readexactly(size)
+                except (asyncio.IncompleteReadError, ConnectionResetError):
+                    # the client disconnected in the middle of a message
+                    break
+                start = perf_counter()
+
+                message: Any
+                try:
+                    message = decode_message(payload)
+                except Exception as exc:
+                    message = exc
+
+                await self._pending.acquire()
+                if isinstance(message, dict) and message.get('op') == 'register_rule':
+                    # later requests of this connection may use the rule
+                    await self._process(message, writer, write_lock, start)
+                else:
+                    task = asyncio.ensure_future(self._process(message, writer, write_lock, start))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+        finally:
+            # the responses of pending requests are written before closing
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            writer.close()
+
+    async def serve_unix(self, path: str) -> None:
+        try:
+            if stat.S_ISSOCK(os.stat(path).st_mode):
+                os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+        server = await asyncio.start_unix_server(self.handle_connection, path)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    async def serve_stdio(self) -> None:
+        loop = asyncio.get_running_loop()
+
+        reader = asyncio.StreamReader()
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin.buffer)
+
+        transport, protocol = await loop.connect_write_pipe(asyncio.streams.FlowControlMixin, sys.stdout.buffer)
+        writer = asyncio.StreamWriter(transport, protocol, reader, loop)
+
+        await self.handle_connection(reader, writer)
+
+def main(argv: Optional[List[str]]=None) -> None:
+    parser = argparse.ArgumentParser(prog='python -m json_logic.server', description='JsonLogic evaluation server')
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--socket', metavar='PATH', help='listen on this Unix domain socket')
+    group.add_argument('--stdio', action='store_true', help='read requests from stdin and write responses to stdout')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker threads')
+    parser.add_argument('--max-pending', type=int, default=1024, help='maximum number of requests in flight')
+    parser.add_argument('--extras', action='store_true', help='enable the operations from json_logic.extras')
+    args = parser.parse_args(argv)
+
+    operations = BUILTINS
+    if args.extras:
+        from .extras import EXTRAS
+        operations = EXTRAS
+
+    server = Server(operations, args.workers, args.max_pending)
+    try:
+        if args.stdio:
+            asyncio.run(server.serve_stdio())
+        else:
+            asyncio.run(server.serve_unix(args.socket))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+if __name__ == '__main__':
+    main()
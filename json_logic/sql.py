@@ -0,0 +1,662 @@
+"""
+Translate JsonLogic rules into SQLite `WHERE` clauses.
+
+Records are expected to be stored as JSON documents in a text column. The
+translation of a rule is a pair of SQL conditions:
+
+* `where`: true for every row for which the rule might be truthy. This is the
+  conservative pre-filter.
+* `exact`: true only for rows for which the rule is certainly truthy.
+
+Where the JavaScript style type coercion of JsonLogic can't be expressed in
+SQL (e.g. comparing a string with a number) the two conditions differ and the
+rows that match `where` but not `exact` need to be checked in Python.
+`filter_rows()` does exactly that.
+"""
+
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import json
+import re
+
+from .types import JsonValue, Operations
+from .builtins import BUILTINS, NUMERIC, to_bool, to_number, to_string
+from .apply import apply, resolve_operation
+from .compile import fold
+
+__all__ = 'SqlFilter', 'to_sql', 'filter_rows'
+
+class SqlFilter(NamedTuple):
+    where: str
+    exact: str
+    params: Dict[str, Any]
+    # sub-expressions that could not be translated (at all or for some types)
+    untranslated: List[JsonValue]
+
+    @property
+    def is_exact(self) -> bool:
+        return self.where == self.exact
+
+class Pred(NamedTuple):
+    # condition under which the expression is certainly truthy and under which
+    # it might be truthy
+    certain: str
+    possible: str
+
+TRUE  = Pred('1', '1')
+FALSE = Pred('0', '0')
+UNKNOWN = Pred('0', '1')
+
+def const_pred(value: bool) -> Pred:
+    return TRUE if value else FALSE
+
+def exact_pred(sql: str) -> Pred:
+    # comparisons with NaN (NULL in SQLite) are false, just like in Python
+    sql = f'IFNULL({sql}, 0)'
+    return Pred(sql, sql)
+
+def not_pred(pred: Pred) -> Pred:
+    if pred is UNKNOWN:
+        return UNKNOWN
+    return Pred(_not(pred.possible), _not(pred.certain))
+
+def _not(sql: str) -> str:
+    if sql == '1':
+        return '0'
+    if sql == '0':
+        return '1'
+    return f'NOT {sql}'
+
+def _join(joiner: str, items: List[str], neutral: str, absorbing: str) -> str:
+    items = [item for item in items if item != neutral]
+    if absorbing in items:
+        return absorbing
+    if not items:
+        return neutral
+    if len(items) == 1:
+        return items[0]
+    return '(' + f' {joiner} '.join(items) + ')'
+
+def and_pred(preds: List[Pred]) -> Pred:
+    return Pred(
+        _join('AND', [pred.certain  for pred in preds], '1', '0'),
+        _join('AND', [pred.possible for pred in preds], '1', '0'),
+    )
+
+def or_pred(preds: List[Pred]) -> Pred:
+    return Pred(
+        _join('OR', [pred.certain  for pred in preds], '0', '1'),
+        _join('OR', [pred.possible for pred in preds], '0', '1'),
+    )
+
+def case_pred(cases: List[Tuple[Optional[str], Pred]]) -> Pred:
+    """
+    `cases` are mutually exclusive conditions, the last one has to be `None`
+    (i.e. `ELSE`).
+    """
+    if len(cases) == 1:
+        return cases[0][1]
+
+    def build(attr: int) -> str:
+        values = [pred[attr] for _, pred in cases]
+        if all(value == values[0] for value in values):
+            return values[0]
+        whens = ' '.join(f'WHEN {cond} THEN {value}' for (cond, _), value in zip(cases[:-1], values))
+        return f'(CASE {whens} ELSE {values[-1]} END)'
+
+    return Pred(build(0), build(1))
+
+# Kinds of values a JSON value can have at runtime. 'number' includes booleans,
+# because Python treats them as numbers (True == 1).
+NUMBER  = 'number'
+STRING  = 'string'
+NULL    = 'null'
+OTHER   = 'other'
+UNKNOWN_KIND = 'unknown'
+
+class Sql(NamedTuple):
+    sql: str
+
+class Const(NamedTuple):
+    value: Any
+
+Value = Any # Sql or Const
+Case = Tuple[Optional[str], str, Value]
+
+COMPARISONS = frozenset(('===', '!==', '==', '!=', '<', '>', '<=', '>='))
+ARITHMETIC  = frozenset(('+', '-', '*', '/'))
+SIMPLE_PROP = re.compile(r'^[^".\[\]]+$')
+
+def kind_of(value: Any) -> str:
+    if isinstance(value, NUMERIC):
+        return NUMBER
+    if isinstance(value, str):
+        return STRING
+    if value is None:
+        return NULL
+    return OTHER
+
+class Translator:
+    def __init__(self, column: str, operations: Operations) -> None:
+        self.column = '"' + column.replace('"', '""') + '"'
+        self.operations = operations
+        self.params: Dict[str, Any] = {}
+        self.untranslated: List[JsonValue] = []
+
+    def param(self, value: Any) -> str:
+        name = f'p{len(self.params)}'
+        self.params[name] = value
+        return f':{name}'
+
+    def sql(self, value: Value) -> str:
+        if isinstance(value, Const):
+            if isinstance(value.value, bool):
+                return '1' if value.value else '0'
+            return self.param(value.value)
+        return value.sql
+
+    def unknown(self, logic: JsonValue) -> Pred:
+        self.untranslated.append(logic)
+        return UNKNOWN
+
+    def is_builtin(self, op: str) -> bool:
+        try:
+            return resolve_operation(op, self.operations) is BUILTINS[op]
+        except Exception:
+            return False
+
+    def json_path(self, key: Any) -> Optional[str]:
+        """
+        JSON path for a `var` key if SQLite and `op_var` resolve it the same
+        way. Numeric props (list index or object key?) and `length` differ.
+        """
+        if not isinstance(key, str) or not key:
+            return None
+
+        props = key.split('.')
+        for prop in props:
+            if not SIMPLE_PROP.match(prop) or prop == 'length' or prop.isdigit():
+                return None
+
+        return self.param('$' + ''.join(f'."{prop}"' for prop in props))
+
+    def var_path(self, logic: JsonValue) -> Optional[str]:
+        if not isinstance(logic, dict) or len(logic) != 1:
+            return None
+        op, args = next(iter(logic.items()))
+        if op != 'var' or not self.is_builtin(op):
+            return None
+        if isinstance(args, list):
+            if len(args) != 1:
+                return None
+            args = args[0]
+        return self.json_path(args)
+
+    def var_cases(self, path: str) -> List[Case]:
+        json_type = f'json_type({self.column}, {path})'
+        value = Sql(f'json_extract({self.column}, {path})')
+        return [
+            (f"{json_type} IN ('integer', 'real', 'true', 'false')", NUMBER, value),
+            (f"{json_type} = 'text'", STRING, value),
+            (f"({json_type} IS NULL OR {json_type} = 'null')", NULL, Const(None)),
+            (None, OTHER, value),
+        ]
+
+    # ---- values ----
+
+    def cases(self, logic: JsonValue) -> List[Case]:
+        if not isinstance(logic, dict) or len(logic) != 1:
+            if isinstance(logic, list):
+                # apply() creates a new list
+                return [(None, UNKNOWN_KIND, None)] if any(isinstance(item, (list, dict)) for item in logic) else \
+                    [(None, OTHER, Const(logic))]
+            return [(None, kind_of(logic), Const(logic))]
+
+        path = self.var_path(logic)
+        if path is not None:
+            return self.var_cases(path)
+
+        op, args = next(iter(logic.items()))
+        if not isinstance(args, list):
+            args = [args]
+
+        if op in ARITHMETIC and self.is_builtin(op):
+            number = self.arithmetic(op, args)
+            if number is not None:
+                guard, sql = number
+                if guard == '1':
+                    return [(None, NUMBER, Sql(sql))]
+                return [(guard, NUMBER, Sql(sql)), (None, UNKNOWN_KIND, None)]
+
+        elif op == 'cat' and self.is_builtin(op):
+            string = self.cat(args)
+            if string is not None:
+                guard, sql = string
+                if guard == '1':
+                    return [(None, STRING, Sql(sql))]
+                return [(guard, STRING, Sql(sql)), (None, UNKNOWN_KIND, None)]
+
+        self.untranslated.append(logic)
+        return [(None, UNKNOWN_KIND, None)]
+
+    def number(self, logic: JsonValue, nullable: bool=True) -> Optional[Tuple[str, str]]:
+        """
+        Returns the condition under which `to_number(value)` can be computed
+        in SQL and the SQL expression for it. With `nullable=False` the
+        condition excludes null values.
+        """
+        if not isinstance(logic, (dict, list)):
+            value = to_number(logic)
+            if value != value:
+                # NaN
+                return None
+            return '1', self.sql(Const(value))
+
+        path = self.var_path(logic)
+        if path is not None:
+            json_type = f'json_type({self.column}, {path})'
+            if not nullable:
+                return (
+                    f"{json_type} IN ('integer', 'real', 'true', 'false')",
+                    f'json_extract({self.column}, {path})',
+                )
+            return (
+                f"({json_type} IS NULL OR {json_type} IN ('integer', 'real', 'true', 'false', 'null'))",
+                f'IFNULL(json_extract({self.column}, {path}), 0)',
+            )
+
+        if isinstance(logic, dict) and len(logic) == 1:
+            op, args = next(iter(logic.items()))
+            if op in ARITHMETIC and self.is_builtin(op):
+                return self.arithmetic(op, args if isinstance(args, list) else [args])
+
+        return None
+
+    def arithmetic(self, op: str, args: List[JsonValue]) -> Optional[Tuple[str, str]]:
+        if op == '-' and len(args) >= 2 and args[1] is None:
+            # b is None means unary minus
+            args = args[:1]
+
+        if op == '/' and len(args) < 2 or op == '-' and not args:
+            # the result would be NaN or an exception
+            return None
+
+        if op == '-' or op == '/':
+            if any(isinstance(arg, (dict, list)) for arg in args[2:]):
+                # ignored, but still evaluated
+                return None
+            args = args[:2]
+
+        operands = []
+        for index, arg in enumerate(args):
+            # for `-` a second argument that evaluates to null means unary minus
+            number = self.number(arg, op != '-' or index == 0)
+            if number is None:
+                return None
+            operands.append(number)
+
+        guards = [guard for guard, _ in operands]
+        values = [sql for _, sql in operands]
+
+        if op == '+':
+            sql = '(' + ' + '.join(values) + ')' if values else '0'
+        elif op == '*':
+            sql = '(' + ' * '.join(values) + ')' if values else '1'
+        elif op == '-':
+            sql = f'(-{values[0]})' if len(values) == 1 else f'({values[0]} - {values[1]})'
+        else:
+            # Python raises ZeroDivisionError, so leave that to Python
+            guards.append(f'{values[1]} != 0')
+            sql = f'(CAST({values[0]} AS REAL) / {values[1]})'
+
+        return _join('AND', guards, '1', '0'), sql
+
+    def cat(self, args: List[JsonValue]) -> Optional[Tuple[str, str]]:
+        guards: List[str] = []
+        values: List[str] = []
+        for arg in args:
+            if not isinstance(arg, (dict, list)):
+                values.append(self.sql(Const(to_string(arg))))
+                continue
+
+            path = self.var_path(arg)
+            if path is None:
+                return None
+
+            json_type = f'json_type({self.column}, {path})'
+            # floats are formatted differently by SQLite
+            guards.append(f"({json_type} IS NULL OR {json_type} IN ('text', 'integer', 'true', 'false', 'null'))")
+            values.append(
+                f"(CASE {json_type} WHEN 'true' THEN 'True' WHEN 'false' THEN 'False' "
+                f"WHEN 'text' THEN json_extract({self.column}, {path}) "
+                f"WHEN 'integer' THEN CAST(json_extract({self.column}, {path}) AS TEXT) "
+                f"ELSE 'null' END)"
+            )
+
+        if not values:
+            return '1', self.sql(Const(''))
+
+        return _join('AND', guards, '1', '0'), '(' + ' || '.join(values) + ')'
+
+    # ---- predicates ----
+
+    def predicate(self, logic: JsonValue) -> Pred:
+        if isinstance(logic, list):
+            if logic:
+                # a non-empty list is truthy, but its items might have side effects
+                return TRUE if all(not isinstance(item, dict) for item in logic) else self.unknown(logic)
+            return FALSE
+
+        if not isinstance(logic, dict) or len(logic) != 1:
+            return const_pred(to_bool(logic))
+
+        op, args = next(iter(logic.items()))
+        if not isinstance(args, list):
+            args = [args]
+
+        if op == 'and':
+            return and_pred([self.predicate(arg) for arg in args]) if args else FALSE
+
+        if op == 'or':
+            return or_pred([self.predicate(arg) for arg in args]) if args else FALSE
+
+        if op == 'if' or op == '?:':
+            return self.if_predicate(args)
+
+        if op == '!' and self.is_builtin(op):
+            return not_pred(self.predicate(args[0] if args else None))
+
+        if op == '!!' and self.is_builtin(op):
+            return self.predicate(args[0] if args else None)
+
+        if op in COMPARISONS and self.is_builtin(op):
+            return self.comparison(logic, op, args)
+
+        if op == 'in' and self.is_builtin(op):
+            return self.in_predicate(logic, args)
+
+        if op == 'missing' and self.is_builtin(op):
+            keys = args[0] if args and isinstance(args[0], list) else args
+            conds = self.missing_conds(keys)
+            if conds is None:
+                return self.unknown(logic)
+            return exact_pred(_join('OR', conds, '0', '1'))
+
+        if op == 'missing_some' and self.is_builtin(op):
+            return self.missing_some_predicate(logic, args)
+
+        return self.truthy(self.cases(logic))
+
+    def if_predicate(self, args: List[JsonValue]) -> Pred:
+        argc = len(args)
+        if argc == 0:
+            return FALSE
+        if argc == 1:
+            return self.predicate(args[0])
+
+        cond = self.predicate(args[0])
+        then = self.predicate(args[1])
+        if argc == 2:
+            else_ = FALSE
+        elif argc == 3:
+            else_ = self.predicate(args[2])
+        else:
+            else_ = self.if_predicate(args[2:])
+
+        return or_pred([and_pred([cond, then]), and_pred([not_pred(cond), else_])])
+
+    def truthy(self, cases: List[Case]) -> Pred:
+        result: List[Tuple[Optional[str], Pred]] = []
+        for cond, kind, value in cases:
+            if kind == UNKNOWN_KIND:
+                pred = UNKNOWN
+            elif isinstance(value, Const):
+                pred = const_pred(to_bool(value.value))
+            elif kind == NUMBER:
+                pred = exact_pred(f'{value.sql} != 0')
+            elif kind == STRING:
+                pred = exact_pred(f"{value.sql} != ''")
+            else:
+                # arrays are truthy if not empty, objects are always truthy
+                pred = exact_pred(f"(json_type({value.sql}) = 'object' OR json_array_length({value.sql}) > 0)")
+            result.append((cond, pred))
+        return case_pred(result)
+
+    def comparison(self, logic: JsonValue, op: str, args: List[JsonValue]) -> Pred:
+        args = args + [None] * (2 - len(args))
+
+        if op in ('<', '>', '<=', '>=') and len(args) > 2:
+            if isinstance(args[2], (dict, list)):
+                # if it evaluates to null it's not a between
+                return self.unknown(logic)
+
+            if args[2] is not None:
+                # between: a < b < c
+                return and_pred([
+                    self.comparison(logic, op, args[:2]),
+                    self.comparison(logic, op, args[1:3]),
+                ])
+
+        negate = False
+        if op == '!==':
+            op, negate = '===', True
+        elif op == '!=':
+            op, negate = '==', True
+
+        reported = len(self.untranslated)
+        left  = self.cases(args[0])
+        right = self.cases(args[1])
+
+        pred = case_pred([
+            (left_cond, case_pred([
+                (right_cond, self.compare(op, left_kind, left_value, right_kind, right_value))
+                for right_cond, right_kind, right_value in right
+            ]))
+            for left_cond, left_kind, left_value in left
+        ])
+
+        if pred.certain != pred.possible and len(self.untranslated) == reported:
+            self.untranslated.append(logic)
+
+        return not_pred(pred) if negate else pred
+
+    def compare(self, op: str, left_kind: str, left: Value, right_kind: str, right: Value) -> Pred:
+        if left_kind == UNKNOWN_KIND or right_kind == UNKNOWN_KIND:
+            return UNKNOWN
+
+        if isinstance(left, Const) and isinstance(right, Const):
+            return const_pred(to_bool(BUILTINS[op](None, left.value, right.value))) # type: ignore
+
+        if op == '===':
+            if left_kind != right_kind:
+                return FALSE
+            if left_kind == NULL:
+                return TRUE
+            if left_kind == OTHER:
+                # lists are compared by value
+                return UNKNOWN
+            return exact_pred(f'{self.sql(left)} = {self.sql(right)}')
+
+        if left_kind == OTHER or right_kind == OTHER:
+            if op == '==' and (left_kind == NULL or right_kind == NULL):
+                return FALSE
+            # involves to_string()/to_number() of arrays and objects
+            return UNKNOWN
+
+        sql_op = '=' if op == '==' else op
+
+        if left_kind == right_kind:
+            # both can't be constants, so NULL is out
+            return exact_pred(f'{self.sql(left)} {sql_op} {self.sql(right)}')
+
+        if NUMBER in (left_kind, right_kind):
+            # the other side is converted with to_number()
+            if left_kind == NUMBER:
+                other_kind, other = right_kind, right
+            else:
+                other_kind, other = left_kind, left
+
+            if other_kind == NULL:
+                number: Any = 0
+            elif isinstance(other, Const):
+                number = to_number(other.value)
+            else:
+                # parsing numbers from strings
+                return UNKNOWN
+
+            if number != number:
+                # NaN
+                return FALSE
+
+            if left_kind == NUMBER:
+                return exact_pred(f'{self.sql(left)} {sql_op} {self.sql(Const(number))}')
+            return exact_pred(f'{self.sql(Const(number))} {sql_op} {self.sql(right)}')
+
+        # string and null
+        if op == '==':
+            return FALSE
+
+        if left_kind == NULL:
+            return exact_pred(f"'null' {sql_op} {self.sql(right)}")
+        return exact_pred(f"{self.sql(left)} {sql_op} 'null'")
+
+    def in_predicate(self, logic: JsonValue, args: List[JsonValue]) -> Pred:
+        needle   = args[0] if args else None
+        haystack = args[1] if len(args) > 1 else None
+
+        reported = len(self.untranslated)
+
+        if isinstance(haystack, list) and not any(isinstance(item, (list, dict)) for item in haystack):
+            # literal list of scalars
+            result: List[Tuple[Optional[str], Pred]] = []
+            for cond, kind, value in self.cases(needle):
+                if kind == UNKNOWN_KIND:
+                    pred = UNKNOWN
+                elif isinstance(value, Const):
+                    pred = const_pred(value.value in haystack)
+                elif kind == OTHER:
+                    pred = FALSE
+                else:
+                    items = [item for item in haystack if kind_of(item) == kind]
+                    if not items:
+                        pred = FALSE
+                    else:
+                        pred = exact_pred(f'{value.sql} IN (' + ', '.join(self.sql(Const(item)) for item in items) + ')')
+                result.append((cond, pred))
+
+            pred = case_pred(result)
+            if pred.certain != pred.possible and len(self.untranslated) == reported:
+                self.untranslated.append(logic)
+            return pred
+
+        if isinstance(haystack, str):
+            result = []
+            for cond, kind, value in self.cases(needle):
+                if kind == UNKNOWN_KIND:
+                    pred = UNKNOWN
+                elif isinstance(value, Const):
+                    pred = const_pred(to_string(value.value) in haystack)
+                elif kind == STRING:
+                    pred = exact_pred(f'instr({self.sql(Const(haystack))}, {value.sql}) > 0')
+                else:
+                    # number formatting and to_string() of arrays
+                    pred = UNKNOWN
+                result.append((cond, pred))
+
+            pred = case_pred(result)
+            if pred.certain != pred.possible and len(self.untranslated) == reported:
+                self.untranslated.append(logic)
+            return pred
+
+        path = self.var_path(haystack)
+        if path is not None and not isinstance(needle, (list, dict)):
+            json_type = f'json_type({self.column}, {path})'
+            kind = kind_of(needle)
+            if kind == NUMBER:
+                types = "('integer', 'real', 'true', 'false')"
+            elif kind == STRING:
+                types = "('text')"
+            else:
+                types = "('null')"
+            member = f'EXISTS (SELECT 1 FROM json_each({self.column}, {path}) WHERE type IN {types}'
+            if kind != NULL:
+                member += f' AND value = {self.sql(Const(needle))}'
+            member += ')'
+
+            if kind == STRING:
+                substring: Pred = exact_pred(f'instr(json_extract({self.column}, {path}), {self.sql(Const(needle))}) > 0')
+            else:
+                substring = UNKNOWN
+                self.untranslated.append(logic)
+
+            return case_pred([
+                (f"{json_type} = 'array'", exact_pred(member)),
+                (f"{json_type} = 'text'", substring),
+                (None, FALSE),
+            ])
+
+        return self.unknown(logic)
+
+    def missing_conds(self, keys: Any) -> Optional[List[str]]:
+        if not isinstance(keys, list):
+            return None
+
+        conds: List[str] = []
+        for key in keys:
+            path = self.json_path(key)
+            if path is None:
+                return None
+            json_type = f'json_type({self.column}, {path})'
+            conds.append(
+                f"({json_type} IS NULL OR {json_type} = 'null' OR "
+                f"({json_type} = 'text' AND json_extract({self.column}, {path}) = ''))"
+            )
+        return conds
+
+    def missing_some_predicate(self, logic: JsonValue, args: List[JsonValue]) -> Pred:
+        need_count = args[0] if args else 0
+        keys = args[1] if len(args) > 1 else None
+        if isinstance(need_count, (dict, list)) or not isinstance(keys, list):
+            return self.unknown(logic)
+
+        conds = self.missing_conds(keys)
+        if conds is None:
+            return self.unknown(logic)
+
+        need = to_number(need_count)
+        if need != need:
+            # NaN: the present count is never >= NaN, so all missing keys are returned
+            return exact_pred(_join('OR', conds, '0', '1'))
+
+        missing_count = '(' + ' + '.join(conds) + ')' if conds else '0'
+        return exact_pred(f'{missing_count} > 0 AND {len(keys)} - {missing_count} < {self.sql(Const(need))}')
+
+def to_sql(logic: JsonValue, column: str='data', operations: Operations=BUILTINS) -> SqlFilter:
+    """
+    Translate `logic` into SQLite conditions on the JSON documents stored in
+    `column`. See the module documentation.
+    """
+    translator = Translator(column, operations)
+    pred = translator.predicate(fold(logic, operations))
+    return SqlFilter(pred.possible, pred.certain, translator.params, translator.untranslated)
+
+def filter_rows(connection: Any, table: str, logic: JsonValue, column: str='data', operations: Operations=BUILTINS) -> List[Any]:
+    """
+    Select all rows of `table` for which `logic` is truthy. The pre-filter is
+    done by SQLite and only rows that SQLite can't decide on are checked in
+    Python.
+    """
+    sql_filter = to_sql(logic, column, operations)
+    quoted_table = '"' + table.replace('"', '""') + '"'
+    cursor = connection.execute(
+        f'SELECT *, {sql_filter.exact} FROM {quoted_table} WHERE {sql_filter.where}',
+        sql_filter.params)
+    names = [description[0] for description in cursor.description]
+    column_index = names.index(column)
+
+    rows: List[Any] = []
+    for row in cursor:
+        *values, certain = row
+        if certain or to_bool(apply(logic, json.loads(values[column_index]), operations)):
+            rows.append(tuple(values))
+    return rows
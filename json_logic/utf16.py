@@ -0,0 +1,157 @@
+"""
+JavaScript string semantics.
+
+Python strings are sequences of code points, JavaScript strings are sequences
+of UTF-16 code units. The two only differ for strings with astral code points
+(e.g. most emoji), in `substr`, the `length` of strings accessed via `var` and
+the ordering of strings by `<`, `>`, `<=` and `>=`.
+
+`UTF16_OPERATIONS` contains versions of these operations with JavaScript
+semantics. `utf16_operations(operations)` switches any operations (like
+`EXTRAS`) into this mode:
+
+    jsonLogic(logic, data, utf16_operations(EXTRAS))
+
+Strings without astral code points take a fast path that gives the same
+results as the default operations, the check is cached per string (see
+`has_astral()`).
+"""
+
+from typing import Any, Tuple, Union
+
+from .types import Operations
+from .builtins import (
+    BUILTINS, NUMERIC, to_number, to_string, op_var, op_substr_utf16,
+    has_astral, utf16_length,
+)
+
+__all__ = 'UTF16_OPERATIONS', 'utf16_operations', 'op_var_utf16', 'utf16_pair'
+
+def utf16_pair(a: str, b: str) -> Union[Tuple[str, str], Tuple[bytes, bytes]]:
+    """
+    Versions of `a` and `b` that compare in the order of their UTF-16 code
+    units.
+    """
+    if not has_astral(a) and not has_astral(b):
+        return a, b
+
+    # big endian byte order is code unit order
+    return a.encode('UTF-16BE', 'surrogatepass'), b.encode('UTF-16BE', 'surrogatepass')
+
+def op_var_utf16(data=None, key=None, default=None) -> Any:
+    value = op_var(data, key, default)
+
+    if type(value) is int and isinstance(key, str) and 'length' in key:
+        # walk the path like op_var() to find the string or list of which it
+        # returned the length, the first one that is followed by `length`
+        for prop in key.split('.'):
+            if isinstance(data, (list, str)):
+                if prop == 'length':
+                    return utf16_length(data) if isinstance(data, str) else value
+
+                try:
+                    index = int(prop, 10)
+                except ValueError:
+                    return value
+
+                if prop != str(index) or index < 0 or index >= len(data):
+                    return value
+
+                data = data[index]
+            elif isinstance(data, dict):
+                data = data.get(prop)
+            else:
+                return value
+
+    return value
+
+def less_than(a, b) -> bool:
+    if isinstance(a, NUMERIC):
+        return a < to_number(b)
+
+    if isinstance(b, NUMERIC):
+        return to_number(a) < b
+
+    if isinstance(a, str) or isinstance(b, str):
+        a, b = utf16_pair(to_string(a), to_string(b))
+        return a < b
+
+    return to_number(a) < to_number(b)
+
+def op_less_than(data=None, a=None, b=None, c=None, *_ignored) -> bool:
+    if c is None:
+        return less_than(a, b)
+
+    return less_than(a, b) and less_than(b, c)
+
+def greater_than(a, b) -> bool:
+    if isinstance(a, NUMERIC):
+        return a > to_number(b)
+
+    if isinstance(b, NUMERIC):
+        return to_number(a) > b
+
+    if isinstance(a, str) or isinstance(b, str):
+        a, b = utf16_pair(to_string(a), to_string(b))
+        return a > b
+
+    return to_number(a) > to_number(b)
+
+def op_greater_than(data=None, a=None, b=None, c=None, *_ignored) -> bool:
+    if c is None:
+        return greater_than(a, b)
+
+    return greater_than(a, b) and greater_than(b, c)
+
+def less_than_or_equal(a, b) -> bool:
+    if isinstance(a, NUMERIC):
+        return a <= to_number(b)
+
+    if isinstance(b, NUMERIC):
+        return to_number(a) <= b
+
+    if isinstance(a, str) or isinstance(b, str):
+        a, b = utf16_pair(to_string(a), to_string(b))
+        return a <= b
+
+    return to_number(a) <= to_number(b)
+
+def op_less_than_or_equal(data=None, a=None, b=None, c=None, *_ignored) -> bool:
+    if c is None:
+        return less_than_or_equal(a, b)
+
+    return less_than_or_equal(a, b) and less_than_or_equal(b, c)
+
+def greater_than_or_equal(a, b) -> bool:
+    if isinstance(a, NUMERIC):
+        return a >= to_number(b)
+
+    if isinstance(b, NUMERIC):
+        return to_number(a) >= b
+
+    if isinstance(a, str) or isinstance(b, str):
+        a, b = utf16_pair(to_string(a), to_string(b))
+        return a >= b
+
+    return to_number(a) >= to_number(b)
+
+def op_greater_than_or_equal(data=None, a=None, b=None, c=None, *_ignored) -> bool:
+    if c is None:
+        return greater_than_or_equal(a, b)
+
+    return greater_than_or_equal(a, b) and greater_than_or_equal(b, c)
+
+UTF16_OPERATIONS: Operations = {
+    'var':    op_var_utf16,
+    'substr': op_substr_utf16,
+    '<':      op_less_than,
+    '>':      op_greater_than,
+    '<=':     op_less_than_or_equal,
+    '>=':     op_greater_than_or_equal,
+}
+
+def utf16_operations(operations: Operations=BUILTINS) -> Operations:
+    """
+    Copy of `operations` with the operations of `UTF16_OPERATIONS`.
+    """
+    return {**operations, **UTF16_OPERATIONS}
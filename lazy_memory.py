@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+import sys
+import tracemalloc
+
+from typing import Any, Callable, List, Tuple
+from time import monotonic_ns
+
+from json_logic import jsonLogic
+from json_logic.compile import compile
+from json_logic.extras import EXTRAS
+
+def usage() -> None:
+    print("%s [list-size]\n" % (sys.argv[0] if sys.argv else "lazy_memory.py"))
+
+def measure(func: Callable[[], Any]) -> Tuple[Any, int, int]:
+    tracemalloc.start()
+    try:
+        start  = monotonic_ns()
+        result = func()
+        end    = monotonic_ns()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, peak, end - start
+
+def main() -> None:
+    if len(sys.argv) > 2:
+        usage()
+        sys.exit(1)
+
+    size = int(sys.argv[1], 10) if len(sys.argv) > 1 else 100
+    data = {
+        "a": list(range(size)),
+        "b": list(range(size)),
+        "c": list(range(size)),
+        "long": list(range(size * size)),
+    }
+
+    rules: List[Tuple[str, Any]] = [
+        ("some combinations", {"some": [
+            {"combinations": [{"var": "a"}, {"var": "b"}, {"var": "c"}]},
+            {"==": [{"+": [{"var": "0"}, {"var": "1"}, {"var": "2"}]}, 3]},
+        ]}),
+        ("count combinations", {"reduce": [
+            {"combinations": [{"var": "a"}, {"var": "b"}]},
+            {"+": [{"var": "accumulator"}, 1]},
+            0,
+        ]}),
+        ("none zip", {"none": [
+            {"zip": [{"var": "long"}, {"var": "long"}]},
+            {"!=": [{"var": "0"}, {"var": "1"}]},
+        ]}),
+        ("combinations", {"combinations": [{"var": "a"}, {"var": "b"}]}),
+    ]
+
+    print("                        eager peak    lazy peak   eager time    lazy time")
+    for name, logic in rules:
+        rule = compile(logic, EXTRAS)
+        eager_result, eager_peak, eager_time = measure(lambda: jsonLogic(logic, data, EXTRAS))
+        lazy_result,  lazy_peak,  lazy_time  = measure(lambda: rule(data))
+        assert eager_result == lazy_result, name
+
+        print("%-20s %10.3f MiB %8.3f MiB %9.3f ms %9.3f ms" % (
+            name,
+            eager_peak / (1024 * 1024),
+            lazy_peak  / (1024 * 1024),
+            eager_time / 1_000_000,
+            lazy_time  / 1_000_000,
+        ))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+
+import sys
+
+from typing import Dict, List
+from json import loads as parse_json
+from time import monotonic_ns
+
+from json_logic.client import Client
+from benchmark import print_stats
+
+def usage() -> None:
+    print("%s <socket> <request-count> <pipeline-depth> <logic> <data>\n" % (sys.argv[0] if sys.argv else "loadtest.py"))
+
+def main() -> None:
+    if len(sys.argv) != 6:
+        usage()
+        sys.exit(1)
+
+    path  = sys.argv[1]
+    count = int(sys.argv[2], 10)
+    depth = int(sys.argv[3], 10)
+    logic = parse_json(sys.argv[4])
+    data  = parse_json(sys.argv[5])
+
+    with Client(path) as client:
+        client.register_rule('loadtest', logic)
+
+        latencies: List[int] = []
+        sent: Dict[int, int] = {}
+        queue: List[int] = []
+
+        start = monotonic_ns()
+        for _ in range(count):
+            request_id = client.submit('eval', rule='loadtest', data=data)
+            sent[request_id] = monotonic_ns()
+            queue.append(request_id)
+
+            if len(queue) >= depth:
+                request_id = queue.pop(0)
+                client.result(request_id)
+                latencies.append(monotonic_ns() - sent.pop(request_id))
+
+        for request_id in queue:
+            client.result(request_id)
+            latencies.append(monotonic_ns() - sent.pop(request_id))
+
+        elapsed = monotonic_ns() - start
+        server_stats = client.stats()
+
+    print("             min        max        avg     median        sum")
+    print_stats(latencies, "eval")
+    print()
+    print("throughput: %.0f requests/s" % (count / (elapsed / 1_000_000_000)))
+    print("server side eval latency:", server_stats.get('eval'))
+
+if __name__ == '__main__':
+    main()
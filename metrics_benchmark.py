@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+
+import sys
+
+from typing import Any, Callable, List
+from time import monotonic_ns
+
+from json_logic import jsonLogic
+from json_logic.compile import compile
+from json_logic.metrics import MetricsRegistry
+from benchmark import print_stats
+
+LOGIC = {"and": [
+    {"===": [{"var": "type"}, "Vaccination"]},
+    {">=": [{"var": "dose"}, 2]},
+]}
+DATA = {"type": "Vaccination", "dose": 2}
+
+def usage() -> None:
+    print("%s <sample-count>\n" % (sys.argv[0] if sys.argv else "metrics_benchmark.py"))
+
+# evaluations per sample, so the milliseconds per sample are microseconds per
+# evaluation
+BATCH_SIZE = 1000
+
+def measure(func: Callable[[], Any], count: int) -> List[int]:
+    loop = range(BATCH_SIZE)
+    times: List[int] = []
+    for _ in range(count):
+        start = monotonic_ns()
+        for _ in loop:
+            func()
+        times.append(monotonic_ns() - start)
+    return times
+
+def main() -> None:
+    if len(sys.argv) != 2:
+        usage()
+        sys.exit(1)
+
+    count = int(sys.argv[1], 10)
+
+    registry = MetricsRegistry()
+    rule = compile(LOGIC)
+    instrumented = registry.wrap('compiled', rule)
+
+    print("µs/eval      min        max        avg     median        sum")
+    apply_times = measure(lambda: jsonLogic(LOGIC, DATA), count)
+    print_stats(apply_times, "apply")
+    metrics_apply_times = measure(lambda: registry.jsonLogic('apply', LOGIC, DATA), count)
+    print_stats(metrics_apply_times, "+mtr")
+    compiled_times = measure(lambda: rule(DATA), count)
+    print_stats(compiled_times, "comp")
+    metrics_compiled_times = measure(lambda: instrumented(DATA), count)
+    print_stats(metrics_compiled_times, "+mtr")
+
+    print()
+    print("overhead per evaluation: %.0f ns (apply), %.0f ns (compiled)" % (
+        (min(metrics_apply_times) - min(apply_times)) / BATCH_SIZE,
+        (min(metrics_compiled_times) - min(compiled_times)) / BATCH_SIZE,
+    ))
+
+if __name__ == '__main__':
+    main()
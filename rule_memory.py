@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+import sys
+import json
+import random
+
+from typing import Any, List, Set
+
+from json_logic import jsonLogic
+from json_logic.intern import RuleInterner
+from json_logic.extras import EXTRAS
+
+TYPES = ['CovidTest', 'Vaccination', 'Recovery']
+TEST_TYPES = ['PCR', 'AntiGen']
+VACCINES = [f'EU/1/{year}/{number}' for year in (20, 21) for number in range(1500, 1510)]
+
+def usage() -> None:
+    print("%s [rule-count] [seed]\n" % (sys.argv[0] if sys.argv else "rule_memory.py"))
+
+def random_condition(rnd: random.Random) -> Any:
+    kind = rnd.choice(TYPES)
+    conditions: List[Any] = [{"===": [{"var": "type"}, kind]}]
+    if kind == 'CovidTest':
+        conditions.append({"===": [{"var": "testType"}, rnd.choice(TEST_TYPES)]})
+        conditions.append({"===": [{"var": "selfTest"}, rnd.choice([True, False])]})
+        conditions.append({"<=": [0, {"timeSince": [{"var": "testedAt"}]}, {"hours": rnd.choice([24, 48, 72])}]})
+    elif kind == 'Vaccination':
+        conditions.append({"in": [{"var": "vaccine"}, sorted(rnd.sample(VACCINES, 3))]})
+        conditions.append({"<=": [0, {"timeSince": [{"var": "vaccinatedAt"}]}, {"days": rnd.choice([180, 270, 365])}]})
+    else:
+        conditions.append({"<=": [0, {"timeSince": [{"var": "recoveredAt"}]}, {"days": rnd.choice([90, 180])}]})
+    return {"and": conditions}
+
+def random_rule(rnd: random.Random) -> Any:
+    return {"some": [
+        {"var": "events"},
+        {"or": [random_condition(rnd) for _ in range(rnd.randint(1, 4))]},
+    ]}
+
+def deep_size(value: Any) -> int:
+    """
+    Size of `value` and everything it references, counting shared objects
+    only once.
+    """
+    seen: Set[int] = set()
+    size = 0
+    stack = [value]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple)):
+            stack.extend(obj)
+    return size
+
+def main() -> None:
+    if len(sys.argv) > 3:
+        usage()
+        sys.exit(1)
+
+    count = int(sys.argv[1], 10) if len(sys.argv) > 1 else 50_000
+    seed  = int(sys.argv[2], 10) if len(sys.argv) > 2 else 0
+
+    rnd = random.Random(seed)
+    corpus = [json.dumps(random_rule(rnd)) for _ in range(count)]
+
+    plain = [json.loads(rule) for rule in corpus]
+
+    interner = RuleInterner()
+    interned = [interner.intern(json.loads(rule)) for rule in corpus]
+
+    # sanity check
+    data = {"events": [{"type": "Vaccination", "vaccine": VACCINES[0], "vaccinatedAt": "2021-01-01"}]}
+    operations: Any = {**EXTRAS, "timeSince": lambda data=None, *_ignored: 1}
+    for rule, logic in zip(plain, interned):
+        assert jsonLogic(rule, data, operations) == jsonLogic(logic, data, operations)
+
+    plain_size = deep_size(plain)
+    interned_size = deep_size(interned)
+    # the interning table is only needed while loading further rules
+    table_size = deep_size(interner._nodes) - deep_size(list(interner._nodes.values()))
+
+    print("rules:                   %10d" % count)
+    print("distinct nodes:          %10d" % len(interner))
+    print("plain:                   %10.3f MiB" % (plain_size / (1024 * 1024)))
+    print("interned:                %10.3f MiB (%.1f%%)" % (interned_size / (1024 * 1024), interned_size * 100 / plain_size))
+    print("interning table:         %10.3f MiB" % (table_size / (1024 * 1024)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+import sys
+import json
+import random
+
+from typing import Any, Callable, Dict, List
+from os.path import join as join_path, getsize
+from tempfile import TemporaryDirectory
+from time import monotonic_ns
+
+from json_logic.codec import get_codec, available_codecs
+from json_logic.rulepack import RulePack, write_rules
+from benchmark import print_stats
+from rule_memory import random_rule
+
+def usage() -> None:
+    print("%s [rule-count] [repeat-count]\n" % (sys.argv[0] if sys.argv else "rulepack_benchmark.py"))
+
+def measure(func: Callable[[], Any], count: int) -> List[int]:
+    times: List[int] = []
+    for _ in range(count):
+        start = monotonic_ns()
+        func()
+        times.append(monotonic_ns() - start)
+    return times
+
+def main() -> None:
+    if len(sys.argv) > 3:
+        usage()
+        sys.exit(1)
+
+    rule_count = int(sys.argv[1], 10) if len(sys.argv) > 1 else 10_000
+    count      = int(sys.argv[2], 10) if len(sys.argv) > 2 else 10
+
+    rnd = random.Random(0)
+    rules: Dict[str, Any] = {f'rule-{index}': random_rule(rnd) for index in range(rule_count)}
+    sample = rnd.sample(list(rules), min(100, rule_count))
+
+    with TemporaryDirectory() as tempdir:
+        json_path = join_path(tempdir, 'rules.json')
+        pack_path = join_path(tempdir, 'rules.jlrp')
+
+        with open(json_path, 'w') as stream:
+            json.dump(rules, stream)
+        write_rules(pack_path, rules)
+
+        with RulePack.open(pack_path) as pack:
+            assert json.dumps(pack.load_all()) == json.dumps(rules)
+
+        print("rules:     %10d" % rule_count)
+        print("json:      %10.3f MiB" % (getsize(json_path) / (1024 * 1024)))
+        print("rule pack: %10.3f MiB" % (getsize(pack_path) / (1024 * 1024)))
+        print()
+
+        def load_json(loads: Callable[[bytes], Any]) -> Callable[[], Any]:
+            def load() -> Any:
+                with open(json_path, 'rb') as stream:
+                    return loads(stream.read())
+            return load
+
+        def load_pack() -> Any:
+            with RulePack.open(pack_path) as pack:
+                return pack.load_all()
+
+        def load_sample() -> Any:
+            with RulePack.open(pack_path) as pack:
+                return [pack[rule_id] for rule_id in sample]
+
+        print("             min        max        avg     median        sum")
+        for name in available_codecs():
+            print_stats(measure(load_json(get_codec(name).loads), count), name[:5])
+        print_stats(measure(load_pack, count), "pack")
+        print_stats(measure(load_sample, count), "pk100")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+import sys
+import compileall
+import subprocess
+
+from os.path import dirname, join as join_path
+from statistics import median
+from typing import List, Optional, Tuple
+from time import monotonic_ns
+
+# Time spent in the modules of json_logic itself for `import json_logic` in a
+# fresh process, as reported by `python -X importtime` with cached bytecode.
+# The cumulative time also contains the standard library (mostly `typing`) and
+# is reported as well, but varies too much between machines for a target.
+IMPORT_TARGET_MS = 4.0
+
+ROOT = dirname(__file__) or '.'
+
+LOGIC = '{"if":[{"<":[{"var":"age"},18]},"minor","adult"]}'
+DATA  = '{"age":21}'
+
+CERT_LOGIC = '{"after":[{"plusTime":[{"var":"now"},0,"day"]},{"plusTime":[{"var":"validFrom"},14,"day"]}]}'
+CERT_DATA  = '{"now":"2021-06-01T00:00:00Z","validFrom":"2021-05-01"}'
+
+def usage() -> None:
+    print("%s [run-count]\n" % (sys.argv[0] if sys.argv else "startup_benchmark.py"))
+
+def import_time(module: str) -> Tuple[int, int]:
+    """
+    Cumulative import time of `module` and the time spent in the modules of
+    json_logic in microseconds as reported by `python -X importtime`.
+    """
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=True, text=True)
+
+    cumulative: Optional[int] = None
+    own = 0
+    for line in proc.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        parts = line.split('|')
+        if len(parts) != 3:
+            continue
+
+        name = parts[2].strip()
+        if name == 'json_logic' or name.startswith('json_logic.'):
+            own += int(parts[0].split(':')[1], 10)
+
+        if name == module:
+            cumulative = int(parts[1], 10)
+
+    if cumulative is None:
+        raise ValueError(f'{module} missing in importtime output')
+
+    return cumulative, own
+
+def wall_time(args: List[str]) -> int:
+    start = monotonic_ns()
+    subprocess.run([sys.executable, *args], cwd=ROOT, stdout=subprocess.DEVNULL, check=True)
+    return monotonic_ns() - start
+
+def print_times(name: str, times: List[float]) -> None:
+    print("%-28s %9.3f ms %9.3f ms %9.3f ms" % (name, min(times), max(times), median(times)))
+
+def main() -> None:
+    if len(sys.argv) > 2:
+        usage()
+        sys.exit(1)
+
+    count = int(sys.argv[1], 10) if len(sys.argv) > 1 else 20
+
+    # measure loading, not compiling
+    compileall.compile_dir(join_path(ROOT, 'json_logic'), quiet=1)
+
+    print("                                   min          max       median")
+    own_times: List[float] = []
+    for module in 'json_logic', 'json_logic.cert_logic', 'json_logic.compile':
+        times = [import_time(module) for _ in range(count)]
+        print_times(f'import {module}', [cumulative / 1000 for cumulative, _ in times])
+        if module == 'json_logic':
+            own_times = [own / 1000 for _, own in times]
+            print_times('  json_logic modules only', own_times)
+
+    for name, args in [
+        ('python -c pass',            ['-c', 'pass']),
+        ('python -m json_logic',      ['-m', 'json_logic', LOGIC, DATA]),
+        ('python -m ...cert_logic',   ['-m', 'json_logic.cert_logic', CERT_LOGIC, CERT_DATA]),
+    ]:
+        print_times(name, [wall_time(args) / 1_000_000 for _ in range(count)])
+
+    own_ms = median(own_times)
+    print()
+    print("json_logic modules: %.3f ms (target: %.3f ms) %s" % (
+        own_ms, IMPORT_TARGET_MS, "OK" if own_ms <= IMPORT_TARGET_MS else "MISSED"))
+
+    if own_ms > IMPORT_TARGET_MS:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
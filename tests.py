@@ -3,18 +3,49 @@
 from typing import Optional, List, Any
 from os import listdir
 from os.path import dirname, join as joinpath
+from tempfile import TemporaryDirectory
 from io import StringIO
+from datetime import datetime, timedelta
 
 import unittest
+import asyncio
+import threading
+import multiprocessing
+import subprocess
+import sqlite3
+import socket
+import pickle
 import json
 import sys
+import os
+import gc
 import re
 
-from json_logic import jsonLogic, certLogic
+from json_logic import jsonLogic, certLogic, partial, evaluate_json
+from json_logic.compile import compile, fold
+from json_logic.reactive import ReactiveEvaluator
+from json_logic.aio import apply_async, compile_async, _compile_async
+from json_logic.batch import evaluate_many
+import json_logic.batch
+from json_logic.server import Server
+from json_logic.client import Client, ServerError
+from json_logic.protocol import HEADER, encode_message, decode_message
+from json_logic.sql import to_sql, filter_rows
+from json_logic.codec import get_codec, available_codecs
+from json_logic.intern import RuleInterner, FrozenList, FrozenDict
+from json_logic.budget import Budget, BudgetExceeded, apply_with_budget, cert_logic_with_budget
+from json_logic.pathtrie import PathTrie
+from json_logic.decision import DecisionDiagram
+from json_logic.rulepack import RulePack, dump_rules, write_rules
+from json_logic.metrics import MetricsRegistry, BUCKET_BOUNDS, bucket_index
+from json_logic.utf16 import utf16_operations
+from json_logic.cache import CachedRule, input_paths
+from json_logic.registry import RuleRegistry, rule_hash
+from json_logic.purity import PURE_OPERATIONS, CACHEABLE_OPERATIONS
 from json_logic.types import JsonValue, Operations
-from json_logic.builtins import BUILTINS as JSONLOGIC_BUILTINS, op_substr_utf16
+from json_logic.builtins import BUILTINS as JSONLOGIC_BUILTINS, op_substr_utf16, has_astral, utf16_length, to_bool, json_default, op_missing, op_missing_some
 from json_logic.extras import EXTRAS, parse_time
-from json_logic.cert_logic.builtins import BUILTINS as CERTLOGIC_BUILTINS
+from json_logic.cert_logic.builtins import BUILTINS as CERTLOGIC_BUILTINS, split_uvci, op_extract_from_uvci, Instant, plus_time, to_instant
 
 NON_IDENT = re.compile('[^_a-zA-Z0-9]+')
 TESTDATA_DIR  = joinpath(dirname(__file__), 'testdata')
@@ -233,10 +264,55 @@ class BasicTests(unittest.TestCase):
         logic = json.loads("{\"substr\": [\"\\uD80C\\uDC00\", 1]}")
         self.assertEqual(jsonLogic(logic, operations=ops), '\ufffd')
 
+    def test_utf16_strings(self):
+        """
+        JavaScript string mode
+        """
+        self.assertFalse(has_astral("abc"))
+        self.assertFalse(has_astral("äöü\uffff"))
+        self.assertTrue(has_astral("a\U0001F600b"))
+        self.assertEqual(utf16_length("äöü"), 3)
+        self.assertEqual(utf16_length("a\U0001F600b"), 4)
+
+        ops = utf16_operations(EXTRAS)
+        data = {"s": "a\U0001F600b", "l": ["a\U0001F600b"], "d": {"length": 5}}
+
+        self.assertEqual(jsonLogic({"substr": [{"var": "s"}, 1, 2]}, data, ops), "\U0001F600")
+        self.assertEqual(jsonLogic({"substr": [{"var": "s"}, 1, 2]}, data), "\U0001F600b")
+        self.assertEqual(jsonLogic({"substr": ["äöü", 0, -2]}, operations=ops), "ä")
+
+        self.assertEqual(jsonLogic({"var": "s.length"}, data, ops), 4)
+        self.assertEqual(jsonLogic({"var": "s.length"}, data), 3)
+        self.assertEqual(jsonLogic({"var": "l.0.length"}, data, ops), 4)
+        self.assertEqual(jsonLogic({"var": "l.length"}, data, ops), 1)
+        self.assertEqual(jsonLogic({"var": "d.length"}, data, ops), 5)
+        # a dict key named length before the string
+        data = {"d": {"length": {"s": "\U0001F600"}}}
+        self.assertEqual(jsonLogic({"var": "d.length.s.length"}, data, ops), 2)
+        self.assertEqual(jsonLogic({"var": "d.length.s.length"}, data), 1)
+        self.assertEqual(jsonLogic({"var": ["d.length.x.length", 7]}, data, ops), 7)
+
+        # U+FFFF is a single code unit bigger than any high surrogate
+        logic = {"<": ["\uffff", "\U0001F600"]}
+        self.assertFalse(jsonLogic(logic, operations=ops))
+        self.assertTrue(jsonLogic(logic))
+        self.assertTrue(jsonLogic({">=": ["\uffff", "\U0001F600"]}, operations=ops))
+        self.assertTrue(jsonLogic({"<": ["a", "b", "c"]}, operations=ops))
+        self.assertTrue(jsonLogic({"<=": [1, "2"]}, operations=ops))
+        self.assertTrue(compile({"<": ["\U0001F600", {"var": "s"}]}, ops)({"s": "\uffff"}))
+
     def test_extras(self):
         self.assertEqual(jsonLogic({"zip": [[1,2,3],["a","b"]]}, operations=EXTRAS), [[1,"a"],[2,"b"]])
         # TODO: test more
 
+    def test_combinations(self):
+        self.assertEqual(jsonLogic({"combinations": [[1, 2], ["a"]]}, operations=EXTRAS), [[1, "a"], [2, "a"]])
+        # arguments after an empty list aren't looked at, no matter which are lists
+        self.assertEqual(jsonLogic({"combinations": [[], 5]}, operations=EXTRAS), [])
+        self.assertEqual(jsonLogic({"combinations": [[1], [], 5]}, operations=EXTRAS), [])
+        self.assertEqual(jsonLogic({"combinations": [[1], []]}, operations=EXTRAS), [])
+        self.assertRaises(TypeError, jsonLogic, {"combinations": [[1], 5]}, operations=EXTRAS)
+
 class JsonLogicTests(unittest.TestCase):
     pass
 
@@ -276,6 +352,1291 @@ for group in GROUPED_TESTS:
     func = make_test(name, group['tests'])
     setattr(JsonLogicTests, func.__name__, func)
 
+class CompiledJsonLogicTests(unittest.TestCase):
+    pass
+
+def make_compiled_test(name: str, tests: list):
+    def test_func(self: unittest.TestCase):
+        for test in tests:
+            logic, data, expected = test
+            actual = compile(logic)(data)
+            self.assertEqual(actual, expected,
+                f"Wrong value\n"
+                f"     test: {json.dumps(test)}\n"
+                f"    logic: {json.dumps(logic)}\n"
+                f"     data: {json.dumps(data)}\n"
+                f" expected: {json.dumps(expected)}\n"
+                f"   actual: {json.dumps(actual)}\n"
+            )
+    test_func.__name__ = 'test_' + NON_IDENT.sub('_', name).strip('_')
+    test_func.__doc__  = name
+    return test_func
+
+for group in GROUPED_TESTS:
+    name = group['name']
+    func = make_compiled_test(name, group['tests'])
+    setattr(CompiledJsonLogicTests, func.__name__, func)
+
+class PartialTests(unittest.TestCase):
+    def test_known_vars(self):
+        logic = {"and": [
+            {"===": [{"var": "external.country"}, "AT"]},
+            {"in": [{"var": "type"}, {"var": "external.types"}]},
+        ]}
+        known = {"external": {"country": "AT", "types": ["a", "b"]}}
+        self.assertEqual(partial(logic, known), {"in": [{"var": "type"}, ["a", "b"]]})
+        self.assertEqual(partial(logic, {"external": {"country": "DE"}}), False)
+
+    def test_if(self):
+        logic = {"if": [{"var": "x"}, 1, {"var": "a"}, 2, {"var": "b"}, 3, 4]}
+        self.assertEqual(partial(logic, {"a": 0}), {"if": [{"var": "x"}, 1, {"var": "b"}, 3, 4]})
+        self.assertEqual(partial(logic, {"a": 1}), {"if": [{"var": "x"}, 1, 2]})
+        self.assertEqual(partial(logic, {"x": 0, "a": 1}), 2)
+
+    def test_unknown_paths(self):
+        logic = {"var": "a.b"}
+        self.assertEqual(partial(logic, {"a": {"c": 1}}), {"var": "a.b"})
+        self.assertEqual(partial(logic, {"a": {"b": 1}}), 1)
+        self.assertEqual(partial({"var": "a.length"}, {"a": [1, 2]}), 2)
+        self.assertEqual(partial({"missing": ["a", "b"]}, {"a": 1}), {"missing": ["a", "b"]})
+        self.assertEqual(partial({"missing": ["a", "b"]}, {"a": 1, "b": None}), ["b"])
+
+    def test_collections(self):
+        logic = {"map": [{"var": "xs"}, {"*": [{"var": ""}, {"+": [1, 1]}]}]}
+        self.assertEqual(partial(logic, {}), {"map": [{"var": "xs"}, {"*": [{"var": ""}, 2]}]})
+        self.assertEqual(partial(logic, {"xs": [1, 2]}), [2, 4])
+
+    def test_impure(self):
+        logic = {"if": [{"log": "x"}, {"+": [1, 2]}, {"/": [1, 0]}]}
+        self.assertEqual(fold(logic), {"if": [{"log": "x"}, 3, {"/": [1, 0]}]})
+
+    def test_residual_equals_full_evaluation(self):
+        for test in TESTS:
+            if isinstance(test, str):
+                continue
+            logic, data, expected = test
+            if not isinstance(data, dict):
+                continue
+            keys = sorted(data)
+            for known in ({}, {key: data[key] for key in keys[::2]}, data):
+                residual = partial(logic, known)
+                self.assertEqual(jsonLogic(residual, data), expected,
+                    f"Wrong value\n"
+                    f"    logic: {json.dumps(logic)}\n"
+                    f"    known: {json.dumps(known)}\n"
+                    f" residual: {json.dumps(residual)}\n"
+                )
+                self.assertEqual(compile(residual)(data), expected)
+
+class ReactiveTests(unittest.TestCase):
+    def test_diff(self):
+        evaluator = ReactiveEvaluator({
+            'adult':  {">=": [{"var": "person.age"}, 18]},
+            'named':  {"!!": {"var": "person.name"}},
+            'admins': {"filter": [{"var": "users"}, {"var": "admin"}]},
+        }, {"person": {"age": 17}, "users": [{"admin": True}, {"admin": False}]})
+
+        self.assertEqual(evaluator.results, {'adult': False, 'named': False, 'admins': [{"admin": True}]})
+        self.assertEqual(evaluator.set('person.age', 18), {'adult': (False, True)})
+        self.assertEqual(evaluator.set('person.age', 19), {})
+        self.assertEqual(evaluator.set('person', {"name": "Jane"}), {'adult': (True, False), 'named': (False, True)})
+        self.assertEqual(evaluator.set('users.1.admin', True), {'admins': ([{"admin": True}], [{"admin": True}, {"admin": True}])})
+        self.assertEqual(evaluator.set('users.2', {"admin": True}), {'admins': ([{"admin": True}, {"admin": True}], [{"admin": True}, {"admin": True}, {"admin": True}])})
+        self.assertRaises(IndexError, evaluator.set, 'users.5', None)
+
+    def test_recomputes_only_affected_nodes(self):
+        calls: List[Any] = []
+        def count(data, value=None):
+            calls.append(value)
+            return value
+
+        PURE_OPERATIONS.add(count)
+        try:
+            ops = { **JSONLOGIC_BUILTINS, 'count': count }
+            evaluator = ReactiveEvaluator({
+                'a': {"and": [{"count": {"var": "a"}}, {"count": {"var": "b"}}]},
+                'c': {"count": {"var": "c.d"}},
+            }, {"a": 1, "b": 2, "c": {"d": 3}}, ops)
+            self.assertListEqual(calls, [1, 2, 3])
+
+            calls.clear()
+            self.assertEqual(evaluator.set('b', 0), {'a': (2, 0)})
+            self.assertListEqual(calls, [0])
+
+            calls.clear()
+            self.assertEqual(evaluator.set('c', 4), {'c': (3, None)})
+            self.assertListEqual(calls, [None])
+
+            calls.clear()
+            self.assertEqual(evaluator.set('x', 4), {})
+            self.assertListEqual(calls, [])
+        finally:
+            PURE_OPERATIONS.discard(count)
+
+    def test_matches_apply(self):
+        rules = {
+            index: test[0]
+            for index, test in enumerate(TESTS)
+            if not isinstance(test, str)
+        }
+        data = {"a": 1, "b": {"c": [1, 2, 3]}, "x": "foo", "integers": [1, 2, 3]}
+        evaluator = ReactiveEvaluator(rules, data)
+        changes = [
+            ('a', 0), ('b.c.0', 5), ('b.c.3', 'x'), ('integers', [4, 5]), ('x', ''),
+            ('a.b', True), ('b', None), ('c', {"d": 1}), ('a', [1]), ('', {"a": 2}),
+        ]
+        for path, value in changes:
+            evaluator.set(path, value)
+            for rule_id, logic in rules.items():
+                self.assertEqual(evaluator.results[rule_id], jsonLogic(logic, evaluator.data),
+                    f"after setting {path!r}: {json.dumps(logic)}")
+
+class AsyncTests(unittest.TestCase):
+    def setUp(self):
+        self.calls: List[Any] = []
+        self.running = 0
+        self.max_running = 0
+
+        async def fetch(data, value=None):
+            self.calls.append(value)
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+            await asyncio.sleep(0)
+            self.running -= 1
+            return value
+
+        self.ops: Operations = { **JSONLOGIC_BUILTINS, 'fetch': fetch }
+
+    def test_matches_apply(self):
+        async def run():
+            for test in TESTS:
+                if isinstance(test, str):
+                    continue
+                logic, data, expected = test
+                self.assertEqual(await apply_async(logic, data), expected, json.dumps(logic))
+        asyncio.run(run())
+
+    def test_concurrent_arguments(self):
+        rule = compile_async({"+": [{"fetch": 1}, {"fetch": 2}, {"*": [{"fetch": 3}, 2]}]}, self.ops)
+        self.assertEqual(asyncio.run(rule(None)), 9)
+        self.assertEqual(sorted(self.calls), [1, 2, 3])
+        self.assertEqual(self.max_running, 3)
+
+    def test_short_circuit(self):
+        self.assertEqual(asyncio.run(apply_async({"and": [{"fetch": 0}, {"fetch": 1}]}, None, self.ops)), 0)
+        self.assertEqual(asyncio.run(apply_async({"or": [{"fetch": 1}, {"fetch": 2}]}, None, self.ops)), 1)
+        self.assertEqual(asyncio.run(apply_async({"if": [{"fetch": False}, {"fetch": 3}, {"fetch": 4}]}, None, self.ops)), 4)
+        self.assertEqual(asyncio.run(apply_async({"some": [[1, 2, 3], {"fetch": {"var": ""}}]}, None, self.ops)), True)
+        self.assertEqual(asyncio.run(apply_async({"all": [[1, 0, 3], {"fetch": {"var": ""}}]}, None, self.ops)), False)
+        self.assertListEqual(self.calls, [0, 1, False, 4, 1, 1, 0])
+
+    def test_collections(self):
+        self.assertEqual(asyncio.run(apply_async({"map": [{"fetch": [[1, 2]]}, {"fetch": {"var": ""}}]}, None, self.ops)), [1, 2])
+        self.assertEqual(asyncio.run(apply_async({"filter": [[1, 0, 2], {"fetch": {"var": ""}}]}, None, self.ops)), [1, 2])
+        self.assertEqual(asyncio.run(apply_async(
+            {"reduce": [[1, 2, 3], {"+": [{"fetch": {"var": "current"}}, {"var": "accumulator"}]}, 0]},
+            None, self.ops)), 6)
+
+    def test_sync_subtrees(self):
+        rule = compile_async({"==": [{"var": "a"}, 1]})
+        self.assertEqual(asyncio.run(rule({"a": 1})), True)
+
+        # sync rules and sync sub-expressions get the full compiler, e.g. the
+        # fused `in` and the path trie of `missing`
+        for logic in (
+            {"in": [{"var": "country"}, ["AT", "DE"]]},
+            {"if": [{"missing": ["a", "b.c"]}, 1, 2]},
+            {"and": [{"<": [{"var": "age"}, 18]}, {"!": {"var": "revoked"}}]},
+        ):
+            is_async, func = _compile_async(fold(logic), self.ops)
+            self.assertFalse(is_async)
+            self.assertIs(func.__code__, compile(logic).__code__, json.dumps(logic))
+            self.assertEqual(asyncio.run(compile_async(logic, self.ops)({"age": 10})), compile(logic)({"age": 10}))
+
+        logic = {"cat": [{"fetch": "x"}, {"in": [{"var": "country"}, ["AT", "DE"]]}]}
+        rule = compile_async(logic, self.ops)
+        self.assertEqual(asyncio.run(rule({"country": "AT"})), jsonLogic(logic, {"country": "AT"}, {**self.ops, "fetch": lambda data, value: value}))
+
+    def test_failing_sync_argument(self):
+        # no coroutine of an async argument may be left un-awaited
+        code = (
+            'import asyncio, gc\n'
+            'from json_logic.aio import compile_async\n'
+            'from json_logic.builtins import BUILTINS\n'
+            'async def slow(data, value=None):\n'
+            '    await asyncio.sleep(0)\n'
+            '    return value\n'
+            'rule = compile_async({"+": [{"slow": [1]}, {"%": [1, {"var": "x"}]}]}, {**BUILTINS, "slow": slow})\n'
+            'for _ in range(3):\n'
+            '    try:\n'
+            '        asyncio.run(rule({"x": 0}))\n'
+            '    except ZeroDivisionError:\n'
+            '        pass\n'
+            'gc.collect()\n'
+            'print(asyncio.run(rule({"x": 2})))\n'
+        )
+        output = subprocess.run(
+            [sys.executable, '-W', 'error::RuntimeWarning', '-c', code],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True, cwd=dirname(__file__) or '.',
+        )
+        self.assertEqual(output.stderr, b'')
+        self.assertEqual(output.stdout, b'2\n')
+
+class ThreadingTests(unittest.TestCase):
+    def test_shared_compiled_rules(self):
+        cases = [
+            (compile(test[0]), test[1], test[2])
+            for test in TESTS if not isinstance(test, str)
+        ]
+        cases.extend(
+            (COMPILED_RULE, item['code'], expected)
+            for items, expected in ((VALID, True), (INVALID, False))
+            for item in items
+        )
+        errors: List[str] = []
+
+        def run() -> None:
+            for _ in range(20):
+                for rule, data, expected in cases:
+                    actual = rule(data)
+                    if actual != expected:
+                        errors.append(f"expected {expected!r}, got {actual!r}")
+
+        threads = [threading.Thread(target=run) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertListEqual(errors, [])
+
+    def test_evaluate_many(self):
+        logic = {"reduce": [{"var": "items"}, {"+": [{"var": "current"}, {"var": "accumulator"}]}, 0]}
+        items = [{"items": list(range(index % 17))} for index in range(1000)]
+        expected = [jsonLogic(logic, data) for data in items]
+
+        self.assertListEqual(evaluate_many(logic, items), expected)
+        self.assertListEqual(evaluate_many(logic, items, executor='threads', max_workers=4, chunk_size=7), expected)
+        self.assertListEqual(evaluate_many(logic, iter(items), executor='threads', chunk_size=64), expected)
+        self.assertListEqual(evaluate_many(logic, items, executor='processes', max_workers=2), expected)
+        self.assertListEqual(evaluate_many(logic, iter(items), executor='shared_memory', max_workers=2, chunk_size=100), expected)
+        self.assertRaises(ValueError, evaluate_many, logic, items, executor='fibers')
+
+    def test_evaluate_many_shared_memory(self):
+        items = [
+            {"value": True}, {"value": False}, {"value": 1}, {"value": -2.5},
+            {"value": 2 ** 63}, {"value": "text"}, {"value": None}, {"value": [1, {"a": "b"}]},
+        ]
+        results = evaluate_many({"var": "value"}, items, executor='shared_memory', max_workers=2, chunk_size=3)
+        self.assertListEqual(results, [item["value"] for item in items])
+        self.assertListEqual([type(result) for result in results], [type(item["value"]) for item in items])
+        self.assertListEqual(evaluate_many({"var": "value"}, [], executor='shared_memory'), [])
+
+    def test_evaluate_many_spawn(self):
+        logic = {"if": [{">": [{"var": "x"}, 2]}, {"cat": ["big ", {"var": "x"}]}, {"*": [{"var": "x"}, 2]}]}
+        items = [{"x": x} for x in range(6)]
+        expected = [jsonLogic(logic, data) for data in items]
+
+        process_context = json_logic.batch._process_context
+        try:
+            json_logic.batch._process_context = lambda: multiprocessing.get_context('spawn')
+            self.assertListEqual(evaluate_many(logic, items, executor='processes', max_workers=1), expected)
+            self.assertListEqual(evaluate_many(logic, items, executor='shared_memory', max_workers=1, chunk_size=4), expected)
+        finally:
+            json_logic.batch._process_context = process_context
+
+    def test_shared_memory_workers(self):
+        # workers close the block when they exit and leave the resource
+        # tracker alone, which would otherwise complain about the block
+        code = (
+            'import multiprocessing\n'
+            'from multiprocessing import util\n'
+            'import json_logic.batch as batch\n'
+            'def check():\n'
+            '    batch._init_shared_worker(1, None, "json", shm.name, 0)\n'
+            '    util.Finalize(None, lambda: print(batch._worker_shm.buf is None), exitpriority=-1)\n'
+            'shm = batch.SharedMemory(create=True, size=8)\n'
+            'process = multiprocessing.get_context("fork").Process(target=check)\n'
+            'process.start()\n'
+            'process.join()\n'
+            'shm.close()\n'
+            'shm.unlink()\n'
+            'batch._process_context = lambda: multiprocessing.get_context("spawn")\n'
+            'print(batch.evaluate_many({"var": "x"}, [{"x": x} for x in range(4)], executor="shared_memory", max_workers=2, chunk_size=1))\n'
+        )
+        output = subprocess.run(
+            [sys.executable, '-c', code],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True, cwd=dirname(__file__) or '.',
+        )
+        self.assertEqual(output.stderr, b'')
+        self.assertEqual(output.stdout, b'True\n[0, 1, 2, 3]\n')
+
+class ServerTests(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = TemporaryDirectory()
+        self.path = joinpath(self.tempdir.name, 'server.sock')
+        self.server = Server(workers=2, max_pending=4)
+        self.loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def run() -> None:
+            asyncio.set_event_loop(self.loop)
+            self.task = self.loop.create_task(self.server.serve_unix(self.path))
+            self.loop.call_soon(started.set)
+            try:
+                self.loop.run_until_complete(self.task)
+            except asyncio.CancelledError:
+                pass
+
+        self.thread = threading.Thread(target=run)
+        self.thread.start()
+        started.wait()
+        for _ in range(100):
+            try:
+                self.client = Client(self.path)
+                break
+            except (FileNotFoundError, ConnectionRefusedError):
+                threading.Event().wait(0.01)
+
+    def tearDown(self):
+        self.client.close()
+        self.loop.call_soon_threadsafe(self.task.cancel)
+        self.thread.join()
+        self.loop.close()
+        self.server.close()
+        self.tempdir.cleanup()
+
+    def test_eval(self):
+        client = self.client
+        client.register_rule('adult', {">=": [{"var": "age"}, 18]})
+        self.assertEqual(client.evaluate('adult', {"age": 20}), True)
+        self.assertEqual(client.evaluate_many('adult', [{"age": 20}, {"age": 3}, {}]), [True, False, False])
+
+        with self.assertRaisesRegex(ServerError, 'unknown rule'):
+            client.evaluate('child', {"age": 3})
+
+        with self.assertRaisesRegex(ServerError, 'ReferenceError'):
+            client.register_rule('broken', {"fubar": []})
+            client.evaluate('broken')
+
+        stats = client.stats()
+        self.assertEqual(stats['eval']['count'], 4)
+        self.assertEqual(stats['eval']['errors'], 2)
+        self.assertEqual(stats['register_rule']['count'], 2)
+
+    def test_pipelining(self):
+        client = self.client
+        client.register_rule('double', {"*": [{"var": ""}, 2]})
+        request_ids = [client.submit('eval', rule='double', data=index) for index in range(100)]
+        self.assertListEqual([client.result(request_id) for request_id in reversed(request_ids)],
+                             [index * 2 for index in reversed(range(100))])
+
+    def test_disconnect_mid_message(self):
+        errors: List[Any] = []
+        self.loop.call_soon_threadsafe(self.loop.set_exception_handler, lambda loop, context: errors.append(context))
+        self.client.register_rule('double', {"*": [{"var": ""}, 2]})
+
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(self.path)
+            request = encode_message({"id": 1, "op": "eval", "rule": "double", "data": 2})
+            partial = encode_message({"id": 2, "op": "eval", "rule": "double", "data": 3})
+            sock.sendall(request + partial[:len(partial) // 2])
+            sock.shutdown(socket.SHUT_WR)
+            response = sock.recv(1024)
+
+        self.assertEqual(decode_message(response[HEADER.size:]), {"id": 1, "result": 4})
+        # the server still works
+        self.assertEqual(self.client.evaluate('double', 5), 10)
+        self.assertEqual(errors, [])
+
+    def test_stdio(self):
+        request = b''.join(encode_message(message) for message in (
+            {'id': 1, 'op': 'register_rule', 'rule': 'r', 'logic': {"cat": ["a", {"var": "b"}]}},
+            {'id': 2, 'op': 'eval', 'rule': 'r', 'data': {"b": "c"}},
+        ))
+        output = subprocess.run(
+            [sys.executable, '-m', 'json_logic.server', '--stdio'],
+            input=request, stdout=subprocess.PIPE, check=True, cwd=dirname(__file__) or '.',
+        ).stdout
+
+        responses = []
+        while output:
+            size, = HEADER.unpack(output[:HEADER.size])
+            responses.append(decode_message(output[HEADER.size:HEADER.size + size]))
+            output = output[HEADER.size + size:]
+
+        self.assertIn({'id': 2, 'result': 'ac'}, responses)
+
+SQL_RECORDS: List[JsonValue] = [
+    {"a": 1, "b": "x", "c": True},
+    {"a": 2.5, "b": "10", "c": False},
+    {"a": "2", "b": "", "c": None},
+    {"a": "abc", "b": 10, "n": {"x": 0}},
+    {"a": None, "b": "y", "n": {"x": "0"}},
+    {"a": [1], "b": [1, 2], "n": {"x": [3]}},
+    {"a": 0, "b": " 1", "c": {}},
+    {"b": "1e1", "c": "null", "n": {}},
+    {"a": True, "b": False, "c": 0},
+    {"a": -3, "b": "tr", "c": "xtrue"},
+    {},
+]
+
+SQL_RULES: List[JsonValue] = [
+    {"===": [{"var": "a"}, 1]},
+    {"===": [{"var": "b"}, "x"]},
+    {"!==": [{"var": "c"}, None]},
+    {"==": [{"var": "a"}, 2]},
+    {"==": [{"var": "b"}, 10]},
+    {"==": [{"var": "a"}, {"var": "b"}]},
+    {"!=": [{"var": "c"}, False]},
+    {"<": [{"var": "a"}, 2]},
+    {">=": [{"var": "b"}, "10"]},
+    {"<=": [0, {"var": "a"}, 2]},
+    {"<": [{"var": "a"}, {"var": "n.x"}, 5]},
+    {">": [{"+": [{"var": "a"}, 1]}, 2]},
+    {"==": [{"/": [{"var": "a"}, {"var": "n.x"}]}, 0]},
+    {"<": [{"-": [{"var": "a"}]}, 0]},
+    {"==": [{"*": [{"var": "a"}, 2, {"var": "c"}]}, 2]},
+    {"===": [{"cat": [{"var": "a"}, "-", {"var": "c"}]}, "1-True"]},
+    {"in": [{"var": "a"}, [1, "2", None, True]]},
+    {"in": [{"var": "b"}, "xyz10"]},
+    {"in": [1, {"var": "b"}]},
+    {"in": ["tr", {"var": "c"}]},
+    {"missing": ["a", "n.x"]},
+    {"missing_some": [1, ["a", "c", "n.x"]]},
+    {"!": {"var": "c"}},
+    {"!!": {"var": "b"}},
+    {"and": [{"var": "a"}, {"!": {"missing": "b"}}]},
+    {"or": [{"===": [{"var": "a"}, 0]}, {"some": [{"var": "b"}, {"==": [{"var": ""}, 2]}]}]},
+    {"if": [{"var": "c"}, {"==": [{"var": "a"}, 1]}, {"substr": [{"var": "b"}, 1]}]},
+]
+
+class SqlTests(unittest.TestCase):
+    def setUp(self):
+        self.connection = sqlite3.connect(':memory:')
+        self.connection.execute('CREATE TABLE records (id INTEGER PRIMARY KEY, data TEXT)')
+        self.connection.executemany('INSERT INTO records (id, data) VALUES (?, ?)',
+            [(index, json.dumps(record)) for index, record in enumerate(SQL_RECORDS)])
+
+    def tearDown(self):
+        self.connection.close()
+
+    def select(self, condition: str, params: dict) -> List[int]:
+        return [row[0] for row in self.connection.execute(f'SELECT id FROM records WHERE {condition}', params)]
+
+    def test_filter_rows(self):
+        for logic in SQL_RULES:
+            try:
+                expected = [index for index, record in enumerate(SQL_RECORDS) if to_bool(jsonLogic(logic, record))]
+            except ZeroDivisionError:
+                # rows that SQLite can't decide on are evaluated in Python
+                with self.assertRaises(ZeroDivisionError):
+                    filter_rows(self.connection, 'records', logic)
+                continue
+
+            actual = [row[0] for row in filter_rows(self.connection, 'records', logic)]
+            self.assertEqual(actual, expected, json.dumps(logic))
+
+            sql_filter = to_sql(logic)
+            certain  = self.select(sql_filter.exact, sql_filter.params)
+            possible = self.select(sql_filter.where, sql_filter.params)
+            self.assertTrue(set(certain) <= set(expected) <= set(possible), json.dumps(logic))
+            if sql_filter.is_exact:
+                self.assertEqual(possible, expected, json.dumps(logic))
+
+    def test_exact(self):
+        for logic in (
+                {"===": [{"var": "a"}, 1]},
+                {"and": [{"!==": [{"var": "c"}, "x"]}, {"in": [{"var": "b"}, ["x", "y"]]}]},
+                {"missing": ["a", "b"]}):
+            sql_filter = to_sql(logic)
+            self.assertTrue(sql_filter.is_exact, json.dumps(logic))
+            self.assertEqual(sql_filter.untranslated, [])
+
+    def test_untranslated(self):
+        some = {"some": [{"var": "b"}, {"var": ""}]}
+        sql_filter = to_sql({"and": [{"var": "a"}, some]})
+        self.assertFalse(sql_filter.is_exact)
+        self.assertEqual(sql_filter.untranslated, [some])
+
+        # string to number coercion is left to Python
+        coercion = {"<": [{"var": "a"}, {"var": "b"}]}
+        self.assertEqual(to_sql(coercion).untranslated, [coercion])
+
+class CodecTests(unittest.TestCase):
+    def test_round_trip(self):
+        value = {"a": [1, 2.5, "ü/x", None, True, False], "b": {}}
+        for name in available_codecs():
+            codec = get_codec(name)
+            self.assertEqual(codec.loads(codec.dumps(value)), value, name)
+            self.assertEqual(codec.loads(json.dumps(value).encode()), value, name)
+
+    def test_datetime(self):
+        value = [parse_time("2022-01-02T15:00:00+02:00"), parse_time("2022-01-02T00:00:00.125Z")]
+        expected = json.dumps(value, default=json_default)
+        for name in available_codecs():
+            self.assertEqual(json.loads(get_codec(name).dumps(value)), json.loads(expected), name)
+
+    def test_evaluate_json(self):
+        self.assertEqual(
+            json.loads(evaluate_json(b'{"cat":["a",{"var":"b"}]}', b'{"b":"c"}')), "ac")
+        self.assertEqual(evaluate_json(b'{"var":"x"}'), b'null')
+        result = evaluate_json('{"parseTime":{"var":"t"}}', '{"t":"2022-01-02"}', EXTRAS, get_codec('json'))
+        self.assertEqual(result, b'"2022-01-02T00:00:00+00:00"')
+
+    def test_unknown_codec(self):
+        with self.assertRaises(ValueError):
+            get_codec('yaml')
+
+class InternTests(unittest.TestCase):
+    def test_sharing(self):
+        interner = RuleInterner()
+        a = interner.intern({"and": [{"===": [{"var": "type"}, "CovidTest"]}, {"var": "x"}]})
+        b = interner.intern({"or": [{"===": [{"var": "type"}, "CovidTest"]}, {"var": "x"}]})
+        self.assertIs(a["and"], b["or"])
+        self.assertIs(interner.intern(json.loads(json.dumps(a))), a)
+        self.assertIsInstance(a, FrozenDict)
+        self.assertIsInstance(a["and"], FrozenList)
+
+    def test_scalars(self):
+        interner = RuleInterner()
+        node = interner.intern([1, 1.0, True, 0.0, -0.0, None, "1"])
+        self.assertEqual([type(item) for item in node], [int, float, bool, float, float, type(None), str])
+        self.assertEqual(str(node[4]), '-0.0')
+
+    def test_immutable(self):
+        node = RuleInterner().intern({"in": [{"var": "x"}, [1, 2]]})
+        with self.assertRaises(TypeError):
+            node["var"] = "y"
+        with self.assertRaises(TypeError):
+            node["in"].append(3)
+        with self.assertRaises(TypeError):
+            node["in"][1][0] = 3
+        self.assertEqual(pickle.loads(pickle.dumps(node)), node)
+
+    def test_object_literals(self):
+        # object literals are compared by identity and must not be shared
+        logic = RuleInterner().intern({"==": [{"a": 1, "b": 2}, {"a": 1, "b": 2}]})
+        self.assertIs(jsonLogic(logic), False)
+        self.assertIs(compile(logic)(None), False)
+
+    def test_apply(self):
+        interner = RuleInterner()
+        for group in GROUPED_TESTS:
+            for logic, data, expected in group['tests']:
+                interned = interner.intern(logic)
+                self.assertEqual(jsonLogic(interned, data), expected, json.dumps(logic))
+                self.assertEqual(compile(interned)(data), expected, json.dumps(logic))
+
+class BudgetTests(unittest.TestCase):
+    def test_same_results(self):
+        budget = Budget(max_steps=10000, max_size=10000, max_depth=100, timeout=10.0)
+        for group in GROUPED_TESTS:
+            for logic, data, expected in group['tests']:
+                self.assertEqual(apply_with_budget(logic, data, budget=budget), expected, json.dumps(logic))
+                self.assertEqual(apply_with_budget(logic, data), expected, json.dumps(logic))
+
+    def assertExceeds(self, limit: str, logic: Any, data: Any, budget: Budget):
+        with self.assertRaises(BudgetExceeded) as context:
+            apply_with_budget(logic, data, EXTRAS, budget)
+        self.assertEqual(context.exception.limit, limit)
+
+    def test_max_steps(self):
+        logic = {"map": [{"var": "a"}, {"map": [list(range(100)), {"+": [{"var": ""}, 1]}]}]}
+        self.assertExceeds('max_steps', logic, {"a": list(range(100))}, Budget(max_steps=1000))
+        self.assertEqual(len(apply_with_budget(logic, {"a": [1, 2]}, EXTRAS, Budget(max_steps=5000))), 2)
+
+    def test_max_size(self):
+        data = {"a": list(range(1000))}
+        # checked before the product is allocated
+        self.assertExceeds('max_size', {"combinations": [{"var": "a"}, {"var": "a"}, {"var": "a"}]}, data, Budget(max_size=10000))
+        self.assertExceeds('max_size', {"map": [{"var": "a"}, {"var": ""}]}, data, Budget(max_size=999))
+        self.assertExceeds('max_size', {"merge": [{"var": "a"}, {"var": "a"}]}, data, Budget(max_size=1999))
+        self.assertEqual(len(apply_with_budget({"merge": [{"var": "a"}, 1]}, data, EXTRAS, Budget(max_size=1001))), 1001)
+
+    def test_max_depth(self):
+        logic: Any = True
+        for _ in range(40):
+            logic = {"!": [logic]}
+        self.assertExceeds('max_depth', logic, None, Budget(max_depth=30))
+        self.assertIs(apply_with_budget(logic, None, EXTRAS, Budget(max_depth=50)), True)
+
+    def test_timeout(self):
+        logic = {"map": [{"var": "a"}, {"map": [list(range(1000)), {"+": [{"var": ""}, 1]}]}]}
+        self.assertExceeds('timeout', logic, {"a": list(range(1000))}, Budget(timeout=0.01))
+
+    def test_cert_logic(self):
+        budget = Budget(max_steps=10000, max_size=10000, max_depth=100, timeout=10.0)
+        for group in CERTLOGIC_TESTS:
+            for test in group['cases']:
+                for assertion in test['assertions']:
+                    logic = assertion.get('certLogicExpression', test.get('certLogicExpression'))
+                    expected = certLogic(logic, assertion['data'])
+                    self.assertEqual(cert_logic_with_budget(logic, assertion['data'], budget=budget), expected, json.dumps(logic))
+
+        logic = {"reduce": [{"var": "a"}, {"+": [{"var": "accumulator"}, {"var": "current"}]}, 0]}
+        data = {"a": list(range(100))}
+        self.assertEqual(cert_logic_with_budget(logic, data, budget=Budget(max_steps=1000)), 4950)
+        with self.assertRaises(BudgetExceeded) as context:
+            cert_logic_with_budget(logic, data, budget=Budget(max_steps=300))
+        self.assertEqual(context.exception.limit, 'max_steps')
+
+        logic = {"before": [{"plusTime": [{"var": "a"}, 1, "day"]}, "2022-01-03T00:00:00Z"]}
+        data = {"a": "2022-01-01T00:00:00Z"}
+        self.assertIs(cert_logic_with_budget(logic, data, budget=Budget(max_depth=4)), True)
+        with self.assertRaises(BudgetExceeded) as context:
+            cert_logic_with_budget(logic, data, budget=Budget(max_depth=3))
+        self.assertEqual(context.exception.limit, 'max_depth')
+
+    def test_no_budget(self):
+        # the size check of combinations only applies within apply_with_budget()
+        self.assertEqual(len(jsonLogic({"combinations": [[1, 2], [3, 4]]}, None, EXTRAS)), 4)
+
+class LazyCollectionTests(unittest.TestCase):
+    def test_same_results(self):
+        sublogics = [
+            {"==": [{"var": "0"}, 2]},
+            {"var": "1"},
+            {"!": {"var": "0"}},
+        ]
+        items_logics = [
+            {"combinations": [{"var": "a"}, {"var": "b"}]},
+            {"combinations": [{"var": "a"}]},
+            {"combinations": []},
+            {"combinations": [{"var": "a"}, {"var": "e"}]},
+            {"combinations": [{"var": "s"}, {"var": "a"}]},
+            {"zip": [{"var": "a"}, {"var": "b"}]},
+            {"zip": [{"var": "a"}, {"var": "s"}]},
+            {"zip": []},
+        ]
+        data = {"a": [0, 1, 2], "b": [True, False], "e": [], "s": "xy"}
+        for items in items_logics:
+            for op in ("filter", "map", "all", "some", "none"):
+                for sublogic in sublogics:
+                    logic = {op: [items, sublogic]}
+                    self.assertEqual(compile(logic, EXTRAS)(data), jsonLogic(logic, data, EXTRAS), json.dumps(logic))
+            logic = {"reduce": [items, {"+": [{"var": "accumulator"}, 1]}, 0]}
+            self.assertEqual(compile(logic, EXTRAS)(data), jsonLogic(logic, data, EXTRAS), json.dumps(logic))
+
+    def test_early_stop(self):
+        data = {"a": list(range(1000))}
+        logic = {"some": [
+            {"combinations": [{"var": "a"}, {"var": "a"}, {"var": "a"}]},
+            {"===": [{"var": "2"}, 1]},
+        ]}
+        # would be 10^9 combinations if built eagerly
+        self.assertIs(compile(logic, EXTRAS)(data), True)
+
+    def test_errors(self):
+        logic = {"some": [{"combinations": [{"var": "a"}, {"var": "b"}]}, {"var": "0"}]}
+        data = {"a": [1], "b": {"x": 1}}
+        with self.assertRaises(KeyError):
+            jsonLogic(logic, data, EXTRAS)
+        with self.assertRaises(KeyError):
+            compile(logic, EXTRAS)(data)
+
+class AggregateTests(unittest.TestCase):
+    def assertSame(self, logic, data, operations=JSONLOGIC_BUILTINS):
+        expected = jsonLogic(logic, data, operations)
+        actual = compile(logic, operations)(data)
+        # repr() to tell apart NaN, -0.0, 1 and 1.0 and True
+        self.assertEqual((type(actual), repr(actual)), (type(expected), repr(expected)), json.dumps(logic))
+
+    def test_same_results(self):
+        acc = {"var": "accumulator"}
+        cur = {"var": "current"}
+        field = {"var": "current.price"}
+        sublogics = [
+            {"+": [acc, cur]},
+            {"+": [cur, acc]},
+            {"+": [acc, field]},
+            {"+": [acc, 1]},
+            {"+": [1.5, acc]},
+            {"*": [acc, cur]},
+            {"*": [field, acc]},
+            {"min": [acc, cur]},
+            {"min": [cur, acc]},
+            {"max": [acc, field]},
+            {"max": [cur, acc]},
+            {"cat": [acc, cur]},
+            {"cat": [acc, ", ", field, 1]},
+        ]
+        inits = [0, 1, -0.0, None, "2", "x", True, [3], {}, float('nan')]
+        lists = [
+            [],
+            [1, 2, 3],
+            [-0.0, 0, -0.0],
+            [0.1, 0.2, 0.3, 1e16, 1.0, -1e16],
+            [True, False, None, "4", "x", [5], {}],
+            [float('nan'), 1, float('nan')],
+            [{"price": 2}, {"price": "3"}, {"x": 1}, None, "length", [1, 2]],
+        ]
+        for sublogic in sublogics:
+            for init in inits:
+                logic = {"reduce": [{"var": "items"}, sublogic, init]}
+                self.assertSame(logic, {"items": None})
+                for items in lists:
+                    self.assertSame(logic, {"items": items})
+
+                logic = {"reduce": [{"zip": [{"var": "items"}]}, sublogic, init]}
+                self.assertSame(logic, {"items": [1, 2, 3]}, EXTRAS)
+
+    def test_custom_operations(self):
+        logic = {"reduce": [{"var": "items"}, {"+": [{"var": "accumulator"}, {"var": "current.price"}]}, 0]}
+        calls = []
+        def op_add(data, *args):
+            calls.append(args)
+            return JSONLOGIC_BUILTINS['+'](data, *args)
+
+        data = {"items": [{"price": 1}, {"price": 2}, {"price": 3}]}
+        self.assertEqual(compile(logic)(data), 6)
+        # custom operations keep the generic path
+        self.assertEqual(compile(logic, {**JSONLOGIC_BUILTINS, '+': op_add})(data), 6)
+        self.assertEqual(len(calls), 3)
+
+class FusedTests(unittest.TestCase):
+    VALUES = [None, 0, 1, -0.0, 1.5, float('nan'), True, False, "", "1", "x", [], [1], {}, {"a": 1}]
+
+    def test_same_results(self):
+        var = {"var": "x"}
+        logics = [
+            {"===": [var, 1]},
+            {"===": ["x", var]},
+            {"!==": [var, None]},
+            {"===": [{"var": "x.a"}, 1]},
+            {"===": [{"var": ""}, 1]},
+            {"===": [{"var": ["x"]}, "1"]},
+            {"<": [var, 1]},
+            {">": [1, var]},
+            {"<=": [var, True]},
+            {">=": [{"var": "x.a"}, 0]},
+            {"<": [{"+": [var, 1]}, 2]},
+            {"<=": [0, var, 1]},
+            {"<": [0, {"var": "x.0"}, 2]},
+            {"<": ["0", var, "2"]},
+            {"!": var},
+            {"!": [var]},
+            {"!!": [var]},
+            {"in": [var, [1, "x", None, False]]},
+            {"in": [var, [[1], 2]]},
+            {"in": [var, "xyz"]},
+            {"if": [{"missing": ["x"]}, "missing", "present"]},
+            {"if": [{"missing": ["x.a", "x.0"]}, "missing", {"missing": ["x"]}, "x", "present"]},
+            {"if": [{"missing": [var]}, "missing", "present"]},
+        ]
+        for logic in logics:
+            func = compile(logic)
+            for value in self.VALUES:
+                for data in ({"x": value}, value):
+                    expected = jsonLogic(logic, data)
+                    actual = func(data)
+                    self.assertEqual((type(actual), repr(actual)), (type(expected), repr(expected)), f'{json.dumps(logic)} {data!r}')
+
+    def test_custom_operations(self):
+        operations = dict(JSONLOGIC_BUILTINS)
+        operations['==='] = lambda data=None, a=None, b=None, *_ignored: str(a) == str(b)
+        operations['var'] = lambda data=None, key=None, default=None: data.get(key.upper())
+        self.assertTrue(compile({"===": [{"var": "x"}, 1]}, operations)({"X": "1"}))
+        self.assertTrue(compile({"<": [{"var": "x"}, 2]}, operations)({"X": 1}))
+        self.assertTrue(compile({"!": {"var": "x"}}, operations)({"x": 1}))
+
+class CachedRuleTests(unittest.TestCase):
+    def test_input_paths(self):
+        self.assertEqual(input_paths({"and": [
+            {"===": [{"var": "a.b"}, 1]},
+            {"var": ["c", {"var": "d"}]},
+            {"missing": ["e", "a.b"]},
+            {"missing_some": [1, ["f"]]},
+            {"map": [{"var": "g"}, {"var": "h"}]},
+            {"reduce": [{"var": "i"}, {"+": [{"var": "current"}, {"var": "accumulator"}]}, {"var": "j"}]},
+        ]}), ["a.b", "c", "d", "e", "f", "g", "i"])
+        self.assertEqual(input_paths({"var": 0}), [0])
+        self.assertEqual(input_paths(1), [])
+        self.assertIsNone(input_paths({"var": ""}))
+        self.assertIsNone(input_paths({"var": {"cat": ["a", {"var": "b"}]}}))
+        self.assertIsNone(input_paths({"missing": [{"var": "a"}]}))
+        self.assertIsNone(input_paths({"log": {"var": "a"}}))
+        self.assertIsNone(input_paths({"<": [{"timeSince": {"var": "a"}}, 0]}, EXTRAS))
+        self.assertIsNone(input_paths({"var": "a"}, utf16_operations()))
+
+    def test_cache(self):
+        logic = {"if": [{"in": [{"var": "country"}, ["AT", "DE"]]}, {"cat": ["EU ", {"var": "x"}]}, {"var": "items"}]}
+        rule = CachedRule(logic, maxsize=100)
+        self.assertTrue(rule.cacheable)
+
+        values = ["AT", "DE", "AT", "CH", "AT"]
+        for country in values:
+            for x in 1, 1.0, True, -0.0, 0.0, float('nan'), None:
+                data = {"country": country, "x": x, "other": country}
+                self.assertEqual(repr(rule(data)), repr(jsonLogic(logic, data)))
+
+        # 1, 1.0 and true (and 0.0 and -0.0) are different keys
+        stats = rule.stats()
+        self.assertEqual(stats['misses'], 3 * 7)
+        self.assertEqual(stats['hits'], 2 * 7)
+        self.assertEqual(stats['size'], 3 * 7)
+        self.assertEqual(stats['hit_rate'], 2 / 5)
+
+        # unhashable values bypass the cache
+        data = {"country": "CH", "x": 1, "items": [1, 2]}
+        self.assertEqual(rule(data), [1, 2])
+        self.assertEqual(rule.stats()['bypasses'], 1)
+
+        rule.clear()
+        self.assertEqual(rule.stats()['size'], 0)
+        self.assertEqual(rule.hit_rate(), 0.0)
+
+        rule = CachedRule(logic, maxsize=2)
+        for country in "AT", "DE", "AT", "CH", "DE", "AT":
+            rule({"country": country})
+        self.assertEqual((rule.hits, rule.misses), (1, 5))
+        self.assertEqual(rule.stats()['size'], 2)
+
+        self.assertRaises(ValueError, CachedRule, logic, maxsize=0)
+
+    def test_not_cacheable(self):
+        calls = []
+        def op_count(data, value):
+            calls.append(value)
+            return value
+
+        rule = CachedRule({"count": {"var": "a"}}, {**JSONLOGIC_BUILTINS, 'count': op_count})
+        self.assertFalse(rule.cacheable)
+        self.assertEqual(rule({"a": 1}), 1)
+        self.assertEqual(rule({"a": 1}), 1)
+        self.assertEqual(calls, [1, 1])
+        self.assertEqual(rule.stats()['hits'], 0)
+
+class CseTests(unittest.TestCase):
+    def test_same_results(self):
+        for group in GROUPED_TESTS:
+            for logic, data, expected in group['tests']:
+                self.assertEqual(compile(logic, cse=True)(data), expected, json.dumps(logic))
+
+    def test_once_per_scope(self):
+        calls: List[Any] = []
+        def lookup(data=None, key=None, *_ignored):
+            calls.append(key)
+            return key * 2
+
+        operations = {**JSONLOGIC_BUILTINS, 'lookup': lookup}
+        logic = {"and": [
+            {">": [{"lookup": {"var": "x"}}, 1]},
+            {"<": [{"lookup": {"var": "x"}}, 10]},
+            {"all": [{"var": "items"}, {"or": [
+                {"==": [{"lookup": {"var": ""}}, 2]},
+                {"==": [{"lookup": {"var": ""}}, 4]},
+            ]}]},
+        ]}
+        data = {"x": 2, "items": [2, 1, 2]}
+
+        CACHEABLE_OPERATIONS.add(lookup)
+        try:
+            rule = compile(logic, operations, cse=True)
+        finally:
+            CACHEABLE_OPERATIONS.discard(lookup)
+
+        self.assertIs(rule(data), True)
+        # once for the rule and once per item
+        self.assertEqual(calls, [2, 2, 1, 2])
+
+        calls.clear()
+        self.assertIs(compile(logic, operations, cse=True)(data), True)
+        self.assertEqual(len(calls), 7)
+
+    def test_new_lists(self):
+        logic = {"==": [{"merge": [{"var": "a"}]}, {"merge": [{"var": "a"}]}]}
+        self.assertIs(compile(logic, cse=True)({"a": [1]}), False)
+        logic = {"==": [{"var": "a"}, {"var": "a"}]}
+        self.assertIs(compile(logic, cse=True)({"a": [1]}), True)
+
+    def test_reduce(self):
+        logic = {"reduce": [{"var": "a"}, {"+": [
+            {"*": [{"var": "current"}, {"var": "current"}]},
+            {"*": [{"var": "current"}, {"var": "current"}]},
+            {"var": "accumulator"},
+        ]}, 0]}
+        self.assertEqual(compile(logic, cse=True)({"a": [1, 2, 3]}), 28)
+
+class PathTrieTests(unittest.TestCase):
+    DATA = {
+        "a": {"b": 1, "c": "", "d": None, "e": [0, "", {"f": "x"}]},
+        "s": "abc",
+        "z": 0,
+    }
+    KEYS = ["a.b", "a.c", "a.d", "a.x", "a.e.0", "a.e.1", "a.e.2.f", "a.e.3", "a.e.length", "s.length", "s.1", "z", "z.y", "a.b"]
+
+    def test_missing(self):
+        expected = op_missing(self.DATA, self.KEYS)
+        self.assertEqual(expected, ["a.c", "a.d", "a.x", "a.e.1", "a.e.3", "z.y"])
+        self.assertEqual(PathTrie(self.KEYS).missing(self.DATA), expected)
+        self.assertEqual(compile({"missing": self.KEYS})(self.DATA), expected)
+        self.assertEqual(compile({"missing": [self.KEYS]})(self.DATA), expected)
+
+    def test_any_missing(self):
+        self.assertTrue(PathTrie(self.KEYS).any_missing(self.DATA))
+        present = [key for key in self.KEYS if key not in op_missing(self.DATA, self.KEYS)]
+        self.assertFalse(PathTrie(present).any_missing(self.DATA))
+        for key in self.KEYS:
+            self.assertEqual(PathTrie([key]).any_missing(self.DATA), bool(op_missing(self.DATA, key)), key)
+
+    def test_missing_some(self):
+        trie = PathTrie(self.KEYS)
+        for need_count in (-1, 0, 1, 8, 9, 14, 15, float('nan')):
+            expected = op_missing_some(self.DATA, need_count, self.KEYS)
+            self.assertEqual(trie.missing_some(self.DATA, need_count), expected, need_count)
+            self.assertEqual(compile({"missing_some": [need_count, self.KEYS]})(self.DATA), expected, need_count)
+
+    def test_early_stop(self):
+        class Data(dict):
+            visited: List[str] = []
+            def get(self, key, default=None):
+                self.visited.append(key)
+                return dict.get(self, key, default)
+
+        data = Data(a=1, b=2, c=3)
+        self.assertEqual(PathTrie(["a", "b", "c"]).missing_some(data, 2), [])
+        self.assertEqual(data.visited, ["a", "b"])
+
+class UvciTests(unittest.TestCase):
+    def test_extract(self):
+        uvci = "URN:UVCI:01:DE:84503/7823458976#5"
+        fragments = ["01", "DE", "84503", "7823458976", "5", None]
+        for index, expected in enumerate(fragments):
+            self.assertEqual(certLogic({"extractFromUVCI": [uvci, index]}), expected)
+        self.assertEqual(split_uvci(uvci), tuple(fragments[:-1]))
+        self.assertEqual(split_uvci("01:SE:EHM/V12907267LAJW#E"), ("01", "SE", "EHM", "V12907267LAJW", "E"))
+
+    def test_cache(self):
+        uvci = "URN:UVCI:01:AT:10807843F94AEE0EE5093FBC254BD813#B"
+        op_extract_from_uvci(None, uvci, 1)
+        hits = split_uvci.cache_info().hits
+        self.assertEqual(op_extract_from_uvci(None, uvci, 3), "B")
+        self.assertEqual(split_uvci.cache_info().hits, hits + 1)
+
+class InstantTests(unittest.TestCase):
+    @staticmethod
+    def plus_datetime(dt, value, unit):
+        # reference implementation with datetime arithmetic
+        if unit == 'year':
+            return dt.replace(year=dt.year + value)
+        if unit == 'month':
+            month = dt.month + value
+            years = (month - 1) // 12
+            return dt.replace(year=dt.year + years, month=month - years * 12)
+        if unit == 'day':
+            return dt + timedelta(days=value)
+        return dt + timedelta(hours=value)
+
+    def test_plus_time(self):
+        dates = [
+            "2021-01-31T23:30:00-02:00", "2020-02-29", "2021-03-31T00:00:00Z",
+            "2021-06-01T12:00:00.123456+05:45", "0001-01-01T00:00:00+01:00",
+            "9999-12-31T23:00:00-01:00", "2021-10-31T02:30:00+02:00",
+        ]
+        for value in dates:
+            dt = parse_time(value)
+            for amount in 0, 1, -1, 12, -13, 1.5, -0.25, 2.5e-6, 400:
+                for unit in "day", "hour", "month", "year":
+                    if isinstance(amount, float) and unit in ("month", "year"):
+                        continue
+                    try:
+                        expected = self.plus_datetime(dt, amount, unit)
+                    except (ValueError, OverflowError) as error:
+                        self.assertRaises(type(error), plus_time, value, amount, unit)
+                        continue
+
+                    actual = plus_time(value, amount, unit).to_datetime()
+                    self.assertEqual(actual, expected, (value, amount, unit))
+                    self.assertEqual(actual.isoformat(), expected.isoformat(), (value, amount, unit))
+
+        self.assertRaises(ValueError, plus_time, "2021-01-01", 1, "week")
+        self.assertRaises(ValueError, plus_time, "2021-01-01", float('nan'), "day")
+
+    def test_instants(self):
+        instant = to_instant("1970-01-02T01:00:00+01:00")
+        self.assertEqual((instant.micros, instant.offset), (86_400_000_000, 3_600_000_000))
+        self.assertIs(to_instant(instant), instant)
+        self.assertEqual(to_instant(parse_time("1970-01-02T01:00:00+01:00")).micros, instant.micros)
+        self.assertEqual(instant.to_datetime().isoformat(), "1970-01-02T01:00:00+01:00")
+
+        # plusTime results are datetimes outside of the date comparisons
+        result = certLogic({"plusTime": ["2021-01-31", 1, "day"]})
+        self.assertIsInstance(result, datetime)
+        self.assertEqual(result.isoformat(), "2021-02-01T00:00:00+00:00")
+        logic = {"===": [{"plusTime": ["2021-01-31", 24, "hour"]}, {"plusTime": ["2021-02-01T01:00:00+01:00", 0, "day"]}]}
+        self.assertIs(certLogic(logic), True)
+        self.assertNotIsInstance(certLogic({"if": [True, {"plusTime": ["2021-01-31", 1, "day"]}, None]}), Instant)
+
+class StartupTests(unittest.TestCase):
+    def run_python(self, code: str) -> Any:
+        output = subprocess.run(
+            [sys.executable, '-c', code],
+            stdout=subprocess.PIPE, check=True, cwd=dirname(__file__) or '.',
+        ).stdout
+        return json.loads(output)
+
+    def test_lazy_imports(self):
+        modules = self.run_python(
+            'import sys, json, json_logic; '
+            'print(json.dumps(sorted(sys.modules)))'
+        )
+        self.assertIn('json_logic.apply', modules)
+        for module in 'json_logic.cert_logic', 'json_logic.compile', 'json_logic.codec', 'wsgiref.handlers', 'array':
+            self.assertNotIn(module, modules)
+
+    def test_lazy_attributes(self):
+        result = self.run_python(
+            'import json, json_logic; '
+            'from json_logic import certLogic; '
+            'print(json.dumps([certLogic({"and": [1, 2]}), json_logic.partial({"var": "a"}, {"a": 1}), json_logic.evaluate_json(b"[1]").decode()]))'
+        )
+        self.assertEqual(result, [2, 1, '[1]'])
+
+        import json_logic
+        self.assertIn('certLogic', dir(json_logic))
+        with self.assertRaises(AttributeError):
+            json_logic.noSuchThing
+
+class DecisionDiagramTests(unittest.TestCase):
+    def test_rule_clauses(self):
+        # the clauses of the rule are a rule set over the fields of an event
+        clauses = RULE["or"][0]["some"][1]["or"]
+        rules = {index: clause for index, clause in enumerate(clauses)}
+        diagram = DecisionDiagram(rules, TEST_EXTRAS)
+        self.assertEqual(diagram.paths[0], "type")
+        self.assertEqual(set(diagram.paths), {"type", "testType", "selfTest", "vaccine", "doseNumber"})
+
+        events = [event for item in VALID + INVALID for event in item["code"].get("events", [])]
+        self.assertGreater(len(events), 10)
+        for event in events + [{}, {"type": ["CovidTest"]}]:
+            expected = {index: jsonLogic(logic, event, TEST_EXTRAS) for index, logic in rules.items()}
+            self.assertEqual(diagram(event), expected)
+
+    def test_results(self):
+        rules = {
+            "pcr":     {"and": [{"===": [{"var": "type"}, "test"]}, {"===": ["PCR", {"var": "kind"}]}]},
+            "not_pcr": {"!==": [{"var": "kind"}, "PCR"]},
+            "country": {"if": [{"in": [{"var": "country"}, ["AT", "DE"]]}, {"var": "name"}, 0]},
+            "items":   {"some": [{"var": "list"}, {"===": [{"var": "type"}, "test"]}]},
+        }
+        diagram = DecisionDiagram(rules)
+        self.assertEqual(diagram.paths, ["kind", "type", "country"])
+        self.assertEqual(diagram.stats()["fields"], 3)
+
+        for data in [
+            {"type": "test", "kind": "PCR", "country": "AT", "name": "x", "list": [{"type": "test"}]},
+            {"type": "test", "kind": "AntiGen", "country": "FR", "list": []},
+            {"type": 1, "kind": True, "country": ["AT"]},
+            {"kind": None},
+            None,
+        ]:
+            expected = {rule_id: jsonLogic(logic, data) for rule_id, logic in rules.items()}
+            self.assertEqual(diagram(data), expected)
+
+    def test_custom_operations(self):
+        operations = dict(JSONLOGIC_BUILTINS)
+        operations['==='] = lambda data=None, a=None, b=None, *_ignored: str(a) == str(b)
+        diagram = DecisionDiagram({"one": {"===": [{"var": "a"}, 1]}}, operations)
+        self.assertEqual(diagram.paths, [])
+        self.assertEqual(diagram({"a": "1"}), {"one": True})
+
+class RulePackTests(unittest.TestCase):
+    RULES = {
+        "adult": {">=": [{"var": "age"}, 18]},
+        "minor": {"<": [{"var": "age"}, 18]},
+        "numbers": [0, -1, 1.5, -0.0, 2 ** 63, -2 ** 63, 2 ** 100, float('inf')],
+        "strings": ["", "äöü", "\ud83d\ude00", "\ud800"],
+        "constants": [None, True, False, [], [[]]],
+        "objects": {"merge": [{"a": 1, "b": 2}, {"a": 1, "b": 2}, {}, {"var": "x"}]},
+    }
+
+    def test_round_trip(self):
+        pack = RulePack(dump_rules(self.RULES))
+        self.assertEqual(len(pack), len(self.RULES))
+        self.assertListEqual(list(pack), list(self.RULES))
+        self.assertIn("adult", pack)
+        self.assertNotIn("child", pack)
+
+        rules = pack.load_all()
+        self.assertEqual(json.dumps(rules), json.dumps(self.RULES))
+        self.assertEqual(str(rules["numbers"][3]), '-0.0')
+        self.assertIsInstance(rules["numbers"][4], int)
+        self.assertIsInstance(rules["adult"], FrozenDict)
+        self.assertEqual(jsonLogic(pack["adult"], {"age": 20}), True)
+
+    def test_sharing(self):
+        pack = RulePack(dump_rules(self.RULES))
+        self.assertIs(pack["adult"][">="][0], pack["minor"]["<"][0])
+        first, second, _, _ = pack["objects"]["merge"]
+        self.assertEqual(first, second)
+        self.assertIsNot(first, second)
+
+    def test_mmap(self):
+        with TemporaryDirectory() as tempdir:
+            path = joinpath(tempdir, 'rules.jlrp')
+            write_rules(path, self.RULES)
+            with RulePack.open(path) as pack:
+                adult = pack["adult"]
+            self.assertEqual(adult, self.RULES["adult"])
+
+    def test_errors(self):
+        self.assertRaises(ValueError, RulePack, b'')
+        self.assertRaises(ValueError, RulePack, b'{"adult": true}' * 4)
+        self.assertRaises(ValueError, RulePack, dump_rules(self.RULES)[:-8])
+        self.assertRaises(TypeError, dump_rules, {"date": parse_time("2022-01-02")})
+        self.assertRaises(TypeError, dump_rules, {1: True})
+
+class RuleRegistryTests(unittest.TestCase):
+    RULES = {
+        "adult": {">=": [{"var": "age"}, 18]},
+        "minor": {"<": [{"var": "age"}, 18]},
+        "senior": {">=": [{"var": "age"}, 65]},
+    }
+
+    def test_load(self):
+        registry = RuleRegistry(self.RULES)
+        self.assertEqual(registry.version, 1)
+        self.assertEqual(len(registry), 3)
+        self.assertIn("adult", registry)
+        self.assertIs(registry.evaluate("adult", {"age": 20}), True)
+        self.assertRaises(KeyError, registry.evaluate, "child", {"age": 20})
+        self.assertEqual(registry.stats.compiled, 3)
+
+        old = registry.current
+        adult = registry.get("adult")
+        registry.load({**self.RULES, "senior": {">=": [{"var": "age"}, 67]}, "child": {"<": [{"var": "age"}, 14]}})
+        self.assertEqual(registry.version, 2)
+        self.assertEqual((registry.stats.rules, registry.stats.compiled, registry.stats.reused), (4, 2, 2))
+        self.assertIs(registry.get("adult"), adult)
+        self.assertIs(registry.evaluate("senior", {"age": 66}), False)
+        # the old version is unchanged
+        self.assertIs(old.evaluate("senior", {"age": 66}), True)
+        self.assertNotIn("child", old)
+
+        # same canonical JSON, but 1 and 1.0 differ
+        self.assertEqual(rule_hash({"a": [1, 2], "b": None}), rule_hash({"b": None, "a": [1, 2]}))
+        self.assertNotEqual(rule_hash(1), rule_hash(1.0))
+        self.assertNotEqual(rule_hash(1), rule_hash(True))
+
+        # lone surrogates are valid JSON
+        logic = json.loads('{"===": [{"var": "s"}, "\\ud83d"]}')
+        registry = RuleRegistry({"surrogate": logic, "emoji": {"===": [{"var": "s"}, "\U0001f600"]}})
+        self.assertIs(registry.evaluate("surrogate", {"s": "\ud83d"}), True)
+        self.assertNotEqual(registry.current.hashes["surrogate"], registry.current.hashes["emoji"])
+
+    def test_reload(self):
+        def reject_minors(ruleset):
+            if ruleset.evaluate("adult", {"age": 10}):
+                raise ValueError("minors are not adults")
+
+        with RuleRegistry(self.RULES, validate=reject_minors) as registry:
+            future = registry.reload(lambda: {**self.RULES, "adult": {">=": [{"var": "age"}, 21]}})
+            ruleset = future.result()
+            self.assertEqual(ruleset.version, 2)
+            self.assertIs(registry.current, ruleset)
+            self.assertIs(registry.evaluate("adult", {"age": 20}), False)
+            self.assertGreaterEqual(ruleset.stats.validate_seconds, 0.0)
+
+            # rejected versions aren't activated
+            future = registry.reload({**self.RULES, "adult": {">=": [{"var": "age"}, 1]}})
+            self.assertRaises(ValueError, future.result)
+            future = registry.reload({"bad": {"fubar": []}})
+            self.assertRaises(ReferenceError, future.result)
+            self.assertIs(registry.current, ruleset)
+
+    def test_preload(self):
+        registry = RuleRegistry(self.RULES)
+        registry.reload({**self.RULES, "bad": {"%": [1, {"var": "age"}]}}).result()
+        try:
+            # warmup errors are ignored
+            ruleset = registry.preload([{"age": 0}, None])
+            self.assertIs(ruleset, registry.current)
+            self.assertIsNone(registry._executor)
+            self.assertGreater(gc.get_freeze_count(), 0)
+        finally:
+            gc.unfreeze()
+
+        if not hasattr(os, 'fork'):
+            return
+
+        pid = os.fork()
+        if pid == 0:
+            os._exit(0 if registry.evaluate("adult", {"age": 20}) is True else 1)
+        _, status = os.waitpid(pid, 0)
+        self.assertEqual(os.waitstatus_to_exitcode(status), 0)
+
+class MetricsTests(unittest.TestCase):
+    def test_counts(self):
+        registry = MetricsRegistry()
+        logic = {"<": [{"var": "age"}, 18]}
+        for age in 10, 20, 30:
+            registry.jsonLogic('minor', logic, {"age": age})
+        self.assertEqual(registry.certLogic('cert', {"+": [1, 2]}), 3)
+        self.assertRaises(ZeroDivisionError, registry.jsonLogic, 'div', {"/": [1, 0]})
+
+        snapshot = registry.snapshot()
+        self.assertEqual(snapshot['buckets'], BUCKET_BOUNDS)
+        minor = snapshot['rules']['minor']
+        self.assertEqual(minor['count'], 3)
+        self.assertEqual(minor['errors'], 0)
+        self.assertEqual(minor['results'], {'true': 1, 'false': 2, 'other': 0})
+        self.assertEqual(sum(minor['latency']['buckets']), 3)
+        self.assertEqual(snapshot['rules']['cert']['results'], {'true': 0, 'false': 0, 'other': 1})
+        self.assertEqual(snapshot['rules']['div']['errors'], 1)
+        self.assertEqual(snapshot['rules']['div']['count'], 1)
+
+    def test_wrap_threads(self):
+        registry = MetricsRegistry()
+        rule = registry.wrap('adult', compile({">=": [{"var": "age"}, 18]}))
+
+        def run():
+            for age in range(100):
+                rule({"age": age})
+
+        threads = [threading.Thread(target=run) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        run()
+
+        metrics = registry.collect()['adult']
+        self.assertEqual(metrics.count, 500)
+        self.assertEqual(metrics.true, 5 * 82)
+        self.assertEqual(metrics.false, 5 * 18)
+
+    def test_buckets(self):
+        self.assertEqual(bucket_index(0), 0)
+        self.assertEqual(bucket_index(1024), 0)
+        self.assertEqual(bucket_index(1025), 1)
+        self.assertEqual(bucket_index(2048), 1)
+        self.assertEqual(bucket_index(10 ** 12), len(BUCKET_BOUNDS))
+
+    def test_export(self):
+        registry = MetricsRegistry()
+        registry.jsonLogic('say "hi"', {"cat": ["hi", " ", "there"]})
+        registry.jsonLogic('say "hi"', {"==": [1, 1]})
+
+        text = registry.prometheus()
+        self.assertIn('json_logic_evaluations_total{rule="say \\"hi\\""} 2\n', text)
+        self.assertIn('json_logic_results_total{rule="say \\"hi\\"",result="true"} 1\n', text)
+        self.assertIn('json_logic_evaluation_seconds_bucket{rule="say \\"hi\\"",le="+Inf"} 2\n', text)
+        self.assertIn('# TYPE json_logic_evaluation_seconds histogram\n', text)
+
+        exported: List[str] = []
+        registry.export(exported.append, 'json')
+        self.assertEqual(json.loads(exported[0]), registry.snapshot())
+
+        with TemporaryDirectory() as tempdir:
+            path = joinpath(tempdir, 'metrics.prom')
+            registry.export(path)
+            with open(path) as stream:
+                self.assertEqual(stream.read(), text)
+            self.assertEqual(listdir(tempdir), ['metrics.prom'])
+
+        self.assertRaises(ValueError, registry.export, exported.append, 'xml')
+
 def make_cert_test(name: str, logic: Any, assertions: list):
     def test_func(self: unittest.TestCase):
         for assertion in assertions:
@@ -327,9 +1688,16 @@ def mock_time_since(data=None, timestamp=None, *_ignored) -> float:
 TEST_EXTRAS['timeSince'] = mock_time_since
 TEST_EXTRAS['now']       = lambda *_ignored: NOW
 
+CACHEABLE_OPERATIONS.add(mock_time_since)
+
+COMPILED_RULE = compile(RULE, TEST_EXTRAS)
+COMPILED_CSE_RULE = compile(RULE, TEST_EXTRAS, cse=True)
+
 def make_rule_test(name: str, data: JsonValue, expected: bool):
     def test_func(self: unittest.TestCase):
         actual = jsonLogic(RULE, data, TEST_EXTRAS)
+        self.assertEqual(COMPILED_RULE(data), actual)
+        self.assertEqual(COMPILED_CSE_RULE(data), actual)
         self.assertEqual(actual, expected,
             f"Wrong result\n"
             f"     data: {json.dumps(data)}\n"
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+
+import sys
+
+from typing import Any, Callable, List
+from time import monotonic_ns
+
+from json_logic.cert_logic.builtins import op_extract_from_uvci, split_uvci, to_int
+from json_logic.builtins import to_string
+from benchmark import print_stats
+
+# UVCIs in the formats used by different issuing countries
+UVCIS = [
+    "URN:UVCI:01:AT:10807843F94AEE0EE5093FBC254BD813#B",
+    "URN:UVCI:01:NL:187/37512422923",
+    "URN:UVCI:01:DE:84503/7823458976#5",
+    "01:SE:EHM/V12907267LAJW#E",
+    "URN:UVCI:01:FR:W7V2BE46QSBJ#L",
+    "URN:UVCI:01:IT:8F5E4C38E3B54E6B9A8B4F15E2D4E2C3#4",
+    "URN:UVCI:01:BE:3WT3EPT3FSQGJNG3F7EJTJBDK7#1",
+    "URN:UVCI:01:ES:06/B/45000/2021/7/3E3B9#9",
+]
+
+# a rule typically extracts the country and one or two more fragments
+INDICES = [1, 2, 3, 1]
+
+def usage() -> None:
+    print("%s <repeat-count>\n" % (sys.argv[0] if sys.argv else "uvci_benchmark.py"))
+
+def extract_uncached(data=None, uvci=None, index=None, *_ignored):
+    index = to_int(index)
+    if uvci is None or index < 0:
+        return None
+
+    fragments = split_uvci.__wrapped__(to_string(uvci))
+    return fragments[index] if index < len(fragments) else None
+
+def measure(extract: Callable[..., Any], count: int) -> List[int]:
+    times: List[int] = []
+    for _ in range(count):
+        start = monotonic_ns()
+        for uvci in UVCIS:
+            for index in INDICES:
+                extract(None, uvci, index)
+        times.append(monotonic_ns() - start)
+    return times
+
+def main() -> None:
+    if len(sys.argv) != 2:
+        usage()
+        sys.exit(1)
+
+    count = int(sys.argv[1], 10)
+
+    for uvci in UVCIS:
+        for index in INDICES:
+            assert op_extract_from_uvci(None, uvci, index) == extract_uncached(None, uvci, index)
+
+    print("             min        max        avg     median        sum")
+    print_stats(measure(extract_uncached, count), "split")
+    print_stats(measure(op_extract_from_uvci, count), "cache")
+
+if __name__ == '__main__':
+    main()